@@ -2,10 +2,20 @@
 
 # 将已创建的 Issues 添加到 GitHub Project
 # 用法: ./add_issues_to_project.sh "项目名称"
+#       python3 scripts/create_all_issues.py --output ndjson | ./add_issues_to_project.sh --stdin "项目名称"
+#       （--stdin 或 - 表示从标准输入读取 NDJSON 结果流）
 
 set -e
 
+READ_STDIN=false
+if [ "$1" = "--stdin" ] || [ "$1" = "-" ]; then
+    READ_STDIN=true
+    shift
+fi
+
 PROJECT_TITLE="${1:-nav_blog UI 升级}"
+MANIFEST="${ISSUE_SYNC_HOME:-$(dirname "$0")/.issue_sync}/manifest.json"
+SCRIPTS_DIR="$(dirname "$0")/scripts"
 
 echo "🚀 开始创建 GitHub Project 并添加 Issues..."
 
@@ -33,33 +43,60 @@ fi
 
 echo ""
 
-# 获取所有 Issues（排除已关闭的）
-echo "📝 获取所有 Issues..."
-ISSUE_NUMBERS=$(gh issue list --limit 100 --state open --json number --jq '.[].number')
-
-if [ -z "$ISSUE_NUMBERS" ]; then
-    echo "⚠️  没有找到 Issues"
-    exit 0
-fi
-
 # 将 Issues 添加到 Project
-echo "➕ 添加 Issues 到 Project..."
 ADDED_COUNT=0
 SKIPPED_COUNT=0
 
-for issue_num in $ISSUE_NUMBERS; do
-    # 检查 Issue 是否已在 Project 中
-    ISSUE_URL="https://github.com/$REPO/issues/$issue_num"
+# 与 Python 工具共享同一令牌的速率限制预算（.issue_sync/budget.db），避免同时运行时触发二级限流
+take_budget() {
+    PYTHONPATH="$SCRIPTS_DIR" python3 -m issue_sync budget --take write --resource graphql \
+        >/dev/null 2>&1 || true
+}
+
+add_issue() {
+    local issue_num=$1
+    local issue_url=$2
 
-    # 尝试添加 Issue 到 Project
-    if gh project item-add $PROJECT_NUMBER --owner $OWNER --url "$ISSUE_URL" 2>/dev/null; then
+    take_budget
+    if gh project item-add $PROJECT_NUMBER --owner $OWNER --url "$issue_url" >/dev/null 2>&1; then
         echo "  ✅ 添加 Issue #$issue_num"
-        ((ADDED_COUNT++))
+        ((ADDED_COUNT++)) || true
     else
         echo "  ⏭️  Issue #$issue_num 已在 Project 中或添加失败"
-        ((SKIPPED_COUNT++))
+        ((SKIPPED_COUNT++)) || true
     fi
-done
+}
+
+if [ "$READ_STDIN" = true ]; then
+    # 从管道读取 NDJSON 结果流，边创建边添加:
+    #   python3 scripts/create_all_issues.py --output ndjson | ./add_issues_to_project.sh -
+    echo "➕ 从 NDJSON 结果流添加 Issues..."
+    while IFS=$'\t' read -r issue_num issue_url; do
+        add_issue "$issue_num" "$issue_url"
+    done < <(jq -r --unbuffered 'select((.type == "epic" or .type == "task")
+        and (.action == "created" or .action == "exists") and .url != null)
+        | [.number, .url] | @tsv')
+elif [ -f "$MANIFEST" ]; then
+    # 使用上次运行写入的清单（plan ID → Issue 编号/URL），无需再次查询 API
+    echo "📄 从清单添加 Issues: $MANIFEST"
+    while IFS=$'\t' read -r issue_num issue_url; do
+        add_issue "$issue_num" "$issue_url"
+    done < <(jq -r '.items[] | select(.url != null) | [.number, .url] | @tsv' "$MANIFEST")
+else
+    # 获取所有 Issues（排除已关闭的）
+    echo "📝 获取所有 Issues..."
+    ISSUE_NUMBERS=$(gh issue list --limit 100000 --state open --json number --jq '.[].number')
+
+    if [ -z "$ISSUE_NUMBERS" ]; then
+        echo "⚠️  没有找到 Issues"
+        exit 0
+    fi
+
+    echo "➕ 添加 Issues 到 Project..."
+    for issue_num in $ISSUE_NUMBERS; do
+        add_issue "$issue_num" "https://github.com/$REPO/issues/$issue_num"
+    done
+fi
 
 echo ""
 echo "🎉 完成！"
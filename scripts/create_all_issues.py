@@ -5,213 +5,103 @@ Generates all Epics, Tasks, Milestones, and Labels from PRD
 
 Usage:
     python create_all_issues.py
+    python create_all_issues.py --epic 4
+    python create_all_issues.py --task epic4.task7
+    python create_all_issues.py --phase phase-2 --labels priority-p0
+    python create_all_issues.py --list --epic 2
+    python create_all_issues.py snapshot [--since last] [--out snapshot.jsonl]
+    python create_all_issues.py --output ndjson | ../add_issues_to_project.sh -
+    python create_all_issues.py --profile
+    python create_all_issues.py --max-duration 600
+
+The backend (gh CLI, REST, batched GraphQL) is picked automatically; set
+ISSUE_SYNC_BACKEND=gh|rest|graphql|fake to force one.
 """
 
-import subprocess
-import json
-import time
+import argparse
 import sys
-import os
-from typing import Dict, List, Optional, Tuple
-
-# ANSI color codes for terminal output
-class Colors:
-    HEADER = '\033[95m'
-    BLUE = '\033[94m'
-    CYAN = '\033[96m'
-    GREEN = '\033[92m'
-    WARNING = '\033[93m'
-    FAIL = '\033[91m'
-    ENDC = '\033[0m'
-    BOLD = '\033[1m'
-
-def print_header(text: str):
-    print(f"\n{Colors.HEADER}{Colors.BOLD}{'='*80}{Colors.ENDC}")
-    print(f"{Colors.HEADER}{Colors.BOLD}{text}{Colors.ENDC}")
-    print(f"{Colors.HEADER}{Colors.BOLD}{'='*80}{Colors.ENDC}\n")
-
-def print_success(text: str):
-    print(f"{Colors.GREEN}✓ {text}{Colors.ENDC}")
-
-def print_info(text: str):
-    print(f"{Colors.CYAN}→ {text}{Colors.ENDC}")
-
-def print_error(text: str):
-    print(f"{Colors.FAIL}✗ {text}{Colors.ENDC}")
-
-def run_gh_command(args: List[str], retry: int = 3) -> Optional[str]:
-    """Execute gh CLI command with retry logic"""
-    env = dict(os.environ)
-    env['GH_PROMPT_DISABLED'] = '1'
-    env['GH_NO_UPDATE_NOTIFIER'] = '1'
-
-    for attempt in range(retry):
-        try:
-            result = subprocess.run(
-                ['gh'] + args,
-                capture_output=True,
-                text=True,
-                check=True,
-                env=env,
-                timeout=30
-            )
-            return result.stdout.strip()
-        except subprocess.TimeoutExpired:
-            print_error(f"Command timed out: {' '.join(args)}")
-            return None
-        except subprocess.CalledProcessError as e:
-            if attempt < retry - 1:
-                time.sleep(2)
-                continue
-            print_error(f"Command failed: {' '.join(args)}")
-            print_error(f"Error: {e.stderr}")
-            return None
-    return None
-
-def find_issue_by_title(title: str) -> Optional[int]:
-    """Find existing issue by exact title and return issue number if found"""
-    search_query = f'"{title}" in:title'
-    result = run_gh_command([
-        'issue', 'list',
-        '--search', search_query,
-        '--state', 'all',
-        '--json', 'number,title',
-        '--limit', '100'
-    ])
-
-    if not result:
-        return None
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from issue_sync.console import print_error, print_header, print_info, print_success
+from issue_sync.output import add_output_argument, ndjson_writer
+from issue_sync.plan import EpicItem, Plan, TaskItem
+from issue_sync.selection import Selection, add_selection_arguments
+
+LABELS = [
+    # Type labels
+    ("epic", "7057ff", "Epic issue containing multiple tasks"),
+    ("feature", "a2eeef", "New feature or request"),
+    ("enhancement", "84b6eb", "Enhancement to existing feature"),
+    ("testing", "d4c5f9", "Testing related tasks"),
+    ("documentation", "0075ca", "Documentation improvements"),
+    # Phase labels
+    ("phase-1", "fbca04", "Phase 1: Visual Style Refactoring"),
+    ("phase-2", "d93f0b", "Phase 2: Interaction Enhancement"),
+    # Domain labels
+    ("ui", "e99695", "UI/Frontend related"),
+    ("backend", "c2e0c6", "Backend related"),
+    ("animation", "f9d0c4", "Animation and effects"),
+    ("design", "fef2c0", "Design assets and styling"),
+    ("performance", "bfd4f2", "Performance optimization"),
+    # Priority labels
+    ("priority-p0", "b60205", "Critical priority"),
+    ("priority-p1", "d93f0b", "High priority"),
+    ("priority-p2", "fbca04", "Medium priority"),
+    ("priority-p3", "0e8a16", "Low priority"),
+    # Size labels
+    ("size-small", "c5def5", "1-2 hours"),
+    ("size-medium", "bfdadc", "2-3 hours"),
+    ("size-large", "d4c5f9", "3-4 hours"),
+]
+
+MILESTONES = [
+    {
+        "title": "Phase 1: Visual Style Refactoring",
+        "description": "Establish cyberpunk visual foundation with core visual upgrades. Includes Epic 1 (Cyberpunk Visual Style), Epic 2 (Particle Background), Epic 3 (3D Card Effects).",
+    },
+    {
+        "title": "Phase 2: Interaction Enhancement & Character System",
+        "description": "Add anime elements and interactive features. Includes Epic 4 (Anime Icons), Epic 5 (Kanban Musume Character).",
+    }
+]
 
-    try:
-        issues = json.loads(result)
-    except json.JSONDecodeError:
-        return None
+_engine = None
 
-    for issue in issues:
-        if issue.get('title', '').strip() == title.strip():
-            return int(issue['number'])
+Body = Union[str, Callable[[], str]]
 
-    return None
+def get_engine(backend: Optional[str] = None):
+    """Return the shared sync engine, picking the fastest available backend"""
+    global _engine
+    if _engine is None:
+        # Imported lazily so --help and --list never load the backends
+        from issue_sync.backends import select_backend
+        from issue_sync.engine import SyncEngine
+        _engine = SyncEngine(select_backend(backend))
+    return _engine
 
-def create_labels():
-    """Create all necessary labels"""
+def create_labels(names: Optional[Iterable[str]] = None):
+    """Create all necessary labels (or only `names`)"""
     print_header("Step 1: Creating Labels")
+    wanted = None if names is None else set(names)
+    get_engine().ensure_labels(label for label in LABELS if wanted is None or label[0] in wanted)
 
-    labels = [
-        # Type labels
-        ("epic", "7057ff", "Epic issue containing multiple tasks"),
-        ("feature", "a2eeef", "New feature or request"),
-        ("enhancement", "84b6eb", "Enhancement to existing feature"),
-        ("testing", "d4c5f9", "Testing related tasks"),
-        ("documentation", "0075ca", "Documentation improvements"),
-        # Phase labels
-        ("phase-1", "fbca04", "Phase 1: Visual Style Refactoring"),
-        ("phase-2", "d93f0b", "Phase 2: Interaction Enhancement"),
-        # Domain labels
-        ("ui", "e99695", "UI/Frontend related"),
-        ("backend", "c2e0c6", "Backend related"),
-        ("animation", "f9d0c4", "Animation and effects"),
-        ("design", "fef2c0", "Design assets and styling"),
-        ("performance", "bfd4f2", "Performance optimization"),
-        # Priority labels
-        ("priority-p0", "b60205", "Critical priority"),
-        ("priority-p1", "d93f0b", "High priority"),
-        ("priority-p2", "fbca04", "Medium priority"),
-        ("priority-p3", "0e8a16", "Low priority"),
-        # Size labels
-        ("size-small", "c5def5", "1-2 hours"),
-        ("size-medium", "bfdadc", "2-3 hours"),
-        ("size-large", "d4c5f9", "3-4 hours"),
-    ]
-
-    for name, color, description in labels:
-        result = run_gh_command([
-            'label', 'create', name,
-            '--color', color,
-            '--description', description,
-            '--force'
-        ])
-        if result is not None:
-            print_success(f"Label: {name}")
-
-def create_milestones() -> Tuple[str, str]:
-    """Create project milestones and return their titles"""
+def create_milestones(titles: Optional[Iterable[str]] = None) -> Tuple[str, str]:
+    """Create project milestones (or only `titles`) and return their titles"""
     print_header("Step 2: Creating Milestones")
+    wanted = None if titles is None else set(titles)
+    get_engine().ensure_milestones(m for m in MILESTONES if wanted is None or m["title"] in wanted)
+    return MILESTONES[0]["title"], MILESTONES[1]["title"]
 
-    milestones = [
-        {
-            "title": "Phase 1: Visual Style Refactoring",
-            "description": "Establish cyberpunk visual foundation with core visual upgrades. Includes Epic 1 (Cyberpunk Visual Style), Epic 2 (Particle Background), Epic 3 (3D Card Effects).",
-        },
-        {
-            "title": "Phase 2: Interaction Enhancement & Character System",
-            "description": "Add anime elements and interactive features. Includes Epic 4 (Anime Icons), Epic 5 (Kanban Musume Character).",
-        }
-    ]
-
-    milestone_titles = []
-
-    for milestone in milestones:
-        result = run_gh_command([
-            'api', 'repos/{owner}/{repo}/milestones',
-            '-f', f'title={milestone["title"]}',
-            '-f', f'description={milestone["description"]}',
-            '-f', 'state=open'
-        ])
-
-        if result:
-            try:
-                data = json.loads(result)
-                milestone_num = str(data['number'])
-                milestone_titles.append(milestone["title"])
-                print_success(f"Milestone: {milestone['title']} (#{milestone_num})")
-            except (json.JSONDecodeError, KeyError):
-                milestone_titles.append(milestone["title"])
-                print_info(f"Milestone may already exist: {milestone['title']}")
-
-    return tuple(milestone_titles) if len(milestone_titles) == 2 else (milestones[0]["title"], milestones[1]["title"])
-
-def create_epic_issue(title: str, body: str, labels: List[str], milestone: str) -> Optional[int]:
+def create_epic_issue(title: str, body: Body, labels: List[str], milestone: str,
+                      plan_id: Optional[str] = None) -> Optional[int]:
     """Create an Epic issue and return its number"""
-    existing_issue = find_issue_by_title(title)
-    if existing_issue:
-        print_info(f"Epic exists: {title} (#{existing_issue})")
-        return existing_issue
-
-    result = run_gh_command([
-        'issue', 'create',
-        '--title', title,
-        '--body', body,
-        '--label', ','.join(labels),
-        '--milestone', milestone
-    ])
-
-    if result:
-        issue_number = int(result.split('/')[-1])
-        print_success(f"Epic: {title} (#{issue_number})")
-        return issue_number
-    return None
-
-def create_task_issue(title: str, body: str, labels: List[str], milestone: str) -> Optional[int]:
+    return get_engine().ensure_issue(title, body, labels, milestone, kind='Epic', plan_id=plan_id)
+
+def create_task_issue(title: str, body: Body, labels: List[str], milestone: str,
+                      plan_id: Optional[str] = None) -> Optional[int]:
     """Create a Task issue and return its number"""
-    existing_issue = find_issue_by_title(title)
-    if existing_issue:
-        print_info(f"  Task exists: {title} (#{existing_issue})")
-        return existing_issue
-
-    result = run_gh_command([
-        'issue', 'create',
-        '--title', title,
-        '--body', body,
-        '--label', ','.join(labels),
-        '--milestone', milestone
-    ])
-
-    if result:
-        issue_number = int(result.split('/')[-1])
-        print_success(f"  Task: {title} (#{issue_number})")
-        return issue_number
-    return None
+    return get_engine().ensure_issue(title, body, labels, milestone, kind='Task', plan_id=plan_id)
 
 def generate_epic1_body() -> str:
     """Generate Epic 1 body content"""
@@ -454,69 +344,9 @@ None - Can proceed after Phase 2 starts
 ---
 *This is an Epic issue. Individual tasks will be created as separate issues and linked to this epic.*"""
 
-def generate_task_body(task_num: int, epic_num: int, epic_title: str, task_data: Dict) -> str:
-    """Generate task issue body"""
-    return f"""## Background
-
-{task_data['background']}
-
-## Acceptance Criteria
-
-{task_data['acceptance_criteria']}
-
-## Implementation Plan
-
-**Files to Modify:**
-{task_data['files']}
-
-**Implementation Steps:**
-{task_data['steps']}
-
-**Estimated Time:** {task_data['time']}
-
-## Core Logic
-
-```typescript
-{task_data.get('code', '// Implementation details')}
-```
-
-## Testing Requirements
-
-{task_data['testing']}
-
-## Dependencies
-
-- **Priority:** {task_data['priority']}
-- **Size:** {task_data['size']}
-- **Blocked by:** {task_data.get('blocked_by', 'None')}
-- **Blocks:** {task_data.get('blocks', 'None')}
-
-## Git Worktree
-
-```bash
-# Create worktree for this task
-git worktree add ../nav_blog-{task_data['branch']} -b {task_data['branch']}
-cd ../nav_blog-{task_data['branch']}
-
-# After completion
-git add .
-git commit -m "{task_data['commit']}"
-git push -u origin {task_data['branch']}
-
-# Create PR
-gh pr create --title "{task_data['title']}" --body "Closes #{epic_num}"
-```
-
-## Related
-
-- Epic: #{epic_num} {epic_title}
-"""
-
-def create_epic1_tasks(epic_num: int, milestone: str):
-    """Create all tasks for Epic 1"""
-    print_info("Creating tasks for Epic 1...")
-
-    tasks = [
+def epic1_tasks() -> List[Dict]:
+    """Task data for Epic 1"""
+    return [
         {
             'title': '[Epic 1-Task 1] Setup Tailwind CSS cyberpunk color palette',
             'background': '需要在 Tailwind 配置中定义赛博朋克风格的颜色系统，包括深蓝、紫色、霓虹粉、霓虹青等主题色。',
@@ -778,18 +608,9 @@ body {
         }
     ]
 
-    epic_title = '[Epic 1] 赛博朋克视觉风格 (Cyberpunk Visual Style)'
-
-    for index, task in enumerate(tasks, start=1):
-        body = generate_task_body(index, epic_num, epic_title, task)
-        create_task_issue(task['title'], body, task['labels'], milestone)
-        time.sleep(1)
-
-def create_epic2_tasks(epic_num: int, milestone: str):
-    """Create all tasks for Epic 2"""
-    print_info("Creating tasks for Epic 2...")
-
-    tasks = [
+def epic2_tasks() -> List[Dict]:
+    """Task data for Epic 2"""
+    return [
         {
             'title': '[Epic 2-Task 1] Create Canvas-based particle system component',
             'background': '建立基于 Canvas 的粒子背景组件，提供完整的渲染生命周期与自适应布局。',
@@ -1030,18 +851,9 @@ const config = isMobile ? mobileConfig : desktopConfig''',
         }
     ]
 
-    epic_title = '[Epic 2] 动态粒子星空背景 (Dynamic Particle Background)'
-
-    for index, task in enumerate(tasks, start=1):
-        body = generate_task_body(index, epic_num, epic_title, task)
-        create_task_issue(task['title'], body, task['labels'], milestone)
-        time.sleep(1)
-
-def create_epic3_tasks(epic_num: int, milestone: str):
-    """Create all tasks for Epic 3"""
-    print_info("Creating tasks for Epic 3...")
-
-    tasks = [
+def epic3_tasks() -> List[Dict]:
+    """Task data for Epic 3"""
+    return [
         {
             'title': '[Epic 3-Task 1] Install and configure Framer Motion',
             'background': '引入 Framer Motion 作为统一动画框架，保证后续 3D 动效实现一致。',
@@ -1260,18 +1072,9 @@ const enableMotion = !prefersReduced''',
         }
     ]
 
-    epic_title = '[Epic 3] 3D 卡片悬浮效果 (3D Card Hover Effects)'
-
-    for index, task in enumerate(tasks, start=1):
-        body = generate_task_body(index, epic_num, epic_title, task)
-        create_task_issue(task['title'], body, task['labels'], milestone)
-        time.sleep(1)
-
-def create_epic4_tasks(epic_num: int, milestone: str):
-    """Create all tasks for Epic 4"""
-    print_info("Creating tasks for Epic 4...")
-
-    tasks = [
+def epic4_tasks() -> List[Dict]:
+    """Task data for Epic 4"""
+    return [
         {
             'title': '[Epic 4-Task 1] Design hand-drawn style category icons',
             'background': '设计一套手绘风格分类图标，作为二次元视觉体系的核心元素。',
@@ -1496,18 +1299,9 @@ const Icon = ({ name, size = 24 }: IconProps) => (
         }
     ]
 
-    epic_title = '[Epic 4] 动漫风格图标和插画 (Anime-style Icons and Illustrations)'
-
-    for index, task in enumerate(tasks, start=1):
-        body = generate_task_body(index, epic_num, epic_title, task)
-        create_task_issue(task['title'], body, task['labels'], milestone)
-        time.sleep(1)
-
-def create_epic5_tasks(epic_num: int, milestone: str):
-    """Create all tasks for Epic 5"""
-    print_info("Creating tasks for Epic 5...")
-
-    tasks = [
+def epic5_tasks() -> List[Dict]:
+    """Task data for Epic 5"""
+    return [
         {
             'title': '[Epic 5-Task 1] Design or source kanban musume character assets',
             'background': '准备看板娘角色素材，包含基本表情与姿态版本。',
@@ -1733,93 +1527,240 @@ if (collapsed) return <MiniButton />''',
         }
     ]
 
-    epic_title = '[Epic 5] 看板娘角色助手 (Kanban Musume Character Assistant)'
-
-    for index, task in enumerate(tasks, start=1):
-        body = generate_task_body(index, epic_num, epic_title, task)
-        create_task_issue(task['title'], body, task['labels'], milestone)
-        time.sleep(1)
-
-def main():
+EPICS = [
+    {
+        'id': 'epic1',
+        'title': '[Epic 1] 赛博朋克视觉风格 (Cyberpunk Visual Style)',
+        'labels': ['epic', 'phase-1', 'ui', 'design', 'priority-p0'],
+        'milestone': MILESTONES[0]["title"],
+        'body': generate_epic1_body,
+        'tasks': epic1_tasks,
+    },
+    {
+        'id': 'epic2',
+        'title': '[Epic 2] 动态粒子星空背景 (Dynamic Particle Background)',
+        'labels': ['epic', 'phase-1', 'ui', 'animation', 'priority-p0'],
+        'milestone': MILESTONES[0]["title"],
+        'body': generate_epic2_body,
+        'tasks': epic2_tasks,
+    },
+    {
+        'id': 'epic3',
+        'title': '[Epic 3] 3D 卡片悬浮效果 (3D Card Hover Effects)',
+        'labels': ['epic', 'phase-1', 'ui', 'animation', 'priority-p1'],
+        'milestone': MILESTONES[0]["title"],
+        'body': generate_epic3_body,
+        'tasks': epic3_tasks,
+    },
+    {
+        'id': 'epic4',
+        'title': '[Epic 4] 动漫风格图标和插画 (Anime-style Icons and Illustrations)',
+        'labels': ['epic', 'phase-2', 'ui', 'design', 'priority-p1'],
+        'milestone': MILESTONES[1]["title"],
+        'body': generate_epic4_body,
+        'tasks': epic4_tasks,
+    },
+    {
+        'id': 'epic5',
+        'title': '[Epic 5] 看板娘角色助手 (Kanban Musume Character Assistant)',
+        'labels': ['epic', 'phase-2', 'ui', 'priority-p1'],
+        'milestone': MILESTONES[1]["title"],
+        'body': generate_epic5_body,
+        'tasks': epic5_tasks,
+    },
+]
+
+
+def load_plan(selection: Optional[Selection] = None) -> Plan:
+    """Build the plan for the selection
+
+    Task data is only loaded for epics the selection can reach, and each
+    authoring dict is converted to a slotted TaskItem and dropped. An epic
+    that is not selected itself is still included when one of its tasks is,
+    since the tasks need its issue number.
+    """
+    selection = selection or Selection()
+    plan = Plan()
+    for spec in EPICS:
+        if not selection.wants_epic(spec['id'], spec['labels']):
+            continue
+        tasks = [TaskItem.from_dict(spec['id'], index, spec['milestone'], task)
+                 for index, task in enumerate(spec['tasks'](), start=1)
+                 if selection.matches(f"{spec['id']}.task{index}", task['labels'])]
+        epic_selected = selection.matches(spec['id'], spec['labels'])
+        if epic_selected or tasks:
+            plan.add_epic(EpicItem(spec['id'], spec['title'], spec['labels'],
+                                   spec['milestone'], spec['body']), epic_selected)
+            for task in tasks:
+                plan.add_task(task)
+    return plan
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Create the UI/UX upgrade labels, milestones, epics and tasks on GitHub",
+        epilog="examples:\n"
+               "  %(prog)s --epic 4\n"
+               "  %(prog)s --task epic4.task7\n"
+               "  %(prog)s --phase phase-2 --labels priority-p0",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    add_selection_arguments(parser)
+    parser.add_argument('--backend', choices=['gh', 'rest', 'graphql', 'fake'],
+                        help="force a backend instead of the fastest available one")
+    parser.add_argument('--project', type=int,
+                        help="also prefetch the items of this project board number")
+    parser.add_argument('--list', action='store_true',
+                        help="print the selected plan IDs and exit without touching GitHub")
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help="create items even if they look like existing issues")
+    parser.add_argument('--max-duration', type=float, metavar='SECONDS',
+                        help="stop starting new items after this long; the rest stay queued")
+    parser.add_argument('--max-attempts', type=int, default=3,
+                        help="attempts per item before it moves to the dead-letter list")
+    add_output_argument(parser)
+    parser.add_argument('--profile', action='store_true',
+                        help="run under cProfile and tracemalloc; reports go to .issue_sync/profile/")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
     """Main execution function"""
+    argv = sys.argv[1:] if argv is None else argv
+    command = argv[1:] if argv[:1] == ['--profile'] else argv
+    if command and not command[0].startswith('-'):
+        # Subcommands (snapshot, ...) are handled by the issue_sync CLI
+        from issue_sync.cli import main as cli_main
+        return cli_main(argv, plan_source=sys.modules[__name__], prog='create_all_issues.py')
+
+    args = parse_args(argv)
+    if args.profile:
+        from issue_sync.profiling import print_profile_summary, profiled
+        with profiled() as paths:
+            code = run_sync(args, argv)
+        print_profile_summary(paths)
+        return code
+    return run_sync(args, argv)
+
+
+def run_sync(args: argparse.Namespace, argv: List[str]):
+    """Sync the selected plan items (everything after argument parsing)"""
+    writer = ndjson_writer(args)
+    selection = Selection.from_args(args)
+    plan = load_plan(selection)
+
+    if args.list:
+        for item in plan.selected_items():
+            print(f"{item.plan_id}\t{item.title}")
+        return
+
+    if not plan:
+        print_error("No plan items match the selection")
+        return
+
+    # Catch anything GitHub would reject before the first request
+    from issue_sync.validate import print_problems, validate_source
+    problems = validate_source(plan, sys.modules[__name__])
+    if problems:
+        print_problems(problems)
+        return 1
+
     print_header("GitHub Issues Generator for UI/UX Cyberpunk Upgrade")
     print_info("Project: nav_blog UI 升级")
     print_info("Repository: WillowSageL/nav_blog")
+    from issue_sync.bootstrap import bootstrap, bootstrap_from_snapshot
+    from issue_sync.jobqueue import JobQueue, drain
+    from issue_sync.manifest import Manifest
+    from issue_sync.metrics import RUN
+    from issue_sync.output import tee
+    from issue_sync.paths import default_manifest, default_snapshot, state_dir
+    from issue_sync.snapshot import SnapshotStore
+    from issue_sync.webhook import snapshot_is_current
+
+    engine = get_engine(args.backend)
+    engine.allow_duplicates = args.allow_duplicates
+    # a fake run keeps its manifest, queue and history in memory: its numbers are not GitHub's
+    shared = engine.backend.shared
+    manifest_path = default_manifest() if shared else None
+    manifest = Manifest.load(manifest_path)
+    manifest.begin_run('sync', engine.backend.name, ' '.join(argv) or None)
+    engine.on_result = tee(writer, manifest.record)
+    run_start = time.perf_counter()
+
+    # Step 0: Fetch labels, milestones, existing issues, repo ID and project items at once
+    # (or read them from a snapshot the webhook receiver is keeping current)
+    print_header("Step 0: Bootstrap")
+    with RUN.phase('bootstrap'):
+        context, source = None, "GitHub"
+        snapshot_path = default_snapshot()
+        if shared and snapshot_path.exists():
+            with SnapshotStore(snapshot_path) as store:
+                if snapshot_is_current(store):
+                    context = bootstrap_from_snapshot(engine.backend, store, args.project)
+                    source = "the webhook-fed snapshot"
+        if context is None:
+            context = bootstrap(engine.backend, args.project)
+        engine.warm(context)
+    print_info(f"{len(context.labels)} labels, {len(context.milestones)} milestones, "
+               f"{len(context.issues)} issues, {len(context.project_items)} project items "
+               f"from {source} in {RUN.timings['bootstrap']:.1f}s")
+
+    # Targeted runs only touch the labels and milestones their items use
+    used_labels = {label for item in plan.epics + plan.tasks for label in item.labels}
+    used_milestones = {epic.milestone for epic in plan.epics}
 
     # Step 1: Create labels
-    create_labels()
-    time.sleep(1)
+    with RUN.phase('labels'):
+        create_labels(None if selection.everything else used_labels)
 
     # Step 2: Create milestones
-    milestone1, milestone2 = create_milestones()
-    time.sleep(1)
-
-    # Step 3: Create Epic Issues
-    print_header("Step 3: Creating Epic Issues")
-    epic1_body = generate_epic1_body()
-    epic1_num = create_epic_issue(
-        title="[Epic 1] 赛博朋克视觉风格 (Cyberpunk Visual Style)",
-        body=epic1_body,
-        labels=['epic', 'phase-1', 'ui', 'design', 'priority-p0'],
-        milestone=milestone1
-    )
-
-    epic2_body = generate_epic2_body()
-    epic2_num = create_epic_issue(
-        title="[Epic 2] 动态粒子星空背景 (Dynamic Particle Background)",
-        body=epic2_body,
-        labels=['epic', 'phase-1', 'ui', 'animation', 'priority-p0'],
-        milestone=milestone1
-    )
+    with RUN.phase('milestones'):
+        create_milestones(None if selection.everything else used_milestones)
 
-    epic3_body = generate_epic3_body()
-    epic3_num = create_epic_issue(
-        title="[Epic 3] 3D 卡片悬浮效果 (3D Card Hover Effects)",
-        body=epic3_body,
-        labels=['epic', 'phase-1', 'ui', 'animation', 'priority-p1'],
-        milestone=milestone1
-    )
-
-    epic4_body = generate_epic4_body()
-    epic4_num = create_epic_issue(
-        title="[Epic 4] 动漫风格图标和插画 (Anime-style Icons and Illustrations)",
-        body=epic4_body,
-        labels=['epic', 'phase-2', 'ui', 'design', 'priority-p1'],
-        milestone=milestone2
-    )
-
-    epic5_body = generate_epic5_body()
-    epic5_num = create_epic_issue(
-        title="[Epic 5] 看板娘角色助手 (Kanban Musume Character Assistant)",
-        body=epic5_body,
-        labels=['epic', 'phase-2', 'ui', 'priority-p1'],
-        milestone=milestone2
-    )
-
-    # Step 4: Create Task Issues
-    print_header("Step 4: Creating Task Issues")
-    if epic1_num:
-        create_epic1_tasks(epic1_num, milestone1)
-    if epic2_num:
-        create_epic2_tasks(epic2_num, milestone1)
-    if epic3_num:
-        create_epic3_tasks(epic3_num, milestone1)
-    if epic4_num:
-        create_epic4_tasks(epic4_num, milestone2)
-    if epic5_num:
-        create_epic5_tasks(epic5_num, milestone2)
+    # Step 3: Create epics and tasks from the durable queue, most important first
+    # (bodies are rendered only for missing issues; tasks wait for their epic's number)
+    print_header("Step 3: Creating Epic and Task Issues")
+    deadline = run_start + args.max_duration if args.max_duration else None
+    try:
+        with JobQueue(state_dir() / 'queue.db' if shared else ':memory:',
+                      max_attempts=args.max_attempts) as queue:
+            queue.enqueue(plan)
+            delivered = drain(queue, plan, engine, deadline)
+        RUN.timing('total', time.perf_counter() - run_start)
+        manifest.finish_run(RUN.timings)
+    finally:
+        manifest.save(manifest_path)  # also after a crash or Ctrl-C: keep what was created
+    epic_numbers = {epic.plan_id: delivered.numbers.get(epic.plan_id) for epic in plan.epics}
+    if shared:
+        from issue_sync.history import record_current_run
+        record_current_run('sync', engine.backend.name, len(plan),
+                           manifest.run['counts'].get('epic_failed', 0)
+                           + manifest.run['counts'].get('task_failed', 0),
+                           manifest.run['started_at'])
 
     print_header("Summary")
-    print_success(f"Epic 1: #{epic1_num}")
-    print_success(f"Epic 2: #{epic2_num}")
-    print_success(f"Epic 3: #{epic3_num}")
-    print_success(f"Epic 4: #{epic4_num}")
-    print_success(f"Epic 5: #{epic5_num}")
-    print_info("All epics and tasks processed. Existing issues were skipped by title.")
+    for epic in plan.epics:
+        print_success(f"{epic.short_title}: #{epic_numbers[epic.plan_id]}")
+    task_numbers = [manifest.number(task.plan_id) for task in plan.tasks]
+    print_success(f"Tasks: {sum(1 for n in task_numbers if n)}/{len(task_numbers)} mapped to issues")
+    if shared:
+        print_info(f"Manifest: {manifest_path} ({len(manifest.items)} plan items)")
+    for job in delivered.dead:
+        print_error(f"Dead letter: {job['plan_id']} failed {job['attempts']} times ({job['error']})")
+    if delivered.blocked:
+        print_error(f"{len(delivered.blocked)} tasks wait for an epic that has no issue: "
+                    f"{', '.join(delivered.blocked[:5])}{' ...' if len(delivered.blocked) > 5 else ''}")
+    if delivered.dead or delivered.blocked:
+        print_info("The next run retries them; `create_all_issues.py queue` lists the queue")
+    if delivered.out_of_time:
+        print_info(f"--max-duration reached: {delivered.left} items stay queued for the next run")
+        return 1
+    if delivered.dead or delivered.blocked:
+        return 1
+    print_info("All selected epics and tasks processed. Existing issues were skipped by title.")
 
 if __name__ == '__main__':
     try:
-        main()
+        sys.exit(main() or 0)
     except KeyboardInterrupt:
         print_error("\nScript interrupted by user")
         sys.exit(1)
@@ -4,37 +4,19 @@ GitHub Issues Generator for UI/UX Upgrade Project
 Creates Epics, Tasks, Milestones, and Labels based on PRD
 """
 
-import subprocess
-import json
 import time
-from typing import Dict, List, Optional
+from typing import Dict, Optional
+
+from issue_sync.backends import Backend
+from issue_sync.engine import SyncEngine
 
 class GitHubIssueCreator:
-    def __init__(self, project_name: str = "nav_blog UI 升级"):
+    def __init__(self, project_name: str = "nav_blog UI 升级", backend: Optional[Backend] = None):
         self.project_name = project_name
+        self.engine = SyncEngine(backend)
         self.epic_numbers = {}
         self.milestone_numbers = {}
 
-    def run_gh_command(self, args: List[str], retry: int = 3) -> Optional[str]:
-        """Execute gh CLI command with retry logic"""
-        for attempt in range(retry):
-            try:
-                result = subprocess.run(
-                    ['gh'] + args,
-                    capture_output=True,
-                    text=True,
-                    check=True
-                )
-                return result.stdout.strip()
-            except subprocess.CalledProcessError as e:
-                if attempt < retry - 1:
-                    time.sleep(2)
-                    continue
-                print(f"Error executing command: {' '.join(args)}")
-                print(f"Error: {e.stderr}")
-                return None
-        return None
-
     def create_labels(self):
         """Create all necessary labels"""
         print("Creating labels...")
@@ -69,15 +51,7 @@ class GitHubIssueCreator:
             ("size-large", "d4c5f9", "3-4 hours"),
         ]
 
-        for name, color, description in labels:
-            result = self.run_gh_command([
-                'label', 'create', name,
-                '--color', color,
-                '--description', description,
-                '--force'
-            ])
-            if result is not None:
-                print(f"  ✓ Created label: {name}")
+        self.engine.ensure_labels(labels)
 
     def create_milestones(self):
         """Create project milestones"""
@@ -93,17 +67,8 @@ class GitHubIssueCreator:
             }
         ]
 
-        for milestone in milestones:
-            result = self.run_gh_command([
-                'api', 'repos/{owner}/{repo}/milestones',
-                '-f', f'title={milestone["title"]}',
-                '-f', f'description={milestone["description"]}',
-                '-f', 'state=open'
-            ])
-            if result:
-                data = json.loads(result)
-                self.milestone_numbers[milestone["title"]] = data['number']
-                print(f"  ✓ Created milestone: {milestone['title']} (#{data['number']})")
+        for title, milestone in self.engine.ensure_milestones(milestones).items():
+            self.milestone_numbers[title] = milestone.number
 
     def create_epic_issue(self, epic_data: Dict) -> Optional[int]:
         """Create an Epic issue"""
@@ -141,20 +106,9 @@ This epic will be broken down into {epic_data['task_count']} tasks:
 
         labels = ['epic'] + epic_data.get('labels', [])
 
-        result = self.run_gh_command([
-            'issue', 'create',
-            '--title', epic_data['title'],
-            '--body', body,
-            '--label', ','.join(labels),
-            '--milestone', str(self.milestone_numbers.get(epic_data['milestone'], ''))
-        ])
-
-        if result:
-            issue_url = result
-            issue_number = int(issue_url.split('/')[-1])
-            print(f"  ✓ Created Epic: {epic_data['title']} (#{issue_number})")
-            return issue_number
-        return None
+        return self.engine.ensure_issue(
+            epic_data['title'], body, labels, epic_data['milestone'], kind='Epic'
+        )
 
     def create_task_issue(self, task_data: Dict) -> Optional[int]:
         """Create a Task issue"""
@@ -216,20 +170,9 @@ gh pr create --title "{task_data['title']}" --body "Closes #{task_data['epic_num
 
         labels = task_data.get('labels', [])
 
-        result = self.run_gh_command([
-            'issue', 'create',
-            '--title', task_data['title'],
-            '--body', body,
-            '--label', ','.join(labels),
-            '--milestone', str(self.milestone_numbers.get(task_data['milestone'], ''))
-        ])
-
-        if result:
-            issue_url = result
-            issue_number = int(issue_url.split('/')[-1])
-            print(f"    ✓ Created Task: {task_data['title']} (#{issue_number})")
-            return issue_number
-        return None
+        return self.engine.ensure_issue(
+            task_data['title'], body, labels, task_data['milestone'], kind='Task'
+        )
 
     def create_all_issues(self):
         """Create all Epics and Tasks"""
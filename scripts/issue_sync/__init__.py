@@ -0,0 +1,46 @@
+"""
+Importable GitHub issue sync engine shared by the generator scripts
+
+Submodules are imported on first attribute access so that
+`import issue_sync` stays cheap for targeted command-line runs.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'Backend': 'backends',
+    'BackendError': 'backends',
+    'FakeBackend': 'backends',
+    'GhCliBackend': 'backends',
+    'GraphQLBackend': 'backends',
+    'RestBackend': 'backends',
+    'select_backend': 'backends',
+    'CachingTransport': 'cache',
+    'DiskCache': 'cache',
+    'DuplicateIndex': 'dedupe',
+    'SyncEngine': 'engine',
+    'IssueDraft': 'models',
+    'IssueRef': 'models',
+    'Label': 'models',
+    'Milestone': 'models',
+    'EpicItem': 'plan',
+    'Plan': 'plan',
+    'TaskItem': 'plan',
+    'synthetic_plan': 'plan',
+    'AIMDLimiter': 'scheduler',
+    'Selection': 'selection',
+    'Snapshot': 'snapshot',
+    'SnapshotStore': 'snapshot',
+    'load_snapshot': 'snapshot',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,292 @@
+"""
+Backlog analytics over the local snapshot
+
+Each issue is reduced once to a row of facts (epic, phase, priority,
+estimated hours, open/closed, created/closed day) which is cached in the
+snapshot's `facts` table and only re-parsed when the issue's updated_at
+changes. The facts are then loaded as columns and aggregated in bulk:
+NumPy (bincount/cumsum) when it is installed, plain `array` columns and
+loops otherwise. Both paths return the same numbers.
+"""
+
+import re
+import time
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: the pure-Python path is used instead
+    np = None
+
+FACTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    number INTEGER PRIMARY KEY,
+    updated_at TEXT,
+    is_task INTEGER,
+    epic INTEGER,       -- -1 when the title names no epic
+    phase INTEGER,      -- -1 without a phase-N label
+    priority INTEGER,   -- 0 for P0 ... 3 for P3, -1 unknown
+    hours REAL,
+    closed INTEGER,
+    created_day REAL,   -- days since the Unix epoch
+    closed_day REAL     -- NULL while open
+);
+"""
+COLUMNS = ('is_task', 'epic', 'phase', 'priority', 'hours', 'closed', 'created_day', 'closed_day')
+GROUPINGS = ('epic', 'phase', 'priority')
+
+_EPIC = re.compile(r'^\s*\[Epic\s*(\d+)(\s*-\s*Task)?', re.I)
+_PHASE_LABEL = re.compile(r'^phase-(\d+)$')
+_PRIORITY_LABEL = re.compile(r'^priority-p(\d)$', re.I)
+_PRIORITY_BODY = re.compile(r'\*\*Priority:\*\*\s*P(\d)', re.I)
+_ESTIMATE = re.compile(
+    r'\*\*Estimated Time:\*\*\s*([\d.]+)(?:\s*-\s*([\d.]+))?\s*(hours?|hrs?|h|minutes?|mins?|m|days?|d)\b',
+    re.I)
+_UNIT_HOURS = {'h': 1.0, 'm': 1 / 60, 'd': 8.0}  # a day of work is 8 hours
+
+
+def estimate_hours(body: Optional[str]) -> float:
+    """Hours from a task body's "**Estimated Time:** 2 hours" line (ranges use the midpoint)"""
+    match = _ESTIMATE.search(body or '')
+    if not match:
+        return 0.0
+    low = float(match.group(1))
+    high = float(match.group(2)) if match.group(2) else low
+    return (low + high) / 2 * _UNIT_HOURS[match.group(3)[0].lower()]
+
+
+def _day(timestamp: Optional[str]) -> Optional[float]:
+    if not timestamp:
+        return None
+    # fromisoformat is several times faster than strptime
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp() / 86400
+
+
+def issue_facts(row: Dict) -> Tuple:
+    """One facts row (in FACTS_SCHEMA order, after number/updated_at) for a snapshot issue"""
+    epic = _EPIC.match(row['title'])
+    phase = priority = -1
+    for name in row['labels']:
+        match = _PHASE_LABEL.match(name)
+        if match:
+            phase = int(match.group(1))
+        match = _PRIORITY_LABEL.match(name)
+        if match:
+            priority = int(match.group(1))
+    if priority < 0:
+        match = _PRIORITY_BODY.search(row['body'] or '')
+        if match:
+            priority = int(match.group(1))
+    closed = row['state'] == 'closed'
+    return (
+        1 if epic and epic.group(2) else 0,
+        int(epic.group(1)) if epic else -1,
+        phase,
+        priority,
+        estimate_hours(row['body']),
+        1 if closed else 0,
+        _day(row['created_at']),
+        _day(row['closed_at'] or (row['updated_at'] if closed else None)),
+    )
+
+
+def refresh_facts(store) -> int:
+    """Re-parse only issues added or updated since their facts were cached; returns how many"""
+    import json
+
+    store.db.executescript(FACTS_SCHEMA)
+    stale = store.db.execute(
+        "SELECT i.number, i.updated_at, i.title, i.state, i.body, i.labels, i.created_at, i.closed_at "
+        "FROM issues i LEFT JOIN facts f ON f.number = i.number "
+        "WHERE f.number IS NULL OR f.updated_at IS NOT i.updated_at").fetchall()
+    rows = []
+    for number, updated_at, title, state, body, labels, created_at, closed_at in stale:
+        row = {'title': title, 'state': state, 'body': body, 'labels': json.loads(labels or '[]'),
+               'created_at': created_at, 'closed_at': closed_at, 'updated_at': updated_at}
+        rows.append((number, updated_at) + issue_facts(row))
+    store.db.execute("DELETE FROM facts WHERE number NOT IN (SELECT number FROM issues)")
+    store.db.executemany(f"INSERT OR REPLACE INTO facts VALUES ({', '.join('?' * 10)})", rows)
+    store.db.commit()
+    return len(rows)
+
+
+class Columns:
+    """Task facts as parallel columns (NumPy arrays, or `array` when NumPy is missing)"""
+
+    def __init__(self, data: Dict[str, Sequence]):
+        self.data = data
+        self.size = len(data['hours'])
+
+    def __getitem__(self, name: str):
+        return self.data[name]
+
+    @classmethod
+    def load(cls, store, tasks_only: bool = True) -> 'Columns':
+        query = f"SELECT {', '.join(COLUMNS)} FROM facts"
+        if tasks_only:
+            query += " WHERE is_task = 1"
+        rows = store.db.execute(query).fetchall()
+        data = {}
+        for index, name in enumerate(COLUMNS):
+            values = [row[index] for row in rows]
+            if name in ('created_day', 'closed_day', 'hours'):
+                values = [float('nan') if v is None else v for v in values]
+                data[name] = np.array(values, dtype=np.float64) if np else array('d', values)
+            else:
+                data[name] = np.array(values, dtype=np.int64) if np else array('q', values)
+        return cls(data)
+
+
+def hours_by(columns: Columns, key: str) -> Dict[int, Dict[str, float]]:
+    """key value -> open/closed hours and task counts"""
+    keys, hours, closed = columns[key], columns['hours'], columns['closed']
+    result: Dict[int, Dict[str, float]] = {}
+    if np is not None:
+        if not columns.size:
+            return result
+        values, index = np.unique(keys, return_inverse=True)
+        is_closed = closed.astype(bool)
+        n = len(values)
+        sums = {
+            'open_hours': np.bincount(index, weights=np.where(is_closed, 0.0, hours), minlength=n),
+            'closed_hours': np.bincount(index, weights=np.where(is_closed, hours, 0.0), minlength=n),
+            'open': np.bincount(index, weights=(~is_closed).astype(np.float64), minlength=n),
+            'closed': np.bincount(index, weights=is_closed.astype(np.float64), minlength=n),
+        }
+        for position, value in enumerate(values.tolist()):
+            result[value] = {name: float(column[position]) for name, column in sums.items()}
+        return result
+    for value, h, c in zip(keys, hours, closed):
+        entry = result.setdefault(value, {'open_hours': 0.0, 'closed_hours': 0.0,
+                                          'open': 0.0, 'closed': 0.0})
+        if c:
+            entry['closed_hours'] += h
+            entry['closed'] += 1
+        else:
+            entry['open_hours'] += h
+            entry['open'] += 1
+    return dict(sorted(result.items()))
+
+
+def burndown(columns: Columns, days: int = 30, today: Optional[float] = None) -> List[Tuple[int, float]]:
+    """(day offset, remaining open hours at the end of that day) for the last `days` days"""
+    today = float(int(today if today is not None else time.time() / 86400))
+    start = today - days + 1
+    created, closed, hours = columns['created_day'], columns['closed_day'], columns['hours']
+    if np is not None:
+        # Work created before the window is added on its first day; work closed
+        # before the window is subtracted up front
+        created_at = np.clip(np.floor(np.nan_to_num(created, nan=start)) - start, 0, None)
+        added = np.bincount(created_at[created_at < days].astype(np.int64),
+                            weights=hours[created_at < days], minlength=days)
+        done = ~np.isnan(closed)
+        closed_at = np.floor(closed[done]) - start
+        before = closed_at < 0
+        removed = np.bincount(closed_at[~before & (closed_at < days)].astype(np.int64),
+                              weights=hours[done][~before & (closed_at < days)], minlength=days)
+        remaining = np.cumsum(added - removed) - hours[done][before].sum()
+        return [(day, float(value)) for day, value in zip(range(-days + 1, 1), remaining)]
+    added, removed, already = [0.0] * days, [0.0] * days, 0.0
+    for c, d, h in zip(created, closed, hours):
+        offset = 0 if c != c else max(0, int(c // 1 - start))
+        if offset < days:
+            added[offset] += h
+        if d == d:
+            offset = int(d // 1 - start)
+            if offset < 0:
+                already += h
+            elif offset < days:
+                removed[offset] += h
+    series, total = [], -already
+    for day in range(days):
+        total += added[day] - removed[day]
+        series.append((day - days + 1, total))
+    return series
+
+
+def throughput(columns: Columns, weeks: int = 8, today: Optional[float] = None) -> List[Tuple[int, int, float]]:
+    """(week offset, tasks closed, hours closed) for the last `weeks` 7-day windows"""
+    today = float(int(today if today is not None else time.time() / 86400))
+    closed, hours = columns['closed_day'], columns['hours']
+    if np is not None:
+        done = ~np.isnan(closed)
+        ago = ((today - np.floor(closed[done])) // 7).astype(np.int64)
+        recent = (ago >= 0) & (ago < weeks)
+        counts = np.bincount(ago[recent], minlength=weeks)
+        sums = np.bincount(ago[recent], weights=hours[done][recent], minlength=weeks)
+        return [(-week, int(counts[week]), float(sums[week])) for week in reversed(range(weeks))]
+    counts, sums = [0] * weeks, [0.0] * weeks
+    for d, h in zip(closed, hours):
+        if d != d:
+            continue
+        ago = int((today - d // 1) // 7)
+        if 0 <= ago < weeks:
+            counts[ago] += 1
+            sums[ago] += h
+    return [(-week, counts[week], sums[week]) for week in reversed(range(weeks))]
+
+
+def summary(columns: Columns) -> Dict[str, float]:
+    if np is not None:
+        is_closed = columns['closed'].astype(bool)
+        return {'tasks': columns.size, 'open': int((~is_closed).sum()),
+                'open_hours': float(columns['hours'][~is_closed].sum()),
+                'closed_hours': float(columns['hours'][is_closed].sum())}
+    open_hours = sum(h for h, c in zip(columns['hours'], columns['closed']) if not c)
+    return {'tasks': columns.size, 'open': sum(1 for c in columns['closed'] if not c),
+            'open_hours': open_hours, 'closed_hours': sum(columns['hours']) - open_hours}
+
+
+def _label(key: str, value: int) -> str:
+    if value < 0:
+        return '(none)'
+    return {'epic': f"Epic {value}", 'phase': f"phase-{value}", 'priority': f"P{value}"}[key]
+
+
+def run_analytics(args) -> int:
+    """`analytics` command"""
+    import json
+
+    from .console import print_error, print_info
+    from .paths import default_snapshot
+    from .snapshot import SnapshotStore
+
+    path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    if path.suffix == '.jsonl' or not path.exists():
+        print_error(f"No SQLite snapshot at {path}; run the snapshot command first")
+        return 1
+    start = time.perf_counter()
+    with SnapshotStore(path) as store:
+        parsed = refresh_facts(store)
+        columns = Columns.load(store)
+    report = {
+        'summary': summary(columns),
+        'by': {key: hours_by(columns, key) for key in GROUPINGS},
+        'burndown': burndown(columns, args.days),
+        'throughput': throughput(columns, args.weeks),
+    }
+    elapsed = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    total = report['summary']
+    print_info(f"{total['tasks']} tasks: {total['open']} open, {total['open_hours']:g}h open, "
+               f"{total['closed_hours']:g}h closed")
+    for key, groups in report['by'].items():
+        print(f"\n{'by ' + key:<14}{'open h':>9}{'closed h':>10}{'open':>7}{'closed':>8}{'done':>7}")
+        for value, entry in groups.items():
+            all_hours = entry['open_hours'] + entry['closed_hours']
+            share = entry['closed_hours'] / all_hours if all_hours else 0.0
+            print(f"{_label(key, value):<14}{entry['open_hours']:>9g}{entry['closed_hours']:>10g}"
+                  f"{entry['open']:>7g}{entry['closed']:>8g}{share:>7.0%}")
+    print(f"\nremaining open hours, last {args.days} days:")
+    print('  ' + ' '.join(f"{value:g}" for _, value in report['burndown']))
+    print(f"\nclosed per week, last {args.weeks} weeks (oldest first):")
+    print('  ' + ' '.join(f"{count}/{hours:g}h" for _, count, hours in report['throughput']))
+    print_info(f"Computed in {elapsed * 1000:.0f} ms ({parsed} issues re-parsed, "
+               f"{'numpy' if np is not None else 'pure Python'})")
+    return 0
@@ -0,0 +1,325 @@
+"""
+Execute a change set produced by `plan`
+
+Only the recorded changes are executed: missing labels and milestones
+first, then epics, then tasks (which need their epic's number). Creates and
+updates within a phase run concurrently; creates are grouped into batches of
+the backend's batch_size. An item whose plan content changed after `plan`
+was run is skipped so nothing unreviewed reaches GitHub, as is a create that
+`plan` flagged as a likely duplicate. A rewritten body keeps the task-list
+items that were ticked on GitHub.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .backends import Backend, BackendError
+from .console import print_error, print_info, print_success
+from .diff import CREATE, UPDATE, Change, ChangeSet
+from .metrics import RUN
+from .output import LABEL, MILESTONE, ndjson_writer, result_record
+from .models import IssueDraft, IssueRef
+from .plan import Plan, PlanItem, TaskItem, fingerprint
+from .pull import carry_checks
+from .transport import transport_stats
+
+
+class ApplyResult:
+    def __init__(self):
+        self.created: List[Tuple[Change, IssueRef, IssueDraft]] = []
+        self.updated: List[Tuple[Change, Dict]] = []
+        self.failed: List[Tuple[Change, str]] = []
+        self.skipped: List[Tuple[Change, str]] = []
+        self.labels: List[Dict] = []
+        self.milestones: List[Dict] = []
+
+
+def _run_all(jobs: List[Callable[[], None]], workers: int):
+    if not jobs:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for future in as_completed([pool.submit(job) for job in jobs]):
+            future.result()
+
+
+class Applier:
+    def __init__(self, backend: Backend, plan: Plan, label_specs: Dict[str, Tuple[str, str]],
+                 milestone_specs: Dict[str, str], workers: int = 8,
+                 on_result: Optional[Callable[[Dict], None]] = None,
+                 existing: Optional[Dict[int, Dict]] = None, allow_duplicates: bool = False):
+        self.backend = backend
+        self.plan = plan
+        self.label_specs = label_specs          # name -> (color, description)
+        self.milestone_specs = milestone_specs  # title -> description
+        self.workers = workers
+        self.on_result = on_result
+        self.existing = existing or {}          # snapshot rows by issue number
+        self.allow_duplicates = allow_duplicates
+        self.result = ApplyResult()
+        self.items: Dict[str, PlanItem] = {item.plan_id: item for item in plan.epics + plan.tasks}
+
+    def _emit(self, type_: str, action: str, title: str, *args, **kwargs):
+        if self.on_result is not None:
+            self.on_result(result_record(type_, action, title, *args, **kwargs))
+
+    def _report(self, change: Change, action: str, title: str, *args, **kwargs):
+        kind = 'task' if '.' in change.plan_id else 'epic'
+        self._emit(kind, action, title, change.plan_id, *args, **kwargs)
+
+    def _body(self, item: PlanItem, epic_numbers: Dict[str, Optional[int]]) -> str:
+        if isinstance(item, TaskItem):
+            return item.render_body(epic_numbers.get(item.epic_id), self.plan.epic(item.epic_id).title)
+        return item.render_body()
+
+    def _current(self, change: Change) -> Optional[PlanItem]:
+        item = self.items.get(change.plan_id)
+        if item is None:
+            self.result.skipped.append((change, "no longer in the plan"))
+            self._report(change, 'skipped', change.title, change.number, error="no longer in the plan")
+            return None
+        epic_title = self.plan.epic(item.epic_id).title if isinstance(item, TaskItem) else ''
+        if change.digest and fingerprint(item, epic_title) != change.digest:
+            self.result.skipped.append((change, "plan changed since the change set was computed"))
+            self._report(change, 'skipped', change.title, change.number,
+                         error="plan changed since the change set was computed")
+            return None
+        return item
+
+    def _create_batch(self, batch: List[Tuple[Change, IssueDraft]], epic_numbers: Dict):
+        start = time.perf_counter()
+        try:
+            refs = self.backend.create_issues([draft for _, draft in batch])
+        except BackendError as e:
+            refs = [None] * len(batch)
+            error = str(e)
+        else:
+            error = "creation failed"
+        latency = time.perf_counter() - start
+        for (change, draft), ref in zip(batch, refs):
+            if ref is None:
+                self.result.failed.append((change, error))
+                print_error(f"{change.plan_id}: {error}")
+                self._report(change, 'failed', draft.title, error=error)
+                continue
+            change.number = ref.number
+            if change.plan_id in epic_numbers:
+                epic_numbers[change.plan_id] = ref.number
+            self.result.created.append((change, ref, draft))
+            print_success(f"Created {change.plan_id}: {draft.title} (#{ref.number})")
+            self._report(change, 'created', draft.title, ref.number, ref.url, ref.node_id, latency)
+
+    def _update(self, change: Change, item: PlanItem, epic_numbers: Dict):
+        fields = {}
+        if 'body' in change.fields:
+            previous = self.existing.get(change.number, {}).get('body')
+            fields['body'] = carry_checks(self._body(item, epic_numbers), previous)
+        if 'milestone' in change.fields:
+            fields['milestone'] = item.milestone
+        if 'labels' in change.fields:
+            fields['add_labels'] = change.add_labels
+        start = time.perf_counter()
+        try:
+            ref = self.backend.update_issue(change.number, **fields)
+        except BackendError as e:
+            self.result.failed.append((change, str(e)))
+            print_error(f"{change.plan_id}: {e}")
+            self._report(change, 'failed', change.title, change.number, error=str(e))
+            return
+        self.result.updated.append((change, fields))
+        print_success(f"Updated {change.plan_id}: #{change.number} ({', '.join(change.fields)})")
+        self._report(change, 'updated', change.title, change.number, ref.url, ref.node_id,
+                     time.perf_counter() - start)
+
+    def _phase(self, changes: List[Change], epic_numbers: Dict):
+        creates: List[Tuple[Change, IssueDraft]] = []
+        jobs: List[Callable[[], None]] = []
+        for change in changes:
+            item = self._current(change)
+            if item is None:
+                continue
+            if change.action == CREATE and change.duplicate and not self.allow_duplicates:
+                reason = f"likely duplicate of #{change.duplicate[0]}"
+                self.result.skipped.append((change, reason))
+                self._report(change, 'skipped', change.title, change.duplicate[0], error=reason)
+            elif change.action == CREATE:
+                creates.append((change, IssueDraft(item.title, self._body(item, epic_numbers),
+                                                   list(item.labels), item.milestone)))
+            elif change.action == UPDATE:
+                jobs.append(lambda change=change, item=item: self._update(change, item, epic_numbers))
+        size = max(1, self.backend.batch_size)
+        for start in range(0, len(creates), size):
+            batch = creates[start:start + size]
+            jobs.append(lambda batch=batch: self._create_batch(batch, epic_numbers))
+        _run_all(jobs, self.workers)
+
+    def apply(self, change_set: ChangeSet) -> ApplyResult:
+        with RUN.phase('labels'):
+            self._apply_labels(change_set.labels)
+        with RUN.phase('milestones'):
+            self._apply_milestones(change_set.milestones)
+
+        epic_numbers: Dict[str, Optional[int]] = dict(change_set.epic_numbers)
+        pending = change_set.pending()
+        with RUN.phase('epics'):
+            self._phase([c for c in pending if '.' not in c.plan_id], epic_numbers)
+
+        tasks = []
+        for change in pending:
+            if '.' not in change.plan_id:
+                continue
+            if not epic_numbers.get(change.plan_id.split('.')[0]):
+                self.result.skipped.append((change, "its epic does not exist"))
+                self._report(change, 'skipped', change.title, change.number,
+                             error="its epic does not exist")
+                continue
+            tasks.append(change)
+        with RUN.phase('tasks'):
+            self._phase(tasks, epic_numbers)
+        return self.result
+
+    def _apply_labels(self, names: List[str]):
+        for name in names:
+            color, description = self.label_specs.get(name, ('ededed', ''))
+            start = time.perf_counter()
+            try:
+                label = self.backend.ensure_label(name, color, description)
+                self.result.labels.append({'name': name, 'color': color, 'description': description,
+                                           'node_id': label.node_id})
+                print_success(f"Label: {name}")
+                self._emit(LABEL, 'created', name, node_id=label.node_id,
+                           latency=time.perf_counter() - start)
+            except BackendError as e:
+                print_error(str(e))
+                self._emit(LABEL, 'failed', name, error=str(e))
+
+    def _apply_milestones(self, titles: List[str]):
+        for title in titles:
+            start = time.perf_counter()
+            try:
+                milestone = self.backend.create_milestone(title, self.milestone_specs.get(title, ''))
+                self.result.milestones.append({
+                    'number': milestone.number, 'title': title, 'state': 'open',
+                    'description': milestone.description, 'node_id': milestone.node_id,
+                    'updated_at': None,
+                })
+                print_success(f"Milestone: {title} (#{milestone.number})")
+                self._emit(MILESTONE, 'created', title, number=milestone.number,
+                           node_id=milestone.node_id, latency=time.perf_counter() - start)
+            except BackendError as e:
+                print_error(str(e))
+                self._emit(MILESTONE, 'failed', title, error=str(e))
+
+
+def record_applied(store, snapshot_issues: Dict[int, Dict], result: ApplyResult):
+    """Write what was just applied into the SQLite snapshot so the next plan is accurate"""
+    now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    rows = []
+    for change, ref, draft in result.created:
+        rows.append({
+            'number': ref.number, 'node_id': ref.node_id, 'title': draft.title, 'state': 'open',
+            'state_reason': None, 'body': draft.body, 'labels': list(draft.labels),
+            'milestone': draft.milestone, 'url': ref.url, 'comments': 0,
+            'created_at': now, 'updated_at': now, 'closed_at': None,
+        })
+    for change, fields in result.updated:
+        row = dict(snapshot_issues.get(change.number) or {})
+        if not row:
+            continue
+        if 'body' in fields:
+            row['body'] = fields['body']
+        if 'milestone' in fields:
+            row['milestone'] = fields['milestone']
+        row['labels'] = list(row.get('labels', [])) + list(fields.get('add_labels', []))
+        row['updated_at'] = now
+        rows.append(row)
+    if rows:
+        store.upsert_issues(rows)
+    # the webhook receiver or a refresh may have stored them already
+    for label in result.labels:
+        store.upsert_label(label)
+    for milestone in result.milestones:
+        store.upsert_milestone(milestone)
+
+
+def run_apply(args) -> int:
+    """`apply` command"""
+    from .backends import select_backend
+    from .history import record_current_run
+    from .manifest import Manifest
+    from .output import tee
+    from .paths import default_manifest, default_snapshot, state_dir
+    from .scheduler import adapt_concurrency
+    from .selection import Selection
+    from .snapshot import SnapshotStore
+
+    writer = ndjson_writer(args)
+    path = Path(args.changes) if args.changes else state_dir() / 'changes.json'
+    if not path.exists():
+        print_error(f"No change set at {path}; run the plan command first")
+        return 1
+    change_set = ChangeSet.load(path)
+    if change_set.empty:
+        print_info("Nothing to apply")
+        return 0
+    pending = change_set.pending()
+
+    source = args.load_plan_source()
+    wanted = {c.plan_id for c in pending} | set(change_set.epic_numbers)
+    plan = source.load_plan(Selection(tasks=wanted))
+    backend = select_backend(args.backend)
+    limiter = getattr(getattr(backend, 'transport', None), 'limiter', None)
+    workers = adapt_concurrency(getattr(backend, 'transport', None), args.workers, args.max_workers)
+    snapshot_path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    issues: Dict[int, Dict] = {}
+    if snapshot_path.suffix != '.jsonl' and snapshot_path.exists():
+        with SnapshotStore(snapshot_path) as store:
+            issues = {row['number']: row for row in store.issues()}
+    # fake issue numbers must not reach the manifest, history or snapshot
+    manifest_path = default_manifest() if backend.shared else None
+    manifest = Manifest.load(manifest_path)
+    manifest.begin_run('apply', backend.name, str(path))
+    applier = Applier(
+        backend, plan,
+        {name: (color, description) for name, color, description in source.LABELS},
+        {m['title']: m.get('description', '') for m in source.MILESTONES},
+        workers=workers,
+        on_result=tee(writer, manifest.record),
+        existing=issues,
+        allow_duplicates=args.allow_duplicates,
+    )
+    start = time.perf_counter()
+    try:
+        result = applier.apply(change_set)
+        elapsed = time.perf_counter() - start
+        RUN.timing('total', elapsed)
+        manifest.finish_run(RUN.timings)
+    finally:
+        manifest.save(manifest_path)  # also when cut short: keep the issues already created
+
+    for change, reason in result.skipped:
+        print_info(f"Skipped {change.plan_id}: {reason}")
+    print_info(f"Applied in {elapsed:.1f}s: {len(result.created)} created, "
+               f"{len(result.updated)} updated, {len(result.failed)} failed, "
+               f"{len(result.skipped)} skipped")
+    stats = transport_stats(getattr(backend, 'transport', None))
+    if stats.get('coalesced'):
+        print_info(f"{stats['coalesced']} duplicate concurrent reads were coalesced")
+    if stats.get('budget_waits'):
+        print_info(f"{stats['budget_waits']} requests waited {stats['budget_wait_ms'] / 1000:.1f}s "
+                   f"in total for the shared rate-limit budget")
+    if limiter is not None:
+        print_info(f"Concurrency limit: {limiter.current} (peak "
+                   f"{RUN.gauges.get('concurrency_limit_max', limiter.current):g}, "
+                   f"{limiter.throttled} throttled responses)")
+    RUN.save(state_dir() / 'metrics.json')
+    if not backend.shared:
+        return 1 if result.failed else 0
+    record_current_run('apply', backend.name, len(pending), len(result.failed),
+                       manifest.run['started_at'])
+
+    if snapshot_path.suffix != '.jsonl' and snapshot_path.exists():
+        with SnapshotStore(snapshot_path) as store:
+            record_applied(store, issues, result)
+    return 1 if result.failed else 0
@@ -0,0 +1,738 @@
+"""
+Backends that talk to GitHub on behalf of the sync engine
+
+Every backend implements the same small interface (labels, milestones,
+issue index, issue creation) so the engine does not care whether calls go
+through the gh CLI, the REST API, batched GraphQL mutations or memory.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+from .metrics import RUN
+from .models import IssueDraft, IssueEdit, IssueRef, Label, Milestone
+from .transport import (HttpTransport, TransportError, build_transport, next_link, resolve_repo,
+                        resolve_token)
+
+
+class BackendError(Exception):
+    """Raised when a backend operation cannot be completed"""
+
+
+class Backend:
+    """Interface shared by all backends"""
+
+    name = 'base'
+    batch_size = 1  # issues per create_issues() round trip
+    shared = True   # state lives on GitHub, so snapshots and other processes see it
+
+    @classmethod
+    def available(cls) -> bool:
+        return False
+
+    def list_labels(self) -> List[Label]:
+        raise NotImplementedError
+
+    def ensure_label(self, name: str, color: str, description: str) -> Label:
+        """Create the label, or update it in place when it already exists"""
+        raise NotImplementedError
+
+    def list_milestones(self) -> List[Milestone]:
+        raise NotImplementedError
+
+    def create_milestone(self, title: str, description: str) -> Milestone:
+        raise NotImplementedError
+
+    def list_issues(self) -> List[IssueRef]:
+        """Return every issue (open and closed), without pull requests"""
+        raise NotImplementedError
+
+    def create_issue(self, draft: IssueDraft) -> IssueRef:
+        raise NotImplementedError
+
+    def update_issue(self, number: int, title: Optional[str] = None, body: Optional[str] = None,
+                     milestone: Optional[str] = None, add_labels: Sequence[str] = (),
+                     remove_labels: Sequence[str] = (), state: Optional[str] = None,
+                     state_reason: Optional[str] = None) -> IssueRef:
+        """Change only the given fields; labels are added/removed, not replaced
+
+        An empty `milestone` removes the issue's milestone. `state_reason`
+        (completed, not_planned) applies when closing.
+        """
+        raise NotImplementedError
+
+    def add_comment(self, number: int, body: str) -> str:
+        """Comment on an issue; returns the comment's URL"""
+        raise NotImplementedError
+
+    def repository_id(self) -> str:
+        """GraphQL node ID of the repository"""
+        raise NotImplementedError
+
+    def list_project_items(self, project: int) -> List[Dict]:
+        """Items of a Projects (v2) board owned by the repository owner:
+        dicts with id, issue_number and content_id"""
+        raise NotImplementedError
+
+    def prime(self, labels: Optional[List[Label]] = None,
+              milestones: Optional[List[Milestone]] = None):
+        """Seed the backend's lookup caches with already fetched metadata"""
+
+    def create_issues(self, drafts: List[IssueDraft]) -> List[Optional[IssueRef]]:
+        """Create several issues; backends that can batch override this"""
+        results = []
+        for draft in drafts:
+            try:
+                results.append(self.create_issue(draft))
+            except BackendError:
+                results.append(None)
+        return results
+
+    def update_issues(self, edits: List[IssueEdit]) -> List[Optional[str]]:
+        """Apply several edits; returns an error message or None per edit"""
+        errors: List[Optional[str]] = []
+        for edit in edits:
+            try:
+                self.update_issue(edit.number, milestone=edit.milestone,
+                                  add_labels=edit.add_labels, remove_labels=edit.remove_labels,
+                                  state=edit.state, state_reason=edit.state_reason)
+                errors.append(None)
+            except BackendError as e:
+                errors.append(str(e))
+        return errors
+
+
+class GhCliBackend(Backend):
+    """Shells out to the gh CLI, one process per call"""
+
+    name = 'gh'
+
+    def __init__(self, retry: int = 3, timeout: float = 30):
+        from .budget import shared_budget
+
+        self.retry = retry
+        self.timeout = timeout
+        self.budget = shared_budget(resolve_token())
+
+    @classmethod
+    def available(cls) -> bool:
+        return shutil.which('gh') is not None
+
+    def run(self, args: List[str]) -> str:
+        """Execute gh CLI command with retry logic"""
+        env = dict(os.environ)
+        env['GH_PROMPT_DISABLED'] = '1'
+        env['GH_NO_UPDATE_NOTIFIER'] = '1'
+
+        for attempt in range(self.retry):
+            if attempt:
+                RUN.incr('retries')
+            RUN.incr('requests')
+            if self.budget is not None:
+                from .budget import classify_gh
+
+                self.budget.acquire(*classify_gh(args))
+            try:
+                result = subprocess.run(
+                    ['gh'] + args,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    env=env,
+                    timeout=self.timeout
+                )
+                return result.stdout.strip()
+            except subprocess.TimeoutExpired:
+                raise BackendError(f"Command timed out: gh {' '.join(args)}")
+            except subprocess.CalledProcessError as e:
+                if attempt < self.retry - 1:
+                    time.sleep(2)
+                    continue
+                raise BackendError(f"Command failed: gh {' '.join(args)}\n{e.stderr}")
+        raise BackendError(f"Command failed: gh {' '.join(args)}")
+
+    def _charge_pages(self, args: List[str], items: int, per_page: int = 100):
+        """gh reads long lists page by page in one call; charge the pages after the first"""
+        if self.budget is not None and items > per_page:
+            from .budget import classify_gh
+
+            self.budget.charge(*classify_gh(args), (items - 1) // per_page)
+
+    def list_labels(self) -> List[Label]:
+        data = json.loads(self.run([
+            'label', 'list', '--limit', '1000', '--json', 'name,color,description,id'
+        ]) or '[]')
+        return [Label(d['name'], d.get('color', ''), d.get('description', ''), d.get('id', ''))
+                for d in data]
+
+    def ensure_label(self, name: str, color: str, description: str) -> Label:
+        self.run(['label', 'create', name, '--color', color,
+                  '--description', description, '--force'])
+        return Label(name, color, description)
+
+    def list_milestones(self) -> List[Milestone]:
+        args = ['api', '--paginate', 'repos/{owner}/{repo}/milestones?state=all&per_page=100']
+        data = _concat_pages(self.run(args))
+        self._charge_pages(args, len(data))
+        return [_milestone_from_rest(d) for d in data]
+
+    def create_milestone(self, title: str, description: str) -> Milestone:
+        data = json.loads(self.run([
+            'api', 'repos/{owner}/{repo}/milestones',
+            '-f', f'title={title}',
+            '-f', f'description={description}',
+            '-f', 'state=open'
+        ]))
+        return _milestone_from_rest(data)
+
+    def list_issues(self) -> List[IssueRef]:
+        args = ['issue', 'list', '--state', 'all', '--limit', '100000',
+                '--json', 'number,title,url,id']
+        data = json.loads(self.run(args) or '[]')
+        self._charge_pages(args, len(data))
+        return [IssueRef(d['number'], d['title'], d.get('url', ''), d.get('id', '')) for d in data]
+
+    def repository_id(self) -> str:
+        return self.run(['repo', 'view', '--json', 'id', '--jq', '.id'])
+
+    def list_project_items(self, project: int) -> List[Dict]:
+        owner = self.run(['repo', 'view', '--json', 'owner', '--jq', '.owner.login'])
+        args = ['project', 'item-list', str(project), '--owner', owner,
+                '--format', 'json', '--limit', '100000']
+        data = json.loads(self.run(args) or '{}')
+        self._charge_pages(args, len(data.get('items', [])))
+        return [{'id': item['id'], 'issue_number': (item.get('content') or {}).get('number'),
+                 'content_id': None} for item in data.get('items', [])]
+
+    def create_issue(self, draft: IssueDraft) -> IssueRef:
+        args = ['issue', 'create', '--title', draft.title, '--body', draft.body]
+        if draft.labels:
+            args += ['--label', ','.join(draft.labels)]
+        if draft.milestone:
+            args += ['--milestone', draft.milestone]
+        url = self.run(args)
+        return IssueRef(int(url.split('/')[-1]), draft.title, url)
+
+    def update_issue(self, number: int, title: Optional[str] = None, body: Optional[str] = None,
+                     milestone: Optional[str] = None, add_labels: Sequence[str] = (),
+                     remove_labels: Sequence[str] = (), state: Optional[str] = None,
+                     state_reason: Optional[str] = None) -> IssueRef:
+        args = ['issue', 'edit', str(number)]
+        if title is not None:
+            args += ['--title', title]
+        if body is not None:
+            args += ['--body', body]
+        if milestone:
+            args += ['--milestone', milestone]
+        elif milestone is not None:
+            args += ['--remove-milestone']
+        if add_labels:
+            args += ['--add-label', ','.join(add_labels)]
+        if remove_labels:
+            args += ['--remove-label', ','.join(remove_labels)]
+        url = self.run(args) if len(args) > 3 else ''
+        if state == 'closed':
+            reason = ['--reason', state_reason.replace('_', ' ')] if state_reason else []
+            self.run(['issue', 'close', str(number)] + reason)
+        elif state == 'open':
+            self.run(['issue', 'reopen', str(number)])
+        return IssueRef(number, title or '', url)
+
+    def add_comment(self, number: int, body: str) -> str:
+        return self.run(['issue', 'comment', str(number), '--body', body])
+
+
+def _concat_pages(output: str) -> List[Dict]:
+    """`gh api --paginate` prints one JSON array per page back to back"""
+    decoder = json.JSONDecoder()
+    items, index = [], 0
+    output = output.strip()
+    while index < len(output):
+        page, index = decoder.raw_decode(output, index)
+        items.extend(page)
+        while index < len(output) and output[index].isspace():
+            index += 1
+    return items
+
+
+def _milestone_from_rest(data: Dict) -> Milestone:
+    return Milestone(data['number'], data['title'], data.get('description') or '',
+                     data.get('node_id', ''))
+
+
+def _issue_from_rest(data: Dict) -> IssueRef:
+    return IssueRef(data['number'], data['title'], data.get('html_url', ''), data.get('node_id', ''))
+
+
+class RestBackend(Backend):
+    """Talks to the REST API over a persistent HTTPS connection"""
+
+    name = 'rest'
+
+    def __init__(self, repo: Optional[str] = None, transport: Optional[HttpTransport] = None):
+        self.repo = repo or resolve_repo()
+        if not self.repo:
+            raise BackendError("Cannot determine repository; set GITHUB_REPOSITORY=owner/name")
+        if transport is None:
+            token = resolve_token()
+            if not token:
+                raise BackendError("No GitHub token; set GH_TOKEN or run `gh auth login`")
+            transport = build_transport(token)
+        self.transport = transport
+        self._milestones: Optional[Dict[str, Milestone]] = None
+        self._repository_id: Optional[str] = None
+
+    @classmethod
+    def available(cls) -> bool:
+        return resolve_token() is not None and resolve_repo() is not None
+
+    def _call(self, method: str, path: str, payload=None):
+        try:
+            return self.transport.request(method, path, payload).json()
+        except TransportError as e:
+            raise BackendError(f"{method} {path} failed: {e}") from e
+
+    def _get_all(self, path: str) -> List[Dict]:
+        """Follow Link: rel="next" until every page has been read"""
+        items: List[Dict] = []
+        url: Optional[str] = path
+        while url:
+            try:
+                response = self.transport.get(url)
+            except TransportError as e:
+                raise BackendError(f"GET {url} failed: {e}") from e
+            items.extend(response.json() or [])
+            url = next_link(response.headers)
+        return items
+
+    def list_labels(self) -> List[Label]:
+        return [Label(d['name'], d.get('color', ''), d.get('description') or '', d.get('node_id', ''))
+                for d in self._get_all(f"/repos/{self.repo}/labels?per_page=100")]
+
+    def ensure_label(self, name: str, color: str, description: str) -> Label:
+        payload = {'name': name, 'color': color, 'description': description}
+        try:
+            data = self.transport.request('POST', f"/repos/{self.repo}/labels", payload).json()
+        except TransportError as e:
+            if e.status != 422:
+                raise BackendError(f"Creating label {name} failed: {e}") from e
+            # Already exists: mirror `gh label create --force`
+            data = self._call('PATCH', f"/repos/{self.repo}/labels/{quote(name)}", payload)
+        return Label(data['name'], data.get('color', ''), data.get('description') or '',
+                     data.get('node_id', ''))
+
+    def list_milestones(self) -> List[Milestone]:
+        milestones = [_milestone_from_rest(d)
+                      for d in self._get_all(f"/repos/{self.repo}/milestones?state=all&per_page=100")]
+        self._milestones = {m.title: m for m in milestones}
+        return milestones
+
+    def create_milestone(self, title: str, description: str) -> Milestone:
+        milestone = _milestone_from_rest(self._call('POST', f"/repos/{self.repo}/milestones", {
+            'title': title, 'description': description, 'state': 'open'
+        }))
+        if self._milestones is not None:
+            self._milestones[title] = milestone
+        return milestone
+
+    def _milestone(self, title: Optional[str]) -> Optional[Milestone]:
+        if not title:
+            return None
+        if self._milestones is None or title not in self._milestones:
+            self.list_milestones()
+        milestone = self._milestones.get(title)
+        if milestone is None:
+            raise BackendError(f"Unknown milestone: {title}")
+        return milestone
+
+    def repository_id(self) -> str:
+        if self._repository_id is None:
+            self._repository_id = self._call('GET', f"/repos/{self.repo}")['node_id']
+        return self._repository_id
+
+    def list_project_items(self, project: int) -> List[Dict]:
+        from .snapshot import fetch_project_items
+
+        try:
+            return fetch_project_items(self.transport, self.repo.split('/')[0], project)
+        except TransportError as e:
+            raise BackendError(f"Listing project {project} failed: {e}") from e
+
+    def prime(self, labels: Optional[List[Label]] = None,
+              milestones: Optional[List[Milestone]] = None):
+        if milestones is not None:
+            self._milestones = {m.title: m for m in milestones}
+
+    def list_issues(self) -> List[IssueRef]:
+        return [_issue_from_rest(d)
+                for d in self._get_all(f"/repos/{self.repo}/issues?state=all&per_page=100")
+                if 'pull_request' not in d]
+
+    def create_issue(self, draft: IssueDraft) -> IssueRef:
+        payload = {'title': draft.title, 'body': draft.body, 'labels': list(draft.labels)}
+        milestone = self._milestone(draft.milestone)
+        if milestone:
+            payload['milestone'] = milestone.number
+        return _issue_from_rest(self._call('POST', f"/repos/{self.repo}/issues", payload))
+
+    def update_issue(self, number: int, title: Optional[str] = None, body: Optional[str] = None,
+                     milestone: Optional[str] = None, add_labels: Sequence[str] = (),
+                     remove_labels: Sequence[str] = (), state: Optional[str] = None,
+                     state_reason: Optional[str] = None) -> IssueRef:
+        path = f"/repos/{self.repo}/issues/{number}"
+        payload = {}
+        if title is not None:
+            payload['title'] = title
+        if body is not None:
+            payload['body'] = body
+        if milestone is not None:
+            payload['milestone'] = self._milestone(milestone).number if milestone else None
+        if state is not None:
+            payload['state'] = state
+            if state_reason:
+                payload['state_reason'] = state_reason
+        data = self._call('PATCH', path, payload) if payload else None
+        if add_labels:
+            self._call('POST', f"{path}/labels", {'labels': list(add_labels)})
+        for name in remove_labels:
+            try:
+                self.transport.request('DELETE', f"{path}/labels/{quote(name)}")
+            except TransportError as e:
+                if e.status != 404:  # label was not on the issue
+                    raise BackendError(f"Removing label {name} from #{number} failed: {e}") from e
+        if data is None:
+            return IssueRef(number)
+        return _issue_from_rest(data)
+
+    def add_comment(self, number: int, body: str) -> str:
+        data = self._call('POST', f"/repos/{self.repo}/issues/{number}/comments", {'body': body})
+        return data.get('html_url', '')
+
+
+class GraphQLBackend(RestBackend):
+    """REST for metadata, batched GraphQL mutations for issue creation and edits
+
+    Up to `batch_size` issues are created or edited per round trip using
+    aliased createIssue (or updateIssue, closeIssue, label) mutations.
+    """
+
+    name = 'graphql'
+    batch_size = 20
+
+    def __init__(self, repo: Optional[str] = None, transport: Optional[HttpTransport] = None,
+                 batch_size: int = 20):
+        super().__init__(repo, transport)
+        self.batch_size = batch_size
+        self._label_ids: Optional[Dict[str, str]] = None
+
+    def graphql(self, query: str, variables: Optional[Dict] = None) -> Dict:
+        data = self._call('POST', '/graphql', {'query': query, 'variables': variables or {}})
+        if data.get('errors') and not data.get('data'):
+            raise BackendError(f"GraphQL error: {data['errors'][0].get('message')}")
+        return data
+
+    def prime(self, labels: Optional[List[Label]] = None,
+              milestones: Optional[List[Milestone]] = None):
+        super().prime(labels, milestones)
+        if labels is not None:
+            self._label_ids = {label.name: label.node_id for label in labels}
+
+    def _label_id(self, name: str) -> str:
+        if self._label_ids is None or name not in self._label_ids:
+            self._label_ids = {label.name: label.node_id for label in self.list_labels()}
+        if name not in self._label_ids:
+            raise BackendError(f"Unknown label: {name}")
+        return self._label_ids[name]
+
+    def create_issue(self, draft: IssueDraft) -> IssueRef:
+        for name in draft.labels:  # raise the real error rather than a bare failure
+            self._label_id(name)
+        self._milestone(draft.milestone)
+        result = self.create_issues([draft])[0]
+        if result is None:
+            raise BackendError(f"Creating issue failed: {draft.title}")
+        return result
+
+    def create_issues(self, drafts: List[IssueDraft]) -> List[Optional[IssueRef]]:
+        results: List[Optional[IssueRef]] = []
+        for start in range(0, len(drafts), self.batch_size):
+            results.extend(self._create_batch(drafts[start:start + self.batch_size]))
+        return results
+
+    def _create_batch(self, drafts: List[IssueDraft]) -> List[Optional[IssueRef]]:
+        """Drafts with an unknown label or milestone get None; the rest are still sent"""
+        repository_id = self.repository_id()
+        declarations, fields, variables = [], [], {}
+        for i, draft in enumerate(drafts):
+            try:
+                issue_input = {
+                    'repositoryId': repository_id,
+                    'title': draft.title,
+                    'body': draft.body,
+                    'labelIds': [self._label_id(name) for name in draft.labels],
+                }
+                milestone = self._milestone(draft.milestone)
+            except BackendError:
+                continue
+            if milestone:
+                issue_input['milestoneId'] = milestone.node_id
+            declarations.append(f"$i{i}:CreateIssueInput!")
+            fields.append(f"c{i}:createIssue(input:$i{i}){{issue{{number title url id}}}}")
+            variables[f"i{i}"] = issue_input
+
+        if not fields:
+            return [None] * len(drafts)
+
+        query = f"mutation({','.join(declarations)}){{{' '.join(fields)}}}"
+        data = self.graphql(query, variables).get('data') or {}
+        results: List[Optional[IssueRef]] = []
+        for i in range(len(drafts)):
+            issue = ((data.get(f"c{i}") or {}).get('issue'))
+            if issue is None:
+                results.append(None)
+            else:
+                results.append(IssueRef(issue['number'], issue['title'], issue['url'], issue['id']))
+        return results
+
+    def update_issues(self, edits: List[IssueEdit]) -> List[Optional[str]]:
+        errors: List[Optional[str]] = []
+        for start in range(0, len(edits), self.batch_size):
+            batch = edits[start:start + self.batch_size]
+            try:
+                errors.extend(self._update_batch(batch))
+            except BackendError as e:
+                errors.extend([str(e)] * len(batch))
+        return errors
+
+    def _edit_mutations(self, i: int, edit: IssueEdit) -> List[Tuple[str, str, str, Dict]]:
+        """(alias, mutation, input type, input) for one edit"""
+        mutations = []
+        if edit.milestone is not None:
+            milestone = self._milestone(edit.milestone)
+            mutations.append((f"m{i}", 'updateIssue', 'UpdateIssueInput',
+                              {'id': edit.node_id,
+                               'milestoneId': milestone.node_id if milestone else None}))
+        if edit.add_labels:
+            mutations.append((f"a{i}", 'addLabelsToLabelable', 'AddLabelsToLabelableInput',
+                              {'labelableId': edit.node_id,
+                               'labelIds': [self._label_id(name) for name in edit.add_labels]}))
+        if edit.remove_labels:
+            mutations.append((f"r{i}", 'removeLabelsFromLabelable',
+                              'RemoveLabelsFromLabelableInput',
+                              {'labelableId': edit.node_id,
+                               'labelIds': [self._label_id(name) for name in edit.remove_labels]}))
+        if edit.state == 'closed':
+            close = {'issueId': edit.node_id}
+            if edit.state_reason:
+                close['stateReason'] = edit.state_reason.upper()
+            mutations.append((f"s{i}", 'closeIssue', 'CloseIssueInput', close))
+        elif edit.state == 'open':
+            mutations.append((f"s{i}", 'reopenIssue', 'ReopenIssueInput',
+                              {'issueId': edit.node_id}))
+        return mutations
+
+    def _update_batch(self, edits: List[IssueEdit]) -> List[Optional[str]]:
+        declarations, fields, variables = [], [], {}
+        aliases: List[List[str]] = []
+        rejected: Dict[int, str] = {}
+        for i, edit in enumerate(edits):
+            names = []
+            aliases.append(names)
+            try:
+                if not edit.node_id:
+                    raise BackendError(f"#{edit.number} has no node ID; refresh the snapshot")
+                mutations = self._edit_mutations(i, edit)
+            except BackendError as e:
+                rejected[i] = str(e)
+                continue
+            for alias, mutation, input_type, value in mutations:
+                declarations.append(f"${alias}:{input_type}!")
+                fields.append(f"{alias}:{mutation}(input:${alias}){{clientMutationId}}")
+                variables[alias] = value
+                names.append(alias)
+        if not fields:
+            return [rejected.get(i) for i in range(len(edits))]
+
+        query = f"mutation({','.join(declarations)}){{{' '.join(fields)}}}"
+        response = self.graphql(query, variables)
+        data = response.get('data') or {}
+        messages = {(error.get('path') or [''])[0]: error.get('message', 'failed')
+                    for error in response.get('errors') or []}
+        errors: List[Optional[str]] = []
+        for i, names in enumerate(aliases):
+            if i in rejected:
+                errors.append(rejected[i])
+                continue
+            failed = [messages.get(alias, 'no result') for alias in names if data.get(alias) is None]
+            errors.append('; '.join(failed) if failed else None)
+        return errors
+
+
+class FakeBackend(Backend):
+    """In-memory backend for dry runs, tests and benchmarks
+
+    `latency` (seconds) is slept on every call to imitate a network round trip.
+    Issues are kept as snapshot-shaped dicts so other tools can inspect them.
+    """
+
+    name = 'fake'
+    shared = False  # each process has its own in-memory repository
+
+    def __init__(self, latency: float = 0.0, repo: str = 'example/repo'):
+        self.latency = latency
+        self.repo = repo
+        self.labels: Dict[str, Label] = {}
+        self.milestones: Dict[str, Milestone] = {}
+        self.issues: Dict[int, Dict] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def _tick(self, op: str):
+        RUN.incr('requests')
+        with self._lock:
+            self.calls[op] = self.calls.get(op, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _ref(self, issue: Dict) -> IssueRef:
+        return IssueRef(issue['number'], issue['title'], issue['url'], issue['node_id'])
+
+    def list_labels(self) -> List[Label]:
+        self._tick('list_labels')
+        return list(self.labels.values())
+
+    def ensure_label(self, name: str, color: str, description: str) -> Label:
+        self._tick('ensure_label')
+        label = Label(name, color, description, f"LA_{name}")
+        self.labels[name] = label
+        return label
+
+    def list_milestones(self) -> List[Milestone]:
+        self._tick('list_milestones')
+        return list(self.milestones.values())
+
+    def create_milestone(self, title: str, description: str) -> Milestone:
+        self._tick('create_milestone')
+        with self._lock:
+            if title in self.milestones:
+                raise BackendError(f"Milestone already exists: {title}")
+            milestone = Milestone(len(self.milestones) + 1, title, description,
+                                  f"MI_{len(self.milestones) + 1}")
+            self.milestones[title] = milestone
+        return milestone
+
+    def repository_id(self) -> str:
+        self._tick('repository_id')
+        return f"R_{self.repo}"
+
+    def list_project_items(self, project: int) -> List[Dict]:
+        self._tick('list_project_items')
+        return []
+
+    def list_issues(self) -> List[IssueRef]:
+        self._tick('list_issues')
+        return [self._ref(issue) for issue in list(self.issues.values())]
+
+    def _check(self, labels: Sequence[str], milestone: Optional[str]):
+        for name in labels:
+            if name not in self.labels:
+                raise BackendError(f"Unknown label: {name}")
+        if milestone and milestone not in self.milestones:
+            raise BackendError(f"Unknown milestone: {milestone}")
+
+    def create_issue(self, draft: IssueDraft) -> IssueRef:
+        self._tick('create_issue')
+        self._check(draft.labels, draft.milestone)
+        with self._lock:
+            number = len(self.issues) + 1
+            now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            issue = {
+                'number': number,
+                'node_id': f"I_{number}",
+                'title': draft.title,
+                'state': 'open',
+                'state_reason': None,
+                'body': draft.body,
+                'labels': list(draft.labels),
+                'milestone': draft.milestone,
+                'url': f"https://github.com/{self.repo}/issues/{number}",
+                'comments': 0,
+                'created_at': now,
+                'updated_at': now,
+                'closed_at': None,
+            }
+            self.issues[number] = issue
+        return self._ref(issue)
+
+    def update_issue(self, number: int, title: Optional[str] = None, body: Optional[str] = None,
+                     milestone: Optional[str] = None, add_labels: Sequence[str] = (),
+                     remove_labels: Sequence[str] = (), state: Optional[str] = None,
+                     state_reason: Optional[str] = None) -> IssueRef:
+        self._tick('update_issue')
+        self._check(add_labels, milestone)
+        with self._lock:
+            issue = self.issues.get(number)
+            if issue is None:
+                raise BackendError(f"No such issue: #{number}")
+            if title is not None:
+                issue['title'] = title
+            if body is not None:
+                issue['body'] = body
+            if milestone is not None:
+                issue['milestone'] = milestone or None
+            issue['labels'] = [name for name in issue['labels'] if name not in remove_labels]
+            issue['labels'] += [name for name in add_labels if name not in issue['labels']]
+            now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            if state is not None and state != issue['state']:
+                issue['state'] = state
+                issue['state_reason'] = (state_reason or 'completed') if state == 'closed' else None
+                issue['closed_at'] = now if state == 'closed' else None
+            issue['updated_at'] = now
+        return self._ref(issue)
+
+    def add_comment(self, number: int, body: str) -> str:
+        self._tick('add_comment')
+        with self._lock:
+            issue = self.issues.get(number)
+            if issue is None:
+                raise BackendError(f"No such issue: #{number}")
+            issue['comments'] += 1
+            issue['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            return f"{issue['url']}#issuecomment-{number}{issue['comments']}"
+
+
+BACKENDS = {
+    'graphql': GraphQLBackend,
+    'rest': RestBackend,
+    'gh': GhCliBackend,
+    'fake': FakeBackend,
+}
+
+# Fastest first: batched mutations, then keep-alive REST, then one process per call
+PREFERENCE = ('graphql', 'rest', 'gh')
+
+
+def select_backend(name: Optional[str] = None) -> Backend:
+    """Instantiate the named backend, or the fastest one available
+
+    ISSUE_SYNC_BACKEND overrides automatic selection when no name is given.
+    """
+    name = name or os.environ.get('ISSUE_SYNC_BACKEND')
+    if name:
+        if name not in BACKENDS:
+            raise BackendError(f"Unknown backend: {name} (choose from {', '.join(BACKENDS)})")
+        return BACKENDS[name]()
+    for candidate in PREFERENCE:
+        if BACKENDS[candidate].available():
+            return BACKENDS[candidate]()
+    raise BackendError("No GitHub backend available; install gh or set GH_TOKEN")
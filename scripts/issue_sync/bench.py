@@ -0,0 +1,84 @@
+"""
+Micro-benchmarks for individual backend operations
+
+Usage:
+    python -m issue_sync.bench --backend fake --repeat 20
+    python -m issue_sync.bench --backend rest --writes   # creates real issues!
+
+Each operation is timed on its own so backends can be compared call by call.
+The on-disk response cache is turned off (unless --cache is given): repeated
+reads would otherwise time cache hits instead of the backend.
+"""
+
+import argparse
+import os
+import statistics
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from .backends import Backend, select_backend
+from .models import IssueDraft
+
+READ_OPERATIONS = ('list_labels', 'list_milestones', 'list_issues')
+BENCH_LABEL = ('bench', 'ededed', 'Created by issue_sync.bench')
+
+
+def _time_calls(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        'calls': repeat,
+        'min_ms': samples[0] * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'p95_ms': samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+        'total_ms': sum(samples) * 1000,
+    }
+
+
+def benchmark_backend(backend: Backend, repeat: int = 5, writes: bool = False) -> Dict[str, Dict[str, float]]:
+    """Time each backend operation separately; write operations are opt-in"""
+    results = {}
+    for op in READ_OPERATIONS:
+        results[op] = _time_calls(getattr(backend, op), repeat)
+
+    if writes:
+        name, color, description = BENCH_LABEL
+        results['ensure_label'] = _time_calls(lambda: backend.ensure_label(name, color, description), repeat)
+
+        def create_one():
+            backend.create_issue(IssueDraft(f"[bench] {uuid.uuid4().hex[:8]}", 'Benchmark issue', [name]))
+
+        results['create_issue'] = _time_calls(create_one, repeat)
+
+        drafts = [IssueDraft(f"[bench] {uuid.uuid4().hex[:8]}", 'Benchmark issue', [name])
+                  for _ in range(repeat)]
+        results[f'create_issues[{repeat}]'] = _time_calls(lambda: backend.create_issues(drafts), 1)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark issue_sync backend operations")
+    parser.add_argument('--backend', help="gh, rest, graphql or fake (default: fastest available)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--writes', action='store_true', help="also benchmark label/issue creation")
+    parser.add_argument('--cache', action='store_true',
+                        help="keep the on-disk response cache (times cache hits after the first call)")
+    args = parser.parse_args(argv)
+
+    if not args.cache:
+        os.environ['ISSUE_SYNC_NO_CACHE'] = '1'
+    backend = select_backend(args.backend)
+    print(f"Backend: {backend.name}")
+    print(f"{'operation':<24}{'calls':>7}{'min ms':>10}{'median ms':>12}{'p95 ms':>10}")
+    for op, stats in benchmark_backend(backend, args.repeat, args.writes).items():
+        print(f"{op:<24}{stats['calls']:>7}{stats['min_ms']:>10.2f}"
+              f"{stats['median_ms']:>12.2f}{stats['p95_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Concurrent metadata prefetch before any write
+
+Labels, milestones, the existing-issue index, the repository node ID and
+(optionally) the project board items are independent reads, so they are
+fetched in parallel. The resulting context warms the engine and backend
+caches; the write phases then start without a single lookup round trip.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .backends import Backend, BackendError
+from .models import IssueRef, Label, Milestone
+
+
+class BootstrapContext:
+    __slots__ = ('labels', 'milestones', 'issues', 'repository_id', 'project_items', 'timings')
+
+    def __init__(self):
+        self.labels: Dict[str, Label] = {}
+        self.milestones: Dict[str, Milestone] = {}
+        self.issues: Dict[str, IssueRef] = {}
+        self.repository_id: Optional[str] = None
+        self.project_items: List[Dict] = []
+        self.timings: Dict[str, float] = {}  # fetch -> seconds
+
+    @property
+    def project_issue_numbers(self) -> set:
+        return {item['issue_number'] for item in self.project_items if item.get('issue_number')}
+
+
+def bootstrap(backend: Backend, project: Optional[int] = None) -> BootstrapContext:
+    """Fetch all read-only metadata at once
+
+    Labels, milestones and issues are required and re-raise BackendError;
+    the repository ID and project items are best effort (None / empty).
+    """
+    context = BootstrapContext()
+
+    def timed(name: str, fetch: Callable):
+        start = time.perf_counter()
+        try:
+            return fetch()
+        finally:
+            context.timings[name] = time.perf_counter() - start
+
+    fetches: Dict[str, Callable] = {
+        'labels': backend.list_labels,
+        'milestones': backend.list_milestones,
+        'issues': backend.list_issues,
+        'repository_id': backend.repository_id,
+    }
+    if project is not None:
+        fetches['project_items'] = lambda: backend.list_project_items(project)
+
+    with ThreadPoolExecutor(max_workers=len(fetches)) as pool:
+        futures = {name: pool.submit(timed, name, fetch) for name, fetch in fetches.items()}
+        labels = futures['labels'].result()
+        milestones = futures['milestones'].result()
+        issues = futures['issues'].result()
+        try:
+            context.repository_id = futures['repository_id'].result()
+        except (BackendError, NotImplementedError):
+            context.repository_id = None
+        if 'project_items' in futures:
+            try:
+                context.project_items = futures['project_items'].result()
+            except (BackendError, NotImplementedError):
+                context.project_items = []
+
+    context.labels = {label.name: label for label in labels}
+    context.milestones = {milestone.title: milestone for milestone in milestones}
+    for issue in issues:
+        context.issues.setdefault(issue.title.strip(), issue)
+    backend.prime(labels, milestones)
+    return context
+
+
+def bootstrap_from_snapshot(backend: Backend, store, project: Optional[int] = None) -> BootstrapContext:
+    """Build the context from a snapshot kept current by the webhook receiver (no API reads)"""
+    context = BootstrapContext()
+    labels = [Label(r['name'], r['color'] or '', r['description'] or '', r['node_id'] or '')
+              for r in store.labels()]
+    milestones = [Milestone(r['number'], r['title'], r['description'] or '', r['node_id'] or '')
+                  for r in store.milestones()]
+    context.labels = {label.name: label for label in labels}
+    context.milestones = {milestone.title: milestone for milestone in milestones}
+    for row in store.issues():
+        context.issues.setdefault(row['title'].strip(),
+                                  IssueRef(row['number'], row['title'], row['url'] or '',
+                                           row['node_id'] or ''))
+    if project is not None:
+        context.project_items = [item for item in store.project_items()
+                                 if item['project'] in (project, None)]
+    backend.prime(labels, milestones)
+    return context
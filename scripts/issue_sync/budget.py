@@ -0,0 +1,372 @@
+"""
+Rate-limit budget shared by every process that uses the same token
+
+The generator, `add_issues_to_project.sh` and ad-hoc scripts all draw on one
+token's quota. Each of them used to pace itself alone, so together they
+tripped GitHub's secondary limits. The accounting now lives in one SQLite
+file (.issue_sync/budget.db), keyed by a fingerprint of the token, and every
+request takes its share inside a write transaction first:
+
+- primary limit: the X-RateLimit-* headers of the latest response per
+  resource (core, graphql, search). Requests taken since then are subtracted
+  until the next response brings the server's count. Once only the reserve is
+  left, requests wait for the reset.
+- secondary limits: a token bucket of points (a read costs 1, a write 5)
+  and one of writes. Both refill continuously. Each bucket holds a third of
+  a minute's worth, so no 60-second window goes over GitHub's 900 points or
+  80 content-creating requests with the defaults.
+- a 403/429 pauses every process until its Retry-After (or a minute) passes.
+
+A share is taken before the request reaches the concurrency limiter, so the
+wait neither holds a limiter slot nor counts as latency. Resends made below
+it are charged once they happened, and 304 revalidations are given back:
+GitHub does not count them.
+
+`create_all_issues.py budget` shows the shared view. `budget --take write`
+blocks until a write is allowed, so shell scripts can join in.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+from .metrics import RUN
+from .transport import Response, TransportError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotas (
+    key TEXT NOT NULL,              -- token fingerprint
+    resource TEXT NOT NULL,         -- core, graphql, search, ...
+    remaining INTEGER,
+    quota INTEGER,
+    reset_at REAL,                  -- epoch seconds
+    updated_at REAL,
+    PRIMARY KEY (key, resource)
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    points REAL NOT NULL,
+    writes REAL NOT NULL,
+    refilled_at REAL NOT NULL,
+    paused_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+# per minute; see the module docstring for how they map to GitHub's limits
+DEFAULT_RATES = {'points': 600.0, 'writes': 60.0}
+WRITE_COST = 5
+THROTTLE_PAUSE = 60.0
+
+
+def token_key(token: Optional[str]) -> str:
+    if not token:
+        return 'anonymous'
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """Parse "points=600,writes=60" (per minute)"""
+    rates = dict(DEFAULT_RATES)
+    for part in spec.split(','):
+        if '=' in part:
+            name, value = part.split('=', 1)
+            if name.strip() in rates:
+                rates[name.strip()] = float(value)
+    return rates
+
+
+class SharedBudget:
+    def __init__(self, path: Union[str, Path], key: str,
+                 rates: Optional[Dict[str, float]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.key = key
+        self.rates = {name: rate / 60.0 for name, rate in (rates or DEFAULT_RATES).items()}
+        self.capacity = {name: rate * 20.0 for name, rate in self.rates.items()}
+        self._local = threading.local()
+        self._db().executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            # autocommit mode, so BEGIN IMMEDIATE below takes the write lock up front
+            db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db = db
+        return db
+
+    def _bucket(self, db: sqlite3.Connection, now: float) -> List[float]:
+        """[points, writes, paused_until], refilled to `now`"""
+        row = db.execute("SELECT points, writes, refilled_at, paused_until FROM buckets "
+                         "WHERE key = ?", (self.key,)).fetchone()
+        if row is None:
+            return [self.capacity['points'], self.capacity['writes'], 0.0]
+        points, writes, refilled_at, paused_until = row
+        elapsed = max(0.0, now - refilled_at)
+        return [min(self.capacity['points'], points + elapsed * self.rates['points']),
+                min(self.capacity['writes'], writes + elapsed * self.rates['writes']),
+                paused_until]
+
+    def _try(self, resource: str, write: bool) -> float:
+        """Take one request's share; returns 0, or how long to wait before trying again"""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            points, writes, paused_until = self._bucket(db, now)
+            if paused_until > now:
+                return paused_until - now
+            row = db.execute("SELECT remaining, quota, reset_at FROM quotas "
+                             "WHERE key = ? AND resource = ?", (self.key, resource)).fetchone()
+            remaining = None
+            if row is not None and row[0] is not None and (row[2] or 0) > now:
+                remaining, quota, reset_at = row
+                if remaining <= max(10, (quota or 0) // 100):  # leave a little for interactive use
+                    return reset_at - now + 1
+            cost = WRITE_COST if write else 1
+            if points < cost:
+                return (cost - points) / self.rates['points']
+            if write and writes < 1:
+                return (1 - writes) / self.rates['writes']
+            db.execute("INSERT OR REPLACE INTO buckets (key, points, writes, refilled_at, "
+                       "paused_until) VALUES (?, ?, ?, ?, ?)",
+                       (self.key, points - cost, writes - (1 if write else 0), now, paused_until))
+            if remaining is not None:
+                db.execute("UPDATE quotas SET remaining = remaining - 1 WHERE key = ? "
+                           "AND resource = ?", (self.key, resource))
+            return 0.0
+        finally:
+            db.execute("COMMIT")
+
+    def charge(self, resource: str, write: bool, count: int):
+        """Account for `count` more requests (fewer, when negative) without waiting"""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            points, writes, paused_until = self._bucket(db, now)
+            points = min(self.capacity['points'], points - count * (WRITE_COST if write else 1))
+            if write:
+                writes = min(self.capacity['writes'], writes - count)
+            db.execute("INSERT OR REPLACE INTO buckets (key, points, writes, refilled_at, "
+                       "paused_until) VALUES (?, ?, ?, ?, ?)",
+                       (self.key, points, writes, now, paused_until))
+            db.execute("UPDATE quotas SET remaining = max(0, remaining - ?) WHERE key = ? "
+                       "AND resource = ? AND remaining IS NOT NULL AND reset_at > ?",
+                       (count, self.key, resource, now))
+        finally:
+            db.execute("COMMIT")
+
+    def acquire(self, resource: str = 'core', write: bool = False) -> float:
+        """Block until the shared budget allows one request; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            wait = self._try(resource, write)
+            if wait <= 0:
+                return waited
+            wait = min(wait, 5.0)  # re-check: a fresh response may have moved the reset
+            time.sleep(wait)
+            waited += wait
+
+    def _set_quota(self, resource: str, remaining: int, quota: Optional[int],
+                   reset_at: Optional[float]):
+        self._db().execute(
+            "INSERT OR REPLACE INTO quotas (key, resource, remaining, quota, reset_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self.key, resource, remaining, quota, reset_at, time.time()))
+
+    def observe(self, headers: Dict[str, str], resource: str = 'core'):
+        """Adopt the server's count from X-RateLimit-* response headers
+
+        Requests other processes still have in flight are not in it yet; the
+        reserve in _try() covers them.
+        """
+        remaining = headers.get('x-ratelimit-remaining')
+        if remaining is None or not remaining.isdigit():
+            return
+        quota = headers.get('x-ratelimit-limit')
+        reset = headers.get('x-ratelimit-reset')
+        self._set_quota(headers.get('x-ratelimit-resource') or resource, int(remaining),
+                        int(quota) if quota and quota.isdigit() else None,
+                        float(reset) if reset and reset.isdigit() else None)
+
+    def refresh(self, rate_limit: Dict):
+        """Adopt every resource from a GET /rate_limit response body"""
+        for resource, values in (rate_limit.get('resources') or {}).items():
+            self._set_quota(resource, values['remaining'], values.get('limit'),
+                            values.get('reset'))
+
+    def pause(self, seconds: float):
+        """Hold every process sharing the token back for `seconds`"""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            points, writes, paused_until = self._bucket(db, now)
+            db.execute("INSERT OR REPLACE INTO buckets (key, points, writes, refilled_at, "
+                       "paused_until) VALUES (?, ?, ?, ?, ?)",
+                       (self.key, points, writes, now, max(paused_until, now + seconds)))
+        finally:
+            db.execute("COMMIT")
+
+    def view(self) -> Dict:
+        """Current shared state for this token"""
+        db = self._db()
+        now = time.time()
+        points, writes, paused_until = self._bucket(db, now)
+        quotas = [dict(zip(('resource', 'remaining', 'quota', 'reset_at', 'updated_at'), row))
+                  for row in db.execute("SELECT resource, remaining, quota, reset_at, updated_at "
+                                        "FROM quotas WHERE key = ? ORDER BY resource",
+                                        (self.key,))]
+        return {'points': points, 'writes': writes, 'paused_for': max(0.0, paused_until - now),
+                'quotas': quotas}
+
+
+def budget_enabled() -> bool:
+    return os.environ.get('ISSUE_SYNC_NO_BUDGET', '') in ('', '0')
+
+
+@lru_cache(maxsize=None)
+def shared_budget(token: Optional[str]) -> Optional[SharedBudget]:
+    """The process-wide budget for a token, or None when ISSUE_SYNC_NO_BUDGET is set
+
+    ISSUE_SYNC_BUDGET="points=600,writes=60" changes the per-minute rates.
+    """
+    if not budget_enabled():
+        return None
+    from .paths import state_dir
+
+    return SharedBudget(state_dir() / 'budget.db', token_key(token),
+                        parse_rates(os.environ.get('ISSUE_SYNC_BUDGET', '')))
+
+
+def classify(method: str, url: str, payload=None):
+    """(resource, write) of a request"""
+    path = urlsplit(url).path
+    if path.startswith('/graphql'):
+        query = payload.get('query', '') if isinstance(payload, dict) else ''
+        return 'graphql', query.lstrip().startswith('mutation')
+    if path.startswith('/search/'):
+        return 'search', False
+    return 'core', method != 'GET'
+
+
+GH_READS = ('list', 'view', 'item-list', 'status')
+
+
+def classify_gh(args: List[str]):
+    """(resource, write) of a gh CLI invocation; gh uses GraphQL except for labels and `api`"""
+    if args[0] == 'api':
+        resource = 'graphql' if 'graphql' in args else 'core'
+        method = args[args.index('-X') + 1] if '-X' in args[:-1] else None
+        fields = any(flag in args for flag in ('-f', '-F', '--field', '--raw-field', '--input'))
+        return resource, (method or ('POST' if fields else 'GET')) != 'GET'
+    resource = 'core' if args[0] == 'label' else 'graphql'
+    return resource, len(args) > 1 and args[1] not in GH_READS
+
+
+class BudgetTransport:
+    """Takes a share of the shared budget for every request and feeds responses back into it
+
+    It wraps the concurrency limiter (built without retries of its own):
+    throttled requests are retried here, after the pause they set for every
+    process has passed.
+    """
+
+    def __init__(self, inner, budget: SharedBudget, retry: int = 3):
+        self.inner = inner
+        self.budget = budget
+        self.retry = retry
+        self.stats = {'budget_waits': 0, 'budget_wait_ms': 0}
+        self._lock = threading.Lock()
+
+    def _acquire(self, resource: str, write: bool):
+        waited = self.budget.acquire(resource, write)
+        if waited:
+            RUN.incr('budget_waits')
+            with self._lock:
+                self.stats['budget_waits'] += 1
+                self.stats['budget_wait_ms'] += int(waited * 1000)
+
+    def _settle(self, resource: str, write: bool, sent: int, free: bool = False):
+        """Charge the sends beyond the one share taken; give it back for a 304 or no send"""
+        extra = sent - 1 - (1 if free else 0)
+        if extra:
+            self.budget.charge(resource, write, extra)
+
+    def request(self, method: str, url: str, payload=None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        from .scheduler import is_throttled
+
+        resource, write = classify(method, url, payload)
+        attempt = 0
+        while True:
+            self._acquire(resource, write)
+            before = self.inner.sends()
+            try:
+                response = self.inner.request(method, url, payload, headers)
+            except TransportError as e:
+                self._settle(resource, write, self.inner.sends() - before)
+                self.budget.observe(e.headers, resource)
+                if not is_throttled(e) or attempt >= self.retry:
+                    raise
+                if e.headers.get('x-ratelimit-remaining') != '0':  # else: wait for the reset
+                    self.budget.pause(e.retry_after or THROTTLE_PAUSE)
+                attempt += 1
+                RUN.incr('retries')
+                continue
+            self._settle(resource, write, self.inner.sends() - before, response.status == 304)
+            self.budget.observe(response.headers, resource)
+            return response
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return self.request('GET', url, headers=headers)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def run_budget(args) -> int:
+    """`budget` command: show the shared budget, or take a share for a shell script"""
+    from .console import print_error, print_info, print_warning
+    from .transport import HttpTransport, resolve_token
+
+    token = resolve_token()
+    budget = shared_budget(token)
+    if budget is None:
+        print_error("The shared budget is disabled (ISSUE_SYNC_NO_BUDGET)")
+        return 1
+    if args.take:
+        waited = budget.acquire(args.resource, args.take == 'write')
+        if waited:
+            print_info(f"Waited {waited:.1f}s for the shared budget")
+        return 0
+    if args.refresh:
+        if not token:
+            print_error("No token found (GH_TOKEN, GITHUB_TOKEN or gh auth login)")
+            return 1
+        # /rate_limit itself does not count against the limit
+        budget.refresh(HttpTransport(token).get('/rate_limit').json() or {})
+
+    view = budget.view()
+    now = time.time()
+    for quota in view['quotas']:
+        reset = quota['reset_at'] or 0
+        if reset <= now:
+            print(f"  {quota['resource']:<22}reset since, next response updates it")
+            continue
+        print(f"  {quota['resource']:<22}{quota['remaining']}/{quota['quota'] or '?'} left, "
+              f"resets in {reset - now:.0f}s")
+    if not view['quotas']:
+        print_info("No responses seen yet; `budget --refresh` asks GitHub")
+    print(f"  {'secondary points':<22}{view['points']:.0f}/{budget.capacity['points']:.0f}")
+    print(f"  {'secondary writes':<22}{view['writes']:.0f}/{budget.capacity['writes']:.0f}")
+    if view['paused_for']:
+        print_warning(f"Throttled: all processes paused for another {view['paused_for']:.0f}s")
+    return 0
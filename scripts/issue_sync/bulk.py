@@ -0,0 +1,268 @@
+"""
+`bulk`: relabel, re-milestone, close or reopen every issue matching a filter
+
+The filter is evaluated against the local snapshot, so the affected set is
+known (and previewed) before any request is made:
+
+  label:phase-2            has the label; `label:a,b` has either
+  milestone:"Phase 2"      in the milestone; `milestone:none` has none
+  state:open               open or closed
+  title:/^\\[Epic 4/        title matches the regex (case-insensitive)
+  id:epic4.*               manifest plan ID matches the glob; `id:none` is unplanned
+
+Terms are combined with AND; a leading `-` negates one. Only issues the
+changes would actually alter are edited. Edits are sent in batches of the
+backend's batch_size (aliased GraphQL mutations with the graphql backend),
+batches run concurrently under the transport's adaptive limiter, and each
+issue's outcome is reported as it lands.
+"""
+
+import re
+import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .models import IssueEdit
+
+KEYS = ('label', 'milestone', 'state', 'title', 'id')
+
+
+class FilterError(ValueError):
+    """Raised for a filter expression that cannot be parsed"""
+
+
+def _term(key: str, value: str) -> Callable[[Dict, Optional[str]], bool]:
+    values = [v for v in value.split(',') if v] if key != 'title' else [value]
+    if not values:
+        raise FilterError(f"{key}: needs a value")
+    if key == 'label':
+        return lambda row, plan_id: any(v in row.get('labels', []) for v in values)
+    if key == 'milestone':
+        return lambda row, plan_id: any(
+            (row.get('milestone') or None) == (None if v == 'none' else v) for v in values)
+    if key == 'state':
+        for v in values:
+            if v not in ('open', 'closed'):
+                raise FilterError(f"state: expected open or closed, got {v!r}")
+        return lambda row, plan_id: row.get('state') in values
+    if key == 'title':
+        pattern = value[1:-1] if len(value) > 1 and value[0] == value[-1] == '/' else value
+        try:
+            regex = re.compile(pattern, re.I)
+        except re.error as e:
+            raise FilterError(f"title: {e}") from e
+        return lambda row, plan_id: regex.search(row.get('title') or '') is not None
+    return lambda row, plan_id: any(plan_id is None if v == 'none'
+                                    else plan_id is not None and fnmatchcase(plan_id, v)
+                                    for v in values)
+
+
+def parse_filter(expression: str) -> Callable[[Dict, Optional[str]], bool]:
+    """Compile a filter expression into predicate(row, plan_id)"""
+    lexer = shlex.shlex(expression, posix=True)
+    lexer.whitespace_split = True
+    lexer.escape = ''  # keep backslashes for title regexes
+    try:
+        words = list(lexer)
+    except ValueError as e:
+        raise FilterError(str(e)) from e
+    terms = []
+    for word in words:
+        negate = word.startswith('-')
+        key, sep, value = word.lstrip('-').partition(':')
+        if not sep or key not in KEYS:
+            raise FilterError(f"Unknown filter term {word!r} "
+                              f"(use {', '.join(key + ':' for key in KEYS)})")
+        terms.append((negate, _term(key, value)))
+    if not terms:
+        raise FilterError("Empty filter; `state:open,closed` matches everything")
+    return lambda row, plan_id: all(test(row, plan_id) != negate for negate, test in terms)
+
+
+class Changes:
+    """What to do to each matching issue"""
+
+    def __init__(self, add_labels: Sequence[str] = (), remove_labels: Sequence[str] = (),
+                 relabel: Sequence[Tuple[str, str]] = (), milestone: Optional[str] = None,
+                 state: Optional[str] = None, state_reason: Optional[str] = None):
+        self.add_labels = list(add_labels)
+        self.remove_labels = list(remove_labels)
+        self.relabel = list(relabel)  # (old, new): only issues that have old
+        self.milestone = milestone
+        self.state = state
+        self.state_reason = state_reason
+
+    @property
+    def empty(self) -> bool:
+        return not (self.add_labels or self.remove_labels or self.relabel
+                    or self.milestone is not None or self.state)
+
+    def labels(self) -> List[str]:
+        """Every label the changes could add"""
+        return self.add_labels + [new for _, new in self.relabel]
+
+    def edit_for(self, row: Dict) -> Optional[IssueEdit]:
+        """The edit this issue needs, or None when it already matches"""
+        current = set(row.get('labels', []))
+        add = [name for name in self.add_labels if name not in current]
+        remove = [name for name in self.remove_labels if name in current]
+        for old, new in self.relabel:
+            if old in current:
+                remove.append(old)
+                if new not in current and new not in add:
+                    add.append(new)
+        edit = IssueEdit(row['number'], row.get('node_id') or '', add, remove)
+        if self.milestone is not None and (row.get('milestone') or '') != self.milestone:
+            edit.milestone = self.milestone  # '' removes the milestone
+        if self.state and row.get('state') != self.state:
+            edit.state = self.state
+            edit.state_reason = self.state_reason if self.state == 'closed' else None
+        if not (edit.add_labels or edit.remove_labels or edit.milestone is not None
+                or edit.state):
+            return None
+        return edit
+
+
+def describe(edit: IssueEdit) -> str:
+    parts = [f"+{name}" for name in edit.add_labels] + [f"-{name}" for name in edit.remove_labels]
+    if edit.milestone is not None:
+        parts.append(f"milestone {edit.milestone}" if edit.milestone else "no milestone")
+    if edit.state:
+        parts.append(f"{edit.state} ({edit.state_reason})" if edit.state_reason else edit.state)
+    return ' '.join(parts)
+
+
+def apply_edits(backend, edits: List[IssueEdit], workers: int = 8,
+                on_result: Optional[Callable[[IssueEdit, Optional[str]], None]] = None):
+    """Send edits in backend-sized batches, several batches at a time
+
+    `on_result(edit, error)` is called for every edit as its batch finishes.
+    """
+    from .backends import BackendError
+
+    size = max(1, backend.batch_size)
+    batches = [edits[start:start + size] for start in range(0, len(edits), size)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(backend.update_issues, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                errors = future.result()
+            except BackendError as e:  # the whole batch failed
+                errors = [str(e)] * len(batch)
+            if on_result is not None:
+                for edit, error in zip(batch, errors):
+                    on_result(edit, error)
+
+
+def _edited_row(row: Dict, edit: IssueEdit, now: str) -> Dict:
+    labels = [name for name in row.get('labels', []) if name not in edit.remove_labels]
+    row = dict(row, labels=labels + [name for name in edit.add_labels if name not in labels],
+               updated_at=now)
+    if edit.milestone is not None:
+        row['milestone'] = edit.milestone or None
+    if edit.state:
+        row.update(state=edit.state, state_reason=edit.state_reason,
+                   closed_at=now if edit.state == 'closed' else None)
+    return row
+
+
+def run_bulk(args) -> int:
+    """`bulk` command"""
+    from .backends import select_backend
+    from .console import print_error, print_header, print_info, print_success
+    from .manifest import Manifest
+    from .metrics import RUN
+    from .output import ndjson_writer, result_record, tee
+    from .paths import default_manifest, default_snapshot
+    from .scheduler import adapt_concurrency
+    from .snapshot import SnapshotStore
+
+    writer = ndjson_writer(args)
+    try:
+        predicate = parse_filter(args.filter)
+        relabel = [tuple(pair.split('=', 1)) for pair in args.relabel]
+        if any(len(pair) != 2 or not all(pair) for pair in relabel):
+            raise FilterError("--relabel expects OLD=NEW")
+    except FilterError as e:
+        print_error(str(e))
+        return 2
+    changes = Changes(args.add_label, args.remove_label, relabel, args.milestone,
+                      'closed' if args.close else 'open' if args.reopen else None,
+                      args.reason if args.close else None)
+    if changes.empty:
+        print_error("Nothing to change: give --add-label, --remove-label, --relabel, "
+                    "--milestone, --close or --reopen")
+        return 2
+
+    path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    if path.suffix == '.jsonl' or not path.exists():
+        print_error(f"bulk needs a SQLite snapshot; run the snapshot command first ({path})")
+        return 1
+    manifest_path = default_manifest()
+    manifest = Manifest.load(manifest_path)
+    plan_ids = {entry['number']: plan_id for plan_id, entry in manifest.items.items()
+                if entry.get('number') is not None}
+    with SnapshotStore(path) as store:
+        rows = store.issues()
+        labels = {label['name'] for label in store.labels()}
+        milestones = {milestone['title'] for milestone in store.milestones()}
+    unknown = [name for name in changes.labels() if labels and name not in labels]
+    if changes.milestone and milestones and changes.milestone not in milestones:
+        unknown.append(f"milestone {changes.milestone}")
+    if unknown:
+        print_error(f"Not in the snapshot: {', '.join(unknown)}")
+        return 1
+
+    matched = [row for row in rows if predicate(row, plan_ids.get(row['number']))]
+    edits = [edit for edit in map(changes.edit_for, matched) if edit is not None]
+    by_number = {row['number']: row for row in matched}
+    print_header(f"{len(matched)} issue(s) match, {len(edits)} need changes")
+    for edit in edits[:args.limit] if args.limit else edits:
+        row = by_number[edit.number]
+        name = plan_ids.get(edit.number, '-')
+        print(f"  {name:<14}#{edit.number:<6}{describe(edit)}  {row['title']}")
+    if args.limit and len(edits) > args.limit:
+        print(f"  ... and {len(edits) - args.limit} more")
+    if args.dry_run or not edits:
+        print_info("Dry run: nothing changed" if edits else "Nothing to change")
+        return 0
+
+    backend = select_backend(args.backend)
+    limiter = getattr(getattr(backend, 'transport', None), 'limiter', None)
+    workers = adapt_concurrency(getattr(backend, 'transport', None), args.workers, args.max_workers)
+    manifest.begin_run('bulk', backend.name, args.filter)
+    emit = tee(writer, manifest.record)
+    done: List[Dict] = []
+    failed = 0
+    start = time.perf_counter()
+    now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+    def report(edit: IssueEdit, error: Optional[str]):
+        nonlocal failed
+        row = by_number[edit.number]
+        progress = f"[{len(done) + failed + 1}/{len(edits)}]"
+        if error:
+            failed += 1
+            print_error(f"{progress} #{edit.number}: {error}")
+            emit(result_record('issue', 'failed', row['title'], number=edit.number, error=error))
+            return
+        done.append(_edited_row(row, edit, now))
+        print_success(f"{progress} #{edit.number} {describe(edit)}")
+        emit(result_record('issue', 'edited', row['title'], number=edit.number, url=row.get('url'),
+                           node_id=row.get('node_id')))
+
+    with RUN.phase('bulk'):
+        apply_edits(backend, edits, workers, report)
+    elapsed = time.perf_counter() - start
+    RUN.timing('total', elapsed)
+    manifest.finish_run(RUN.timings)
+    manifest.save(manifest_path)
+    if done:
+        with SnapshotStore(path) as store:
+            store.upsert_issues(done)
+    print_info(f"Edited in {elapsed:.1f}s: {len(done)} changed, {failed} failed")
+    return 1 if failed else 0
@@ -0,0 +1,203 @@
+"""
+Read-through HTTP cache with ETag revalidation
+
+Sits between the backends and HttpTransport. GET responses are stored per
+URL together with their ETag / Last-Modified. Within an endpoint's TTL the
+stored copy is returned without any request; after that the next GET is sent
+with If-None-Match and a 304 (which GitHub does not count against the primary
+rate limit) serves the stored copy again. Any successful write invalidates
+the cached listings of the collection it touched.
+
+Entries live in one SQLite file so several processes can share it.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from .transport import Response
+
+# (path regex, seconds) - first match wins; 0 means "always revalidate"
+DEFAULT_TTLS: List[Tuple[str, float]] = [
+    (r'/labels', 300),
+    (r'/milestones', 300),
+    (r'/issues', 0),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    headers TEXT,
+    body BLOB,
+    stored_at REAL
+);
+"""
+
+# Response headers worth replaying from the cache
+KEPT_HEADERS = ('link', 'etag', 'last-modified', 'content-type')
+
+
+def parse_ttls(spec: str) -> List[Tuple[str, float]]:
+    """Parse "labels=3600,issues=30" (path fragment = seconds)"""
+    ttls = []
+    for part in spec.split(','):
+        if '=' in part:
+            fragment, seconds = part.split('=', 1)
+            ttls.append((re.escape('/' + fragment.strip().strip('/')), float(seconds)))
+    return ttls
+
+
+def cache_key(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else '')
+
+
+def collection_prefix(url: str) -> str:
+    """/repos/o/r/issues/12/labels -> /repos/o/r/issues"""
+    segments = urlsplit(url).path.split('/')
+    if len(segments) >= 5 and segments[1] == 'repos':
+        return '/'.join(segments[:5])
+    return '/'.join(segments[:2])
+
+
+class DiskCache:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._db().executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(str(self.path), timeout=30)
+            self._local.db = db
+        return db
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self._db().execute(
+            "SELECT etag, last_modified, headers, body, stored_at FROM responses WHERE url = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, headers, body, stored_at = row
+        return {'etag': etag, 'last_modified': last_modified, 'headers': json.loads(headers),
+                'body': body, 'stored_at': stored_at}
+
+    def put(self, key: str, response: Response):
+        headers = {k: v for k, v in response.headers.items() if k in KEPT_HEADERS}
+        db = self._db()
+        db.execute(
+            "INSERT OR REPLACE INTO responses (url, etag, last_modified, headers, body, stored_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, response.headers.get('etag'), response.headers.get('last-modified'),
+             json.dumps(headers), response.body, time.time())
+        )
+        db.commit()
+
+    def touch(self, key: str):
+        db = self._db()
+        db.execute("UPDATE responses SET stored_at = ? WHERE url = ?", (time.time(), key))
+        db.commit()
+
+    def invalidate(self, prefix: str) -> int:
+        db = self._db()
+        cursor = db.execute("DELETE FROM responses WHERE url = ? OR url LIKE ? ESCAPE '\\'",
+                            (prefix, prefix.replace('%', '\\%').replace('_', '\\_') + '%'))
+        db.commit()
+        return cursor.rowcount
+
+    def clear(self):
+        db = self._db()
+        db.execute("DELETE FROM responses")
+        db.commit()
+
+
+class CachingTransport:
+    """Wraps a transport with the TTL + ETag cache for GET requests"""
+
+    def __init__(self, inner, cache: DiskCache, ttls: Optional[List[Tuple[str, float]]] = None):
+        self.inner = inner
+        self.cache = cache
+        self.ttls = ttls if ttls is not None else DEFAULT_TTLS
+        self.stats = {'fresh': 0, 'revalidated': 0, 'miss': 0, 'invalidated': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.stats[key] += n
+
+    def ttl_for(self, key: str) -> float:
+        path = key.split('?', 1)[0]
+        for pattern, seconds in self.ttls:
+            if re.search(pattern, path):
+                return seconds
+        return 0
+
+    def request(self, method: str, url: str, payload=None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        if method != 'GET':
+            response = self.inner.request(method, url, payload, headers)
+            self._invalidate_for(url, payload)
+            return response
+
+        key = cache_key(url)
+        entry = self.cache.get(key)
+        if entry is not None and time.time() - entry['stored_at'] < self.ttl_for(key):
+            self._count('fresh')
+            return Response(200, entry['headers'], entry['body'])
+
+        send_headers = dict(headers or {})
+        if entry is not None:
+            if entry['etag']:
+                send_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                send_headers['If-Modified-Since'] = entry['last_modified']
+        response = self.inner.request('GET', url, None, send_headers)
+        if response.status == 304 and entry is not None:
+            self.cache.touch(key)
+            self._count('revalidated')
+            return Response(200, entry['headers'], entry['body'])
+
+        self._count('miss')
+        if response.status == 200 and (response.headers.get('etag') or response.headers.get('last-modified')):
+            self.cache.put(key, response)
+        return response
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return self.request('GET', url, headers=headers)
+
+    def _invalidate_for(self, url: str, payload):
+        key = cache_key(url)
+        if key.startswith('/graphql'):
+            query = (payload or {}).get('query', '') if isinstance(payload, dict) else ''
+            if not query.lstrip().startswith('mutation'):
+                return
+            prefixes = ['/repos/']
+        else:
+            prefixes = [collection_prefix(key)]
+        for prefix in prefixes:
+            self._count('invalidated', self.cache.invalidate(prefix))
+
+    def __getattr__(self, name):
+        # token, repo helpers, etc. of the wrapped transport
+        return getattr(self.inner, name)
+
+
+def cache_enabled() -> bool:
+    return os.environ.get('ISSUE_SYNC_NO_CACHE', '') in ('', '0')
+
+
+def configured_ttls() -> List[Tuple[str, float]]:
+    """ISSUE_SYNC_CACHE_TTLS="labels=3600,milestones=600" overrides the defaults"""
+    spec = os.environ.get('ISSUE_SYNC_CACHE_TTLS')
+    return parse_ttls(spec) + DEFAULT_TTLS if spec else DEFAULT_TTLS
@@ -0,0 +1,217 @@
+"""
+`cleanup`: close duplicate issues left behind by earlier runs
+
+Duplicates are grouped from the local snapshot with the same index the
+forward sync uses (normalized titles plus MinHash similarity), so the two
+scripts' title formats and retried creates land in one group. Issues that
+the manifest maps to different plan IDs, or whose titles differ in a number
+("Task 1" / "Task 2"), are never grouped together.
+
+One issue per group is kept:
+
+  planned  the issue the manifest maps to a plan ID, then the most active
+  active   most comments, then most recently updated
+  oldest   lowest issue number
+
+Every other open issue of the group gets a "Duplicate of #N" comment and is
+closed as not planned. Closes run concurrently; `--dry-run` only prints the
+groups.
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .dedupe import DuplicateIndex, normalize_title
+
+STRATEGIES = ('planned', 'active', 'oldest')
+
+_NUMBERS = re.compile(r'\d+')
+
+
+class _Groups:
+    """Union-find over issue numbers that refuses to join two different plan IDs"""
+
+    def __init__(self, plan_ids: Dict[int, str]):
+        self.parent: Dict[int, int] = {}
+        self.plan_ids = dict(plan_ids)  # root -> plan ID of its group
+
+    def find(self, number: int) -> int:
+        self.parent.setdefault(number, number)
+        while self.parent[number] != number:
+            self.parent[number] = self.parent[self.parent[number]]
+            number = self.parent[number]
+        return number
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+        plan_a, plan_b = self.plan_ids.get(a), self.plan_ids.get(b)
+        if plan_a and plan_b and plan_a != plan_b:
+            return
+        self.parent[b] = a
+        if plan_b:
+            self.plan_ids[a] = plan_b
+
+
+def _rank(strategy: str, plan_ids: Dict[int, str]) -> Callable[[Dict], Tuple]:
+    """Sort key: the issue to keep sorts first"""
+    def activity(row):
+        return -(row.get('comments') or 0), -_epoch(row.get('updated_at'))
+
+    if strategy == 'oldest':
+        return lambda row: (row['number'],)
+    if strategy == 'active':
+        return lambda row: activity(row) + (row['number'],)
+    return lambda row: (row['number'] not in plan_ids,) + activity(row) + (row['number'],)
+
+
+def _epoch(timestamp: Optional[str]) -> float:
+    if not timestamp:
+        return 0.0
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+
+
+def find_groups(rows: List[Dict], plan_ids: Dict[int, str], strategy: str = 'planned',
+                threshold: float = 0.9) -> List[Tuple[Dict, List[Tuple[Dict, float]]]]:
+    """[(kept issue, [(duplicate, score)])] for groups with an open duplicate"""
+    index = DuplicateIndex.build(rows, title_threshold=threshold)
+    groups = _Groups(plan_ids)
+    by_key: Dict[str, int] = {}
+    for row in rows:
+        first = by_key.setdefault(normalize_title(row['title']), row['number'])
+        groups.union(first, row['number'])
+    numbers = {row['number']: _NUMBERS.findall(normalize_title(row['title'])) for row in rows}
+    for row in rows:
+        for number, _ in index.similar(row['title'], row.get('body'), limit=20):
+            if numbers[number] == numbers[row['number']]:
+                groups.union(row['number'], number)
+
+    members: Dict[int, List[Dict]] = {}
+    for row in rows:
+        members.setdefault(groups.find(row['number']), []).append(row)
+    rank = _rank(strategy, plan_ids)
+    found = []
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        group.sort(key=rank)
+        kept, rest = group[0], group[1:]
+        kept_key = normalize_title(kept['title'])
+        scores = dict(index.similar(kept['title'], kept.get('body'), limit=len(rows)))
+        duplicates = [(row, 1.0 if normalize_title(row['title']) == kept_key
+                       else scores.get(row['number'], threshold))
+                      for row in rest if row.get('state') == 'open']
+        if duplicates:
+            found.append((kept, duplicates))
+    found.sort(key=lambda group: group[0]['number'])
+    return found
+
+
+def close_duplicates(backend, groups: List[Tuple[Dict, List[Tuple[Dict, float]]]],
+                     workers: int = 8,
+                     on_result: Optional[Callable[[Dict, Dict, Optional[str]], None]] = None):
+    """Comment on and close every duplicate concurrently
+
+    `on_result(duplicate, kept, error)` is called as each one finishes.
+    """
+    from .backends import BackendError
+
+    def close(row: Dict, kept: Dict):
+        try:
+            backend.add_comment(row['number'], f"Duplicate of #{kept['number']}")
+            backend.update_issue(row['number'], state='closed', state_reason='not_planned')
+            return None
+        except BackendError as e:
+            return str(e)
+
+    jobs = [(row, kept) for kept, duplicates in groups for row, _ in duplicates]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(close, row, kept): (row, kept) for row, kept in jobs}
+        for future in as_completed(futures):
+            row, kept = futures[future]
+            if on_result is not None:
+                on_result(row, kept, future.result())
+
+
+def run_cleanup(args) -> int:
+    """`cleanup` command"""
+    from .backends import select_backend
+    from .console import print_error, print_header, print_info, print_success
+    from .manifest import Manifest
+    from .metrics import RUN
+    from .output import result_record
+    from .paths import default_manifest, default_snapshot
+    from .scheduler import adapt_concurrency
+    from .snapshot import SnapshotStore
+
+    path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    if path.suffix == '.jsonl' or not path.exists():
+        print_error(f"cleanup needs a SQLite snapshot; run the snapshot command first ({path})")
+        return 1
+    manifest_path = default_manifest()
+    manifest = Manifest.load(manifest_path)
+    plan_ids = {entry['number']: plan_id for plan_id, entry in manifest.items.items()
+                if entry.get('number') is not None}
+    with SnapshotStore(path) as store:
+        rows = store.issues()
+    groups = find_groups(rows, plan_ids, args.keep, args.threshold)
+    total = sum(len(duplicates) for _, duplicates in groups)
+    if not groups:
+        print_success(f"No duplicates among {len(rows)} issues")
+        return 0
+
+    print_header(f"{total} duplicate(s) in {len(groups)} group(s), keeping by {args.keep}")
+    for kept, duplicates in groups:
+        plan_id = plan_ids.get(kept['number'])
+        marker = f"  [{plan_id}]" if plan_id else ''
+        print(f"  keep  #{kept['number']:<6}{kept['title']}{marker}")
+        for row, score in duplicates:
+            print(f"  close #{row['number']:<6}{row['title']}  ({score:.2f})")
+    if args.dry_run:
+        print_info("Dry run: nothing closed")
+        return 0
+
+    backend = select_backend(args.backend)
+    limiter = getattr(getattr(backend, 'transport', None), 'limiter', None)
+    workers = adapt_concurrency(getattr(backend, 'transport', None), args.workers, args.max_workers)
+    manifest.begin_run('cleanup', backend.name)
+    closed: List[Dict] = []
+    failed = 0
+    start = time.perf_counter()
+
+    def report(row: Dict, kept: Dict, error: Optional[str]):
+        nonlocal failed
+        if error:
+            failed += 1
+            print_error(f"#{row['number']}: {error}")
+            manifest.record(result_record('issue', 'failed', row['title'], number=row['number'],
+                                          error=error))
+            return
+        closed.append(row)
+        manifest.record(result_record('issue', 'closed', row['title'], number=row['number'],
+                                      url=row.get('url')))
+        plan_id = plan_ids.get(row['number'])
+        if plan_id:  # the manifest pointed at the copy that was just closed
+            manifest.record(result_record('issue', 'updated', kept['title'], plan_id,
+                                          number=kept['number'], url=kept.get('url'),
+                                          node_id=kept.get('node_id')))
+
+    close_duplicates(backend, groups, workers, report)
+    elapsed = time.perf_counter() - start
+    RUN.timing('total', elapsed)
+    manifest.finish_run(RUN.timings)
+    manifest.save(manifest_path)
+
+    now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    if closed:
+        with SnapshotStore(path) as store:
+            store.upsert_issues([dict(row, state='closed', state_reason='not_planned',
+                                      comments=(row.get('comments') or 0) + 1,
+                                      updated_at=now, closed_at=now) for row in closed])
+    print_info(f"Cleaned up in {elapsed:.1f}s: {len(closed)} closed, {failed} failed")
+    return 1 if failed else 0
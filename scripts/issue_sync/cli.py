@@ -0,0 +1,289 @@
+"""
+Subcommands shared by create_all_issues.py and `python -m issue_sync`
+
+Each command's implementation lives in its own module and is imported only
+when that command runs, so startup stays fast.
+"""
+
+import argparse
+import importlib
+import sys
+from typing import Callable, Dict, List, Optional
+
+
+def _lazy(module: str, function: str) -> Callable:
+    def handler(args):
+        return getattr(importlib.import_module(f".{module}", __package__), function)(args)
+    return handler
+
+
+def _add_snapshot(subparsers):
+    parser = subparsers.add_parser(
+        'snapshot', help="export issues, labels, milestones and project items to a local file")
+    parser.add_argument('--out', help="snapshot path; .jsonl for JSONL, anything else is SQLite "
+                                      "(default: .issue_sync/snapshot.db)")
+    parser.add_argument('--since', help="only issues updated at/after this ISO timestamp, "
+                                        "or 'last' for the previous snapshot's start time")
+    parser.add_argument('--project', type=int, help="also export items of this project number")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent page fetches")
+    parser.set_defaults(handler=_lazy('snapshot', 'run_snapshot'))
+
+
+def _add_pull(subparsers):
+    parser = subparsers.add_parser(
+        'pull', help="merge issues edited on GitHub since the last pull into the local snapshot")
+    parser.add_argument('--snapshot', help="SQLite snapshot to update (default: .issue_sync/snapshot.db)")
+    parser.add_argument('--full', action='store_true', help="ignore the watermark and list every issue")
+    parser.add_argument('--workers', type=int, default=8, help="concurrent page fetches")
+    parser.add_argument('-v', '--verbose', action='store_true', help="also list newly seen issues")
+    parser.set_defaults(handler=_lazy('pull', 'run_pull'))
+
+
+def _add_webhook(subparsers):
+    parser = subparsers.add_parser(
+        'webhook', help="receive GitHub webhooks and apply them to the local snapshot")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to listen on")
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on")
+    parser.add_argument('--secret-file', help="file holding the webhook secret "
+                                              "(default: $ISSUE_SYNC_WEBHOOK_SECRET)")
+    parser.add_argument('--snapshot', help="SQLite snapshot to update (default: .issue_sync/snapshot.db)")
+    parser.add_argument('--project', type=int, help="project number recorded for project item events")
+    parser.add_argument('--replay', nargs='+', metavar='FIXTURE',
+                        help="apply recorded deliveries ({event, payload} JSON) and exit")
+    parser.add_argument('-v', '--verbose', action='store_true', help="log every applied event")
+    parser.set_defaults(handler=_lazy('webhook', 'run_webhook'))
+
+
+def _add_plan(subparsers):
+    from .selection import add_selection_arguments
+
+    parser = subparsers.add_parser(
+        'plan', help="diff the plan against the local snapshot and write a change set")
+    add_selection_arguments(parser)
+    parser.add_argument('--snapshot', help="snapshot to diff against (default: .issue_sync/snapshot.db)")
+    parser.add_argument('--out', help="change set path (default: .issue_sync/changes.json)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="also list unchanged items")
+    parser.set_defaults(handler=_lazy('diff', 'run_plan'))
+
+
+def _add_apply(subparsers):
+    from .output import add_output_argument
+
+    parser = subparsers.add_parser('apply', help="execute a change set written by plan")
+    parser.add_argument('--changes', help="change set path (default: .issue_sync/changes.json)")
+    parser.add_argument('--snapshot', help="SQLite snapshot to update with the applied changes")
+    parser.add_argument('--backend', choices=['gh', 'rest', 'graphql', 'fake'],
+                        help="force a backend instead of the fastest available one")
+    parser.add_argument('--workers', type=int, default=16,
+                        help="concurrent requests to start with; the limit adapts from there")
+    parser.add_argument('--max-workers', type=int, default=64,
+                        help="hard cap the adaptive limit can grow to")
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help="also create items plan flagged as likely duplicates")
+    add_output_argument(parser)
+    parser.set_defaults(handler=_lazy('apply', 'run_apply'))
+
+
+def _add_validate(subparsers):
+    from .selection import add_selection_arguments
+
+    parser = subparsers.add_parser(
+        'validate', help="check labels, milestones, body sizes and duplicates without any API call")
+    add_selection_arguments(parser)
+    parser.add_argument('-v', '--verbose', action='store_true', help="list every problem")
+    parser.set_defaults(handler=_lazy('validate', 'run_validate'))
+
+
+def _add_analytics(subparsers):
+    parser = subparsers.add_parser(
+        'analytics', help="open/closed hours by epic, phase and priority, burn-down and throughput")
+    parser.add_argument('--snapshot', help="SQLite snapshot to analyse (default: .issue_sync/snapshot.db)")
+    parser.add_argument('--days', type=int, default=30, help="burn-down length in days")
+    parser.add_argument('--weeks', type=int, default=8, help="throughput length in weeks")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.set_defaults(handler=_lazy('analytics', 'run_analytics'))
+
+
+def _add_report(subparsers):
+    parser = subparsers.add_parser(
+        'report', help="show run history trends and flag runs slower than their baseline")
+    parser.add_argument('--last', type=int, default=20, help="number of runs to show")
+    parser.add_argument('--command', dest='command_filter', choices=['sync', 'apply'],
+                        help="only runs of this command")
+    parser.add_argument('--window', type=int, default=10, help="trailing runs used as the baseline")
+    parser.add_argument('-z', type=float, default=3.0,
+                        help="standard deviations above the baseline that count as a regression")
+    parser.set_defaults(handler=_lazy('history', 'run_report'))
+
+
+def _add_watch(subparsers):
+    parser = subparsers.add_parser(
+        'watch', help="sync only the changed items whenever the plan or the PRD is saved")
+    parser.add_argument('--prd', help="PRD to watch (default: docs/ui-ux-upgrade-cyberpunk-prd.md)")
+    parser.add_argument('--snapshot', help="SQLite snapshot to diff against and keep updated "
+                                           "(default: .issue_sync/snapshot.db)")
+    parser.add_argument('--backend', choices=['gh', 'rest', 'graphql', 'fake'],
+                        help="force a backend instead of the fastest available one")
+    parser.add_argument('--workers', type=int, default=16, help="concurrent requests per batch")
+    parser.add_argument('--debounce', type=float, default=0.5,
+                        help="seconds without further saves before a batch is synced")
+    parser.add_argument('--poll', action='store_true', help="poll file mtimes instead of inotify")
+    parser.add_argument('--interval', type=float, default=0.5, help="polling interval in seconds")
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help="print each batch's changes without applying them")
+    parser.set_defaults(handler=_lazy('watch', 'run_watch'))
+
+
+def _add_cleanup(subparsers):
+    parser = subparsers.add_parser(
+        'cleanup', help="close duplicate issues found in the snapshot, keeping one per group")
+    parser.add_argument('--snapshot', help="SQLite snapshot to search "
+                                           "(default: .issue_sync/snapshot.db)")
+    parser.add_argument('--keep', choices=['planned', 'active', 'oldest'], default='planned',
+                        help="which issue of a group to keep: the one in the manifest, "
+                             "the most active, or the oldest (default: planned)")
+    parser.add_argument('--threshold', type=float, default=0.9,
+                        help="title similarity (0-1) above which issues are grouped")
+    parser.add_argument('--backend', choices=['gh', 'rest', 'graphql', 'fake'],
+                        help="force a backend instead of the fastest available one")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="concurrent close requests to start with; the limit adapts from there")
+    parser.add_argument('--max-workers', type=int, default=64,
+                        help="hard cap the adaptive limit can grow to")
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help="print the groups without closing anything")
+    parser.set_defaults(handler=_lazy('cleanup', 'run_cleanup'))
+
+
+def _add_bulk(subparsers):
+    from .output import add_output_argument
+
+    parser = subparsers.add_parser(
+        'bulk', help="relabel, re-milestone, close or reopen every issue matching a filter")
+    parser.add_argument('filter', help="e.g. 'label:phase-2 state:open -label:epic'; keys: "
+                                       "label, milestone, state, title (regex), id (plan ID glob)")
+    parser.add_argument('--add-label', action='append', default=[], metavar='LABEL')
+    parser.add_argument('--remove-label', action='append', default=[], metavar='LABEL')
+    parser.add_argument('--relabel', action='append', default=[], metavar='OLD=NEW',
+                        help="replace OLD with NEW on issues that have OLD")
+    parser.add_argument('--milestone', help="move matching issues to this milestone; '' removes it")
+    state = parser.add_mutually_exclusive_group()
+    state.add_argument('--close', action='store_true')
+    state.add_argument('--reopen', action='store_true')
+    parser.add_argument('--reason', choices=['completed', 'not_planned'], default='completed',
+                        help="close reason (default: completed)")
+    parser.add_argument('--snapshot', help="SQLite snapshot to filter and update "
+                                           "(default: .issue_sync/snapshot.db)")
+    parser.add_argument('--backend', choices=['gh', 'rest', 'graphql', 'fake'],
+                        help="force a backend instead of the fastest available one")
+    parser.add_argument('--workers', type=int, default=8,
+                        help="concurrent requests to start with; the limit adapts from there")
+    parser.add_argument('--max-workers', type=int, default=64,
+                        help="hard cap the adaptive limit can grow to")
+    parser.add_argument('--limit', type=int, default=50,
+                        help="issues listed in the preview (0: all)")
+    parser.add_argument('-n', '--dry-run', action='store_true',
+                        help="list the affected issues without changing them")
+    add_output_argument(parser)
+    parser.set_defaults(handler=_lazy('bulk', 'run_bulk'))
+
+
+def _add_shard(subparsers):
+    from .selection import add_selection_arguments
+
+    parser = subparsers.add_parser(
+        'shard', help="sync with several worker processes that claim shards of the plan")
+    add_selection_arguments(parser)
+    parser.add_argument('--processes', type=int, default=4, help="worker processes to start")
+    parser.add_argument('--shard-size', type=int, default=25, help="tasks per shard")
+    parser.add_argument('--lease', type=float, default=30.0,
+                        help="seconds a shard stays leased without a heartbeat")
+    parser.add_argument('--join', nargs='?', const='', metavar='RUN',
+                        help="work on an existing run (default: the latest unfinished one) "
+                             "instead of starting one")
+    parser.add_argument('--leases', help="lease database shared by all workers "
+                                         "(default: .issue_sync/leases.db)")
+    parser.add_argument('--tokens-file', help="one token per line, handed out to the workers "
+                                              "round-robin")
+    parser.add_argument('--allow-duplicates', action='store_true',
+                        help="create items even if they look like existing issues")
+    parser.add_argument('--backend', choices=['gh', 'rest', 'graphql', 'fake'],
+                        help="force a backend instead of the fastest available one")
+    parser.set_defaults(handler=_lazy('shard', 'run_shard'))
+
+
+def _add_queue(subparsers):
+    parser = subparsers.add_parser(
+        'queue', help="list queued and dead-lettered sync jobs, or requeue dead ones")
+    parser.add_argument('--retry', nargs='*', metavar='PLAN_ID',
+                        help="requeue these dead jobs (default: all of them)")
+    parser.add_argument('--queue', help="queue database (default: .issue_sync/queue.db)")
+    parser.set_defaults(handler=_lazy('jobqueue', 'run_queue'))
+
+
+def _add_budget(subparsers):
+    parser = subparsers.add_parser(
+        'budget', help="show the rate-limit budget shared by every process using this token")
+    parser.add_argument('--refresh', action='store_true',
+                        help="ask GitHub for the current limits first (free of charge)")
+    parser.add_argument('--take', choices=['read', 'write'],
+                        help="wait until one request of this kind is allowed and take it "
+                             "(for shell scripts calling gh)")
+    parser.add_argument('--resource', default='core', choices=['core', 'graphql', 'search'],
+                        help="rate-limit resource for --take (default: core)")
+    parser.set_defaults(handler=_lazy('budget', 'run_budget'))
+
+
+COMMANDS: Dict[str, Callable] = {
+    'validate': _add_validate,
+    'snapshot': _add_snapshot,
+    'pull': _add_pull,
+    'webhook': _add_webhook,
+    'plan': _add_plan,
+    'apply': _add_apply,
+    'shard': _add_shard,
+    'queue': _add_queue,
+    'budget': _add_budget,
+    'analytics': _add_analytics,
+    'report': _add_report,
+    'bulk': _add_bulk,
+    'cleanup': _add_cleanup,
+    'watch': _add_watch,
+}
+
+
+def build_parser(prog: Optional[str] = None) -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog=prog, description="GitHub issue sync tools")
+    parser.add_argument('--plan-module', default='create_all_issues',
+                        help="module providing load_plan(), LABELS and MILESTONES")
+    parser.add_argument('--profile', action='store_true',
+                        help="run under cProfile and tracemalloc; reports go to .issue_sync/profile/")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+    for add in COMMANDS.values():
+        add(subparsers)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, plan_source=None, prog: Optional[str] = None) -> int:
+    args = build_parser(prog).parse_args(argv)
+    args.plan_source = plan_source
+
+    def load_plan_source():
+        if args.plan_source is None:
+            args.plan_source = importlib.import_module(args.plan_module)
+        return args.plan_source
+
+    args.load_plan_source = load_plan_source
+    if args.profile:
+        from .profiling import print_profile_summary, profiled
+
+        with profiled() as paths:
+            code = args.handler(args) or 0
+        print_profile_summary(paths)
+        return code
+    return args.handler(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""
+Terminal output helpers shared by the issue generator scripts
+"""
+
+_stream = None  # None = sys.stdout at call time
+
+
+def redirect(stream):
+    """Send all helper output to `stream` (e.g. stderr when stdout carries NDJSON)"""
+    global _stream
+    _stream = stream
+
+# ANSI color codes for terminal output
+class Colors:
+    HEADER = '\033[95m'
+    BLUE = '\033[94m'
+    CYAN = '\033[96m'
+    GREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+
+
+def print_header(text: str):
+    print(f"\n{Colors.HEADER}{Colors.BOLD}{'='*80}{Colors.ENDC}", file=_stream)
+    print(f"{Colors.HEADER}{Colors.BOLD}{text}{Colors.ENDC}", file=_stream)
+    print(f"{Colors.HEADER}{Colors.BOLD}{'='*80}{Colors.ENDC}\n", file=_stream)
+
+
+def print_success(text: str):
+    print(f"{Colors.GREEN}✓ {text}{Colors.ENDC}", file=_stream)
+
+
+def print_info(text: str):
+    print(f"{Colors.CYAN}→ {text}{Colors.ENDC}", file=_stream)
+
+
+def print_error(text: str):
+    print(f"{Colors.FAIL}✗ {text}{Colors.ENDC}", file=_stream)
+
+
+def print_warning(text: str):
+    print(f"{Colors.WARNING}! {text}{Colors.ENDC}", file=_stream)
@@ -0,0 +1,157 @@
+"""
+Near-duplicate detection for issue titles and bodies
+
+Two layers, both built once over the existing issues:
+
+  * a normalized key (NFKC, case-folded, dashes unified, no whitespace
+    around punctuation), so "[Epic 1 - Task 1]" and "[Epic 1-Task 1]", or
+    fullwidth and halfwidth parentheses, are the same title;
+  * MinHash signatures of title character 3-grams and body word 3-grams,
+    split into LSH bands. A query only scores the issues that share a band
+    with it, so lookups stay sub-linear in the number of issues.
+
+A title similarity of `title_threshold` or more, or a near-identical body
+with a partly similar title, counts as a likely duplicate. Bodies generated
+from the same template share most of their shingles, which is why body
+similarity alone is not enough.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 Jaccard share a band with high probability
+
+_DASHES = re.compile(r'[\u2010-\u2015\u2212\ufe58\ufe63\uff0d]')
+_AROUND_PUNCT = re.compile(r'\s*([\[\](){}\-:;,./|])\s*')
+_SPACES = re.compile(r'\s+')
+_TOKENS = re.compile(r'[\u3040-\u30ff\u3400-\u9fff]|\w+')  # CJK characters count as words
+
+
+def _masks(count: int) -> Tuple[int, ...]:
+    """Fixed pseudo-random 64-bit masks, one per MinHash permutation"""
+    return tuple(int.from_bytes(hashlib.blake2b(f"minhash-{i}".encode(), digest_size=8).digest(),
+                                'big') for i in range(count))
+
+
+MASKS = _masks(NUM_PERM)
+
+
+def normalize_title(title: str) -> str:
+    text = unicodedata.normalize('NFKC', title).casefold()
+    text = _DASHES.sub('-', text)
+    text = _AROUND_PUNCT.sub(r'\1', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def title_shingles(title: str, size: int = 3) -> set:
+    text = normalize_title(title)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def body_shingles(body: str, size: int = 3) -> set:
+    tokens = _TOKENS.findall(unicodedata.normalize('NFKC', body or '').casefold())
+    if len(tokens) <= size:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def minhash(shingles: Iterable[str]) -> Optional[Tuple[int, ...]]:
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big')
+              for s in shingles]
+    if not hashes:
+        return None
+    # XOR with a fixed mask permutes the 64-bit space; the minimum under each
+    # permutation is one signature slot
+    return tuple(min(h ^ mask for h in hashes) for mask in MASKS)
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def _bands(signature: Sequence[int]) -> List[Tuple]:
+    rows = len(signature) // BANDS
+    return [(band,) + tuple(signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+
+class DuplicateIndex:
+    def __init__(self, title_threshold: float = 0.7, body_threshold: float = 0.9,
+                 min_title_for_body: float = 0.4):
+        self.title_threshold = title_threshold
+        self.body_threshold = body_threshold
+        self.min_title_for_body = min_title_for_body
+        self.keys: Dict[str, int] = {}                 # normalized title -> first issue number
+        self.titles: Dict[int, str] = {}
+        self._title_sigs: Dict[int, Tuple[int, ...]] = {}
+        self._body_sigs: Dict[int, Tuple[int, ...]] = {}
+        self._buckets: Dict[Tuple, List[int]] = {}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, number: int, title: str, body: Optional[str] = None):
+        self.keys.setdefault(normalize_title(title), number)
+        self.titles[number] = title
+        for kind, signature, store in (
+                ('t', minhash(title_shingles(title)), self._title_sigs),
+                ('b', minhash(body_shingles(body)) if body else None, self._body_sigs)):
+            if signature is None:
+                continue
+            store[number] = signature
+            for band in _bands(signature):
+                self._buckets.setdefault((kind,) + band, []).append(number)
+
+    @classmethod
+    def build(cls, issues: Iterable, **thresholds) -> 'DuplicateIndex':
+        """From snapshot rows (dicts) or IssueRefs"""
+        index = cls(**thresholds)
+        for issue in issues:
+            if isinstance(issue, dict):
+                index.add(issue['number'], issue['title'], issue.get('body'))
+            else:
+                index.add(issue.number, issue.title)
+        return index
+
+    def exact(self, title: str) -> Optional[int]:
+        """Issue whose title is the same after normalization"""
+        return self.keys.get(normalize_title(title))
+
+    def similar(self, title: str, body: Optional[str] = None,
+                limit: int = 3) -> List[Tuple[int, float]]:
+        """Likely duplicates as (number, score), best first"""
+        title_sig = minhash(title_shingles(title))
+        body_sig = minhash(body_shingles(body)) if body else None
+        candidates = set()
+        for kind, signature in (('t', title_sig), ('b', body_sig)):
+            if signature is not None:
+                for band in _bands(signature):
+                    candidates.update(self._buckets.get((kind,) + band, ()))
+
+        matches = []
+        for number in candidates:
+            other = self._title_sigs.get(number)
+            title_score = similarity(title_sig, other) if title_sig and other else 0.0
+            score = title_score if title_score >= self.title_threshold else 0.0
+            other_body = self._body_sigs.get(number)
+            if body_sig and other_body and title_score >= self.min_title_for_body:
+                body_score = similarity(body_sig, other_body)
+                if body_score >= self.body_threshold:
+                    score = max(score, (title_score + body_score) / 2)
+            if score:
+                matches.append((number, score))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit]
+
+    def check(self, title: str, body: Optional[str] = None) -> Optional[Tuple[int, float]]:
+        """Best duplicate candidate: a normalized-title match scores 1.0"""
+        number = self.exact(title)
+        if number is not None:
+            return number, 1.0
+        matches = self.similar(title, body, limit=1)
+        return matches[0] if matches else None
@@ -0,0 +1,216 @@
+"""
+Plan/apply diffing against a local snapshot
+
+`plan` renders the selected plan items and compares them with the cached
+remote state in memory, so a dry run costs no API calls at all. The
+resulting change set is printed and written to disk for `apply`.
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from .plan import Plan, PlanItem, fingerprint
+from .pull import uncheck
+from .snapshot import Snapshot
+
+CREATE = 'create'
+UPDATE = 'update'
+NOOP = 'noop'
+
+
+class Change:
+    __slots__ = ('plan_id', 'action', 'title', 'number', 'fields', 'add_labels', 'digest',
+                 'duplicate')
+
+    def __init__(self, plan_id: str, action: str, title: str, number: Optional[int] = None,
+                 fields: Optional[List[str]] = None, add_labels: Optional[List[str]] = None,
+                 digest: str = '', duplicate: Optional[List] = None):
+        self.plan_id = plan_id
+        self.action = action
+        self.title = title
+        self.number = number
+        self.fields = fields or []
+        self.add_labels = add_labels or []
+        self.digest = digest
+        self.duplicate = duplicate  # [issue number, score] of a likely duplicate (creates only)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Change':
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+
+class ChangeSet:
+    def __init__(self, changes: List[Change], labels: List[str], milestones: List[str],
+                 epic_numbers: Optional[Dict[str, Optional[int]]] = None,
+                 snapshot_at: Optional[str] = None):
+        self.changes = changes
+        self.labels = labels          # label names to create
+        self.milestones = milestones  # milestone titles to create
+        self.epic_numbers = epic_numbers or {}  # every epic the tasks refer to; None = not created yet
+        self.snapshot_at = snapshot_at
+
+    def count(self, action: str) -> int:
+        return sum(1 for change in self.changes if change.action == action)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.labels or self.milestones) and all(c.action == NOOP for c in self.changes)
+
+    def pending(self) -> List[Change]:
+        return [change for change in self.changes if change.action != NOOP]
+
+    def to_dict(self) -> Dict:
+        return {
+            'snapshot_at': self.snapshot_at,
+            'labels': self.labels,
+            'milestones': self.milestones,
+            'epic_numbers': self.epic_numbers,
+            'changes': [change.to_dict() for change in self.changes],
+        }
+
+    def save(self, path: Union[str, Path]):
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> 'ChangeSet':
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls([Change.from_dict(c) for c in data['changes']],
+                   data.get('labels', []), data.get('milestones', []),
+                   data.get('epic_numbers', {}), data.get('snapshot_at'))
+
+
+def _normalize_body(body: Optional[str]) -> str:
+    # Ticked task-list items are progress made on GitHub, not drift from the plan
+    body = uncheck((body or '').replace('\r\n', '\n'))
+    return '\n'.join(line.rstrip() for line in body.split('\n')).strip()
+
+
+def diff_item(item: PlanItem, existing: Optional[Dict], body: str, digest: str) -> Change:
+    if existing is None:
+        return Change(item.plan_id, CREATE, item.title, digest=digest)
+    fields = []
+    missing_labels = [name for name in item.labels if name not in existing.get('labels', [])]
+    if missing_labels:
+        fields.append('labels')
+    if item.milestone and existing.get('milestone') != item.milestone:
+        fields.append('milestone')
+    if _normalize_body(existing.get('body')) != _normalize_body(body):
+        fields.append('body')
+    return Change(item.plan_id, UPDATE if fields else NOOP, item.title, existing['number'],
+                  fields, missing_labels, digest)
+
+
+def _flag_duplicate(change: Change, snapshot: Snapshot, body: str) -> Change:
+    """Mark a create that looks like an existing issue (an exact title would not be a create)"""
+    if change.action == CREATE and snapshot.issues:
+        match = snapshot.duplicates().check(change.title, body)
+        if match:
+            change.duplicate = [match[0], round(match[1], 2)]
+    return change
+
+
+def compute_changes(plan: Plan, snapshot: Snapshot, label_names: Optional[List[str]] = None,
+                    milestone_titles: Optional[List[str]] = None) -> ChangeSet:
+    """Diff the plan against the snapshot without any network I/O"""
+    changes = []
+    epic_numbers: Dict[str, Optional[int]] = {}
+    for epic in plan.epics:
+        existing = snapshot.find(epic.title)
+        epic_numbers[epic.plan_id] = existing['number'] if existing else None
+        # A missing parent epic has to be created even if only its tasks were selected
+        if epic.plan_id in plan.selected_epics or (existing is None and plan.tasks_of(epic.plan_id)):
+            body = epic.render_body()
+            changes.append(_flag_duplicate(diff_item(epic, existing, body, fingerprint(epic)),
+                                           snapshot, body))
+
+    for task in plan.tasks:
+        epic = plan.epic(task.epic_id)
+        epic_num = epic_numbers.get(task.epic_id)
+        existing = snapshot.find(task.title)
+        body = task.render_body(epic_num, epic.title)
+        changes.append(_flag_duplicate(diff_item(task, existing, body, fingerprint(task, epic.title)),
+                                       snapshot, body))
+
+    used_labels = {name for item in plan.epics + plan.tasks for name in item.labels}
+    if label_names is not None:
+        used_labels &= set(label_names)
+    used_milestones = {item.milestone for item in plan.epics if item.milestone}
+    if milestone_titles is not None:
+        used_milestones &= set(milestone_titles)
+    return ChangeSet(
+        changes,
+        sorted(name for name in used_labels if name not in snapshot.labels),
+        sorted(title for title in used_milestones if title not in snapshot.milestones),
+        epic_numbers,
+        snapshot.meta.get('snapshot_at'),
+    )
+
+
+def print_changes(change_set: ChangeSet, verbose: bool = False):
+    from .console import Colors
+
+    for name in change_set.labels:
+        print(f"{Colors.GREEN}+ label     {name}{Colors.ENDC}")
+    for title in change_set.milestones:
+        print(f"{Colors.GREEN}+ milestone {title}{Colors.ENDC}")
+    for change in change_set.changes:
+        if change.action == CREATE and change.duplicate:
+            number, score = change.duplicate
+            print(f"{Colors.WARNING}? {change.plan_id:<14}{change.title} "
+                  f"(likely duplicate of #{number}, similarity {score:.2f}){Colors.ENDC}")
+        elif change.action == CREATE:
+            print(f"{Colors.GREEN}+ {change.plan_id:<14}{change.title}{Colors.ENDC}")
+        elif change.action == UPDATE:
+            print(f"{Colors.WARNING}~ {change.plan_id:<14}{change.title} "
+                  f"(#{change.number}: {', '.join(change.fields)}){Colors.ENDC}")
+        elif verbose:
+            print(f"  {change.plan_id:<14}{change.title} (#{change.number})")
+    duplicates = sum(1 for change in change_set.changes if change.duplicate)
+    if duplicates:
+        print(f"{Colors.WARNING}{duplicates} creates look like existing issues; apply skips them "
+              f"unless --allow-duplicates is given{Colors.ENDC}")
+    print(f"\nPlan: {change_set.count(CREATE)} to create, {change_set.count(UPDATE)} to update, "
+          f"{change_set.count(NOOP)} unchanged; {len(change_set.labels)} labels and "
+          f"{len(change_set.milestones)} milestones to create")
+
+
+def run_plan(args) -> int:
+    """`plan` command"""
+    from .console import print_error, print_info
+    from .paths import default_snapshot, state_dir
+    from .selection import Selection
+    from .snapshot import load_snapshot
+    from .validate import print_problems, validate_source
+
+    source = args.load_plan_source()
+    snapshot_path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    if not snapshot_path.exists():
+        print_error(f"No snapshot at {snapshot_path}; run the snapshot command first")
+        return 1
+    plan = source.load_plan(Selection.from_args(args))
+    problems = validate_source(plan, source)
+    if problems:
+        print_problems(problems)
+        return 1
+    snapshot = load_snapshot(snapshot_path)
+    change_set = compute_changes(plan, snapshot,
+                                 [label[0] for label in source.LABELS],
+                                 [m['title'] for m in source.MILESTONES])
+    print_info(f"Compared {len(plan)} plan items with snapshot taken at "
+               f"{snapshot.meta.get('snapshot_at', 'unknown time')}")
+    print_changes(change_set, args.verbose)
+
+    out = Path(args.out) if args.out else state_dir() / 'changes.json'
+    change_set.save(out)
+    print_info(f"Change set written to {out}")
+    return 0
@@ -0,0 +1,182 @@
+"""
+Backend-agnostic sync engine used by the issue generator scripts
+
+The engine owns the idempotency rules (labels are upserted, milestones and
+issues are only created when missing) and resolves milestones by title, so
+callers never deal with milestone numbers.
+"""
+
+import time
+from typing import (TYPE_CHECKING, Callable, Dict, Iterable, Optional, Sequence, Set, Tuple,
+                    Union)
+
+from .backends import Backend, BackendError, select_backend
+from .console import print_error, print_info, print_success
+from .models import IssueDraft, IssueRef, Label, Milestone
+from .output import LABEL, MILESTONE, result_record
+
+if TYPE_CHECKING:
+    from .bootstrap import BootstrapContext
+    from .dedupe import DuplicateIndex
+
+
+class SyncEngine:
+    def __init__(self, backend: Optional[Backend] = None):
+        self.backend = backend or select_backend()
+        self._labels: Optional[Dict[str, Label]] = None
+        self._milestones: Optional[Dict[str, Milestone]] = None
+        self._issues: Optional[Dict[str, IssueRef]] = None
+        self._duplicates: Optional['DuplicateIndex'] = None
+        # Create issues that only look like existing ones (normalized titles always match)
+        self.allow_duplicates = False
+        # Called with a result_record() dict after every operation (e.g. NdjsonWriter)
+        self.on_result: Optional[Callable[[Dict], None]] = None
+        # Titles whose create failed; it may have landed anyway (timeout after sending)
+        self._unsure: Set[str] = set()
+
+    def _report(self, *args, **kwargs):
+        if self.on_result is not None:
+            self.on_result(result_record(*args, **kwargs))
+
+    def warm(self, context: 'BootstrapContext'):
+        """Adopt metadata prefetched by issue_sync.bootstrap"""
+        self._labels = dict(context.labels)
+        self._milestones = dict(context.milestones)
+        self._issues = dict(context.issues)
+        self._duplicates = None
+
+    def ensure_labels(self, labels: Iterable[Tuple[str, str, str]]):
+        """Create or update (name, color, description) labels
+
+        Labels known to be up to date (after warm()) are skipped.
+        """
+        for name, color, description in labels:
+            existing = (self._labels or {}).get(name)
+            if (existing and existing.color.lower() == color.lower()
+                    and (existing.description or '') == description):
+                print_info(f"Label exists: {name}")
+                self._report(LABEL, 'exists', name, node_id=existing.node_id)
+                continue
+            start = time.perf_counter()
+            try:
+                label = self.backend.ensure_label(name, color, description)
+                print_success(f"Label: {name}")
+                self._report(LABEL, 'updated' if existing else 'upserted', name,
+                             node_id=label.node_id, latency=time.perf_counter() - start)
+            except BackendError as e:
+                print_error(str(e))
+                self._report(LABEL, 'failed', name, error=str(e))
+
+    def milestones(self) -> Dict[str, Milestone]:
+        if self._milestones is None:
+            self._milestones = {m.title: m for m in self.backend.list_milestones()}
+        return self._milestones
+
+    def ensure_milestones(self, milestones: Iterable[Dict[str, str]]) -> Dict[str, Milestone]:
+        """Create missing milestones; returns every requested milestone by title"""
+        existing = self.milestones()
+        result = {}
+        for milestone in milestones:
+            title = milestone['title']
+            if title in existing:
+                print_info(f"Milestone exists: {title} (#{existing[title].number})")
+                self._report(MILESTONE, 'exists', title, number=existing[title].number,
+                             node_id=existing[title].node_id)
+            else:
+                start = time.perf_counter()
+                try:
+                    existing[title] = self.backend.create_milestone(title, milestone.get('description', ''))
+                    print_success(f"Milestone: {title} (#{existing[title].number})")
+                    self._report(MILESTONE, 'created', title, number=existing[title].number,
+                                 node_id=existing[title].node_id, latency=time.perf_counter() - start)
+                except BackendError as e:
+                    print_error(str(e))
+                    self._report(MILESTONE, 'failed', title, error=str(e))
+                    continue
+            result[title] = existing[title]
+        return result
+
+    def issue_index(self) -> Dict[str, IssueRef]:
+        """Title -> issue for every issue in the repository, fetched once"""
+        if self._issues is None:
+            self._issues = {}
+            for issue in self.backend.list_issues():
+                self._issues.setdefault(issue.title.strip(), issue)
+        return self._issues
+
+    def forget_issues(self):
+        """Drop the issue index so the next lookup lists issues again"""
+        self._issues = None
+        self._duplicates = None
+        self._unsure.clear()
+
+    def duplicates(self) -> 'DuplicateIndex':
+        if self._duplicates is None:
+            from .dedupe import DuplicateIndex
+            self._duplicates = DuplicateIndex.build(self.issue_index().values())
+        return self._duplicates
+
+    def find_issue(self, title: str) -> Optional[IssueRef]:
+        """Issue with this title, or with the same title after normalization
+
+        A title whose earlier create failed is looked up in a fresh issue list,
+        so a create that landed despite the error is not sent again.
+        """
+        if title.strip() in self._unsure:
+            self.forget_issues()
+        existing = self.issue_index().get(title.strip())
+        if existing is None:
+            number = self.duplicates().exact(title)
+            if number is not None:
+                existing = next(i for i in self.issue_index().values() if i.number == number)
+        return existing
+
+    def _skip_duplicate(self, title: str, kind: str, plan_id: Optional[str]) -> bool:
+        """Report and skip a create that looks like an existing issue"""
+        if self.allow_duplicates:
+            return False
+        match = self.duplicates().similar(title, limit=1)
+        if not match:
+            return False
+        number, score = match[0]
+        print_error(f"Skipped {kind.lower()} {title}: likely duplicate of #{number} "
+                    f"({self.duplicates().titles[number]}, similarity {score:.2f})")
+        self._report(kind.lower(), 'skipped', title, plan_id, number,
+                     error=f"likely duplicate of #{number}")
+        return True
+
+    def _remember(self, issue: IssueRef):
+        self.issue_index()[issue.title.strip()] = issue
+        if self._duplicates is not None:
+            self._duplicates.add(issue.number, issue.title)
+
+    def ensure_issue(self, title: str, body: Union[str, Callable[[], str]], labels: Sequence[str],
+                     milestone: Optional[str] = None, kind: str = 'Issue',
+                     plan_id: Optional[str] = None) -> Optional[int]:
+        """Create the issue unless one with the same title exists; returns its number
+
+        `body` may be a callable so it is only rendered when the issue is created.
+        """
+        existing = self.find_issue(title)
+        if existing:
+            print_info(f"{kind} exists: {title} (#{existing.number})")
+            self._report(kind.lower(), 'exists', title, plan_id, existing.number,
+                         existing.url, existing.node_id)
+            return existing.number
+        if self._skip_duplicate(title, kind, plan_id):
+            return None
+        if callable(body):
+            body = body()
+        start = time.perf_counter()
+        try:
+            issue = self.backend.create_issue(IssueDraft(title, body, list(labels), milestone))
+        except BackendError as e:
+            print_error(str(e))
+            self._unsure.add(title.strip())
+            self._report(kind.lower(), 'failed', title, plan_id, error=str(e))
+            return None
+        self._remember(issue)
+        print_success(f"{kind}: {title} (#{issue.number})")
+        self._report(kind.lower(), 'created', title, plan_id, issue.number, issue.url,
+                     issue.node_id, time.perf_counter() - start)
+        return issue.number
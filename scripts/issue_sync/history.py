@@ -0,0 +1,211 @@
+"""
+Run history and regression detection
+
+Each sync/apply run appends one row (duration, items, throughput, request,
+retry and throttle counts) plus its per-phase timings to a local SQLite
+database. A run is flagged when it is statistically slower than the trailing
+runs of the same command on the same backend: more than `z` standard deviations and at least
+`min_ratio` above the baseline mean. Comparing both total duration and time
+per item tells plan growth apart from a slower sync path.
+"""
+
+import sqlite3
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from .snapshot import utc_now
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    command TEXT NOT NULL,
+    backend TEXT,
+    started_at TEXT,
+    items INTEGER,
+    duration REAL,
+    throughput REAL,
+    requests INTEGER,
+    retries INTEGER,
+    throttled INTEGER,
+    failed INTEGER
+);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    phase TEXT NOT NULL,
+    seconds REAL,
+    PRIMARY KEY (run_id, phase)
+);
+CREATE INDEX IF NOT EXISTS runs_command ON runs(command, id);
+CREATE INDEX IF NOT EXISTS runs_command_backend ON runs(command, backend, id);
+"""
+
+
+class RunHistory:
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, command: str, backend: str, items: int, metrics: Dict,
+               failed: int = 0, started_at: Optional[str] = None) -> int:
+        """Append a run from RUN.as_dict(); returns its id"""
+        timings = metrics.get('timings', {})
+        counters = metrics.get('counters', {})
+        duration = timings.get('total') or sum(timings.values())
+        cursor = self.db.execute(
+            "INSERT INTO runs (command, backend, started_at, items, duration, throughput, "
+            "requests, retries, throttled, failed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (command, backend, started_at or utc_now(), items, duration,
+             items / duration if duration else None, counters.get('requests', 0),
+             counters.get('retries', 0), counters.get('throttled', 0), failed)
+        )
+        run_id = cursor.lastrowid
+        self.db.executemany(
+            "INSERT INTO phases (run_id, phase, seconds) VALUES (?, ?, ?)",
+            [(run_id, phase, seconds) for phase, seconds in timings.items() if phase != 'total']
+        )
+        self.db.commit()
+        return run_id
+
+    def runs(self, command: Optional[str] = None, limit: int = 20,
+             before: Optional[int] = None, backend: Optional[str] = None) -> List[Dict]:
+        """Most recent runs first"""
+        query, params = "SELECT * FROM runs WHERE 1=1", []
+        if command:
+            query += " AND command = ?"
+            params.append(command)
+        if backend:
+            query += " AND backend = ?"
+            params.append(backend)
+        if before is not None:
+            query += " AND id < ?"
+            params.append(before)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.db.execute(query, params)]
+
+    def run(self, run_id: int) -> Dict:
+        return dict(self.db.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone())
+
+    def phases(self, run_id: int) -> Dict[str, float]:
+        return {row['phase']: row['seconds'] for row in
+                self.db.execute("SELECT phase, seconds FROM phases WHERE run_id = ?", (run_id,))}
+
+    def check(self, run: Dict, window: int = 10, min_runs: int = 5, z: float = 3.0,
+              min_ratio: float = 1.2) -> Optional[str]:
+        """Describe why `run` is a regression against its trailing baseline, or None
+
+        The baseline is the trailing runs of the same command on the same
+        backend, so a gh run is never judged against fake or GraphQL runs.
+        """
+        baseline = [r for r in self.runs(run['command'], window, before=run['id'],
+                                         backend=run['backend'])
+                    if r['duration'] and not r['failed']]
+        if len(baseline) < min_runs or not run['duration']:
+            return None
+        durations = [r['duration'] for r in baseline]
+        if not _slower(run['duration'], durations, z, min_ratio):
+            return None
+        mean = statistics.mean(durations)
+        reason = f"{run['duration']:.2f}s vs baseline {mean:.2f}s ({run['duration'] / mean:.1f}x)"
+
+        per_item = [r['duration'] / r['items'] for r in baseline if r['items']]
+        if run['items'] and len(per_item) >= min_runs:
+            if _slower(run['duration'] / run['items'], per_item, z, min_ratio):
+                reason += "; slower per item, so not explained by plan growth"
+            else:
+                reason += "; per-item time is normal, the plan grew"
+        slowest = self._slowest_phase(run['id'], [r['id'] for r in baseline])
+        if slowest:
+            reason += f"; largest increase in phase {slowest}"
+        return reason
+
+    def _slowest_phase(self, run_id: int, baseline_ids: List[int]) -> Optional[str]:
+        current = self.phases(run_id)
+        growth = {}
+        for phase, seconds in current.items():
+            history = [self.phases(other).get(phase) for other in baseline_ids]
+            history = [value for value in history if value is not None]
+            if history:
+                growth[phase] = seconds - statistics.mean(history)
+        if not growth:
+            return None
+        phase = max(growth, key=growth.get)
+        return phase if growth[phase] > 0 else None
+
+
+def _slower(value: float, baseline: List[float], z: float, min_ratio: float) -> bool:
+    mean = statistics.mean(baseline)
+    stdev = statistics.stdev(baseline) if len(baseline) > 1 else 0.0
+    return value >= mean * min_ratio and value > mean + z * stdev
+
+
+def record_current_run(command: str, backend: str, items: int, failed: int = 0,
+                       started_at: Optional[str] = None):
+    """Append the process-wide RUN metrics and warn if this run regressed"""
+    from .console import print_error
+    from .metrics import RUN
+    from .paths import default_history
+
+    with RunHistory(default_history()) as history:
+        run_id = history.record(command, backend, items, RUN.as_dict(), failed, started_at)
+        reason = history.check(history.run(run_id))
+    if reason:
+        print_error(f"Performance regression: {reason} (see the report command)")
+
+
+def run_report(args) -> int:
+    """`report` command"""
+    from .console import Colors, print_info
+    from .paths import default_history
+
+    path = default_history()
+    if not path.exists():
+        print_info("No run history yet")
+        return 0
+    with RunHistory(path) as history:
+        runs = history.runs(args.command_filter, args.last)
+        if not runs:
+            print_info("No matching runs")
+            return 0
+        print(f"{'run':>5}  {'started':<20} {'command':<8} {'backend':<8} {'items':>6} "
+              f"{'seconds':>8} {'items/s':>8} {'requests':>8} {'retries':>7} {'throttled':>9}")
+        flagged = 0
+        for run in reversed(runs):
+            reason = history.check(run, window=args.window, z=args.z)
+            line = (f"{run['id']:>5}  {run['started_at'] or '':<20} {run['command']:<8} "
+                    f"{run['backend'] or '':<8} {run['items'] or 0:>6} {run['duration'] or 0:>8.3f} "
+                    f"{run['throughput'] or 0:>8.1f} {run['requests'] or 0:>8} "
+                    f"{run['retries'] or 0:>7} {run['throttled'] or 0:>9}")
+            if reason:
+                flagged += 1
+                print(f"{Colors.FAIL}{line}  <- {reason}{Colors.ENDC}")
+            else:
+                print(line)
+
+        latest = runs[0]
+        phases = history.phases(latest['id'])
+        if phases:
+            trailing = history.runs(latest['command'], args.window, before=latest['id'],
+                                    backend=latest['backend'])
+            print(f"\nPhases of run {latest['id']} vs mean of the previous {len(trailing)} "
+                  f"{latest['command']} runs on {latest['backend']}:")
+            for phase, seconds in phases.items():
+                values = [history.phases(r['id']).get(phase) for r in trailing]
+                values = [v for v in values if v is not None]
+                mean = f"{statistics.mean(values):.3f}" if values else '-'
+                print(f"  {phase:<14}{seconds:>9.3f}{mean:>10}")
+    print_info(f"{len(runs)} runs, {flagged} flagged as regressions")
+    return 0
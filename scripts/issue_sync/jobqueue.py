@@ -0,0 +1,265 @@
+"""
+Durable priority queue for issue creation
+
+Every selected epic and task becomes a job in .issue_sync/queue.db before
+anything is sent. Jobs run in plan priority order: priority-p0 first, an
+epic ahead of its tasks (an epic ranks as high as its most urgent task), then
+plan order. A task only runs once its epic has an issue number.
+
+A failed job is retried with exponential backoff; after `max_attempts` it is
+moved to the dead-letter list and its tasks are reported as blocked instead
+of being skipped silently. Finished jobs are deleted, so whatever is left in
+the queue (after a crash, or when `--max-duration` ran out) is picked up by
+the next run; dead jobs of the items a run selects get fresh attempts.
+`create_all_issues.py queue` lists the queue and requeues dead jobs.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from .plan import Plan, PlanItem
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    plan_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,             -- epic or task
+    epic_id TEXT,                   -- a task's epic
+    priority INTEGER NOT NULL,      -- 0 for priority-p0 ... 4 without a priority label
+    seq INTEGER NOT NULL,           -- plan order
+    state TEXT NOT NULL DEFAULT 'pending',  -- pending or dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_at REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    title TEXT,
+    enqueued_at REAL,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_order ON jobs(state, priority, kind, seq);
+"""
+
+JOB_FIELDS = ('plan_id', 'kind', 'epic_id', 'priority', 'seq', 'state', 'attempts', 'next_at',
+              'error', 'title')
+NO_PRIORITY = 4
+
+
+def priority_rank(item: PlanItem) -> int:
+    """0 for P0 ... 3 for P3; items without a priority come last"""
+    priority = (item.priority or '').upper()
+    if len(priority) == 2 and priority[0] == 'P' and priority[1].isdigit():
+        return int(priority[1])
+    return NO_PRIORITY
+
+
+class JobQueue:
+    def __init__(self, path: Union[str, Path], max_attempts: int = 3, backoff: float = 2.0,
+                 max_backoff: float = 60.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.db = sqlite3.connect(str(self.path), timeout=30)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def enqueue(self, plan: Plan) -> int:
+        """Add the plan's items; pending jobs keep their attempts, dead ones are revived
+
+        Returns the number of jobs added.
+        """
+        rows, seq = [], 0
+        for epic in plan.epics:
+            tasks = plan.tasks_of(epic.plan_id)
+            rank = min([priority_rank(epic)] + [priority_rank(task) for task in tasks])
+            rows.append((epic.plan_id, 'epic', None, rank, seq, epic.title))
+            for task in tasks:
+                seq += 1
+                rows.append((task.plan_id, 'task', epic.plan_id, priority_rank(task), seq,
+                             task.title))
+            seq += 1
+        queued = {row[0] for row in self.db.execute("SELECT plan_id FROM jobs")}
+        now = time.time()
+        self.db.executemany(
+            "INSERT OR IGNORE INTO jobs (plan_id, kind, epic_id, priority, seq, title, "
+            "enqueued_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [row + (now, now) for row in rows])
+        # plan priorities and order may have changed since the jobs were queued
+        self.db.executemany("UPDATE jobs SET priority = ?, seq = ?, title = ? WHERE plan_id = ?",
+                            [(rank, order, title, plan_id)
+                             for plan_id, _, _, rank, order, title in rows])
+        # selecting an item again is asking for another try
+        self.db.executemany("UPDATE jobs SET state = 'pending', attempts = 0, next_at = 0 "
+                            "WHERE plan_id = ? AND state = 'dead'", [(row[0],) for row in rows])
+        self.db.commit()
+        return sum(1 for row in rows if row[0] not in queued)
+
+    def jobs(self, state: Optional[str] = None) -> List[Dict]:
+        """Jobs in the order they run"""
+        query = f"SELECT {', '.join(JOB_FIELDS)} FROM jobs"
+        params: tuple = ()
+        if state:
+            query += " WHERE state = ?"
+            params = (state,)
+        cursor = self.db.execute(query + " ORDER BY priority, kind = 'task', seq", params)
+        return [dict(zip(JOB_FIELDS, row)) for row in cursor]
+
+    def done(self, plan_id: str):
+        self.db.execute("DELETE FROM jobs WHERE plan_id = ?", (plan_id,))
+        self.db.commit()
+
+    def failed(self, plan_id: str, error: str) -> Optional[float]:
+        """Record a failed attempt; returns when to retry, or None once the job is dead"""
+        attempts = self.db.execute("SELECT attempts FROM jobs WHERE plan_id = ?",
+                                   (plan_id,)).fetchone()[0] + 1
+        dead = attempts >= self.max_attempts
+        retry_at = time.time() + min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+        self.db.execute("UPDATE jobs SET attempts = ?, state = ?, next_at = ?, error = ?, "
+                        "updated_at = ? WHERE plan_id = ?",
+                        (attempts, 'dead' if dead else 'pending', retry_at, error, time.time(),
+                         plan_id))
+        self.db.commit()
+        return None if dead else retry_at
+
+    def requeue(self, plan_ids: Optional[List[str]] = None) -> int:
+        """Move dead jobs (all, or these) back to pending with fresh attempts"""
+        query = "UPDATE jobs SET state = 'pending', attempts = 0, next_at = 0 WHERE state = 'dead'"
+        params: tuple = ()
+        if plan_ids:
+            query += f" AND plan_id IN ({', '.join('?' * len(plan_ids))})"
+            params = tuple(plan_ids)
+        count = self.db.execute(query, params).rowcount
+        self.db.commit()
+        return count
+
+
+class DrainResult:
+    def __init__(self):
+        self.numbers: Dict[str, int] = {}  # plan ID -> issue number
+        self.done = 0
+        self.retried = 0
+        self.dead: List[Dict] = []
+        self.blocked: List[str] = []       # tasks whose epic has no issue
+        self.left = 0                      # still queued when the deadline passed
+        self.out_of_time = False
+
+
+def drain(queue: JobQueue, plan: Plan, engine, deadline: Optional[float] = None,
+          on_start: Optional[Callable[[Dict], None]] = None) -> DrainResult:
+    """Run the queued jobs of `plan` in priority order until done or `deadline`
+
+    Jobs of items outside the plan stay queued for a run that selects them.
+    """
+    from .metrics import RUN
+
+    items = {item.plan_id: item for item in plan.epics + plan.tasks}
+    epic_titles = {epic.plan_id: epic.title for epic in plan.epics}
+    result = DrainResult()
+    last: Dict = {}
+    previous = engine.on_result
+
+    def observe(record: Dict):
+        last.update(record)
+        if previous is not None:
+            previous(record)
+
+    engine.on_result = observe
+    pending = [job for job in queue.jobs('pending') if job['plan_id'] in items]
+    try:
+        while pending:
+            now = time.time()
+            if deadline is not None and now >= deadline:
+                result.out_of_time = True
+                break
+            job, wake = None, None
+            for candidate in pending:  # already in priority order
+                if candidate['kind'] == 'task' and candidate['epic_id'] not in result.numbers:
+                    continue  # its epic sorts ahead of it and has to succeed first
+                if candidate['next_at'] > now:
+                    wake = min(wake or candidate['next_at'], candidate['next_at'])
+                    continue
+                job = candidate
+                break
+            if job is None:
+                if wake is None:
+                    break  # only tasks of epics without an issue are left
+                time.sleep(max(0.05, min(wake, deadline or wake) - now))
+                continue
+
+            item = items[job['plan_id']]
+            if on_start is not None:
+                on_start(job)
+            last.clear()
+            with RUN.phase('epics' if job['kind'] == 'epic' else 'tasks'):
+                if job['kind'] == 'epic':
+                    number = engine.ensure_issue(item.title, item.render_body, list(item.labels),
+                                                 item.milestone, kind='Epic', plan_id=item.plan_id)
+                else:
+                    epic_num = result.numbers[job['epic_id']]
+                    number = engine.ensure_issue(
+                        item.title,
+                        lambda: item.render_body(epic_num, epic_titles[job['epic_id']]),
+                        list(item.labels), item.milestone, kind='Task', plan_id=item.plan_id)
+            if number is not None or last.get('action') == 'skipped':
+                # a likely duplicate is a decision, not a failure: it is not retried
+                queue.done(job['plan_id'])
+                pending.remove(job)
+                result.done += 1
+                if number is not None:
+                    result.numbers[job['plan_id']] = number
+                continue
+            error = last.get('error') or 'creation failed'
+            retry_at = queue.failed(job['plan_id'], error)
+            job.update(attempts=job['attempts'] + 1, error=error)
+            if retry_at is None:
+                pending.remove(job)
+                result.dead.append(job)
+            else:
+                job['next_at'] = retry_at
+                result.retried += 1
+    finally:
+        engine.on_result = previous
+
+    if result.out_of_time:
+        result.left = len(pending)
+    else:
+        result.blocked = [job['plan_id'] for job in pending if job['kind'] == 'task']
+    return result
+
+
+def run_queue(args) -> int:
+    """`queue` command: show the queue and requeue dead jobs"""
+    from .console import print_info, print_success
+    from .paths import state_dir
+
+    path = Path(args.queue) if args.queue else state_dir() / 'queue.db'
+    with JobQueue(path) as queue:
+        if args.retry is not None:
+            count = queue.requeue(args.retry or None)
+            print_success(f"Requeued {count} dead job(s); the next sync run delivers them")
+            return 0
+        jobs = queue.jobs()
+    if not jobs:
+        print_info("Queue is empty")
+        return 0
+    now = time.time()
+    for job in jobs:
+        when = ''
+        if job['state'] == 'pending' and job['next_at'] > now:
+            when = f" retry in {job['next_at'] - now:.0f}s"
+        priority = f"p{job['priority']}" if job['priority'] < NO_PRIORITY else '-'
+        print(f"  {job['state']:<8}{priority:<4}{job['plan_id']:<16}attempts {job['attempts']}"
+              f"{when}  {job['error'] or ''}")
+    dead = sum(1 for job in jobs if job['state'] == 'dead')
+    print_info(f"{len(jobs)} job(s) queued, {dead} dead; `queue --retry [PLAN_ID ...]` "
+               f"requeues dead jobs")
+    return 0
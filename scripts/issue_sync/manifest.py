@@ -0,0 +1,136 @@
+"""
+Run manifest: plan ID -> issue number / URL / node ID
+
+Every sync or apply run merges its results into .issue_sync/manifest.json,
+so the file always maps the whole plan, not just the last targeted run.
+It is written atomically (temp file + rename); a crash mid-write leaves the
+previous manifest intact. Saving merges into what is on disk under a lock
+file, so concurrent runs (watch and a sync, cleanup and bulk) keep each
+other's results. Tools that need issue numbers should read it instead of
+listing issues through the API. Runs against a backend whose issues are not
+on GitHub (fake) use an in-memory manifest that is never saved.
+"""
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves stay atomic, they are just not serialised
+    fcntl = None
+
+from .snapshot import utc_now
+
+MANIFEST_VERSION = 1
+# Actions whose record identifies an existing GitHub issue
+_RESOLVED = ('created', 'exists', 'updated')
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    with open(path.with_name(path.name + '.lock'), 'a') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class Manifest:
+    def __init__(self, items: Optional[Dict[str, Dict]] = None, runs: Optional[list] = None):
+        self.items: Dict[str, Dict] = items or {}  # plan_id -> {number, url, node_id, title, ...}
+        self.runs = runs or []                     # most recent last
+        self.run: Dict = {}
+        self._touched: Set[str] = set()  # plan IDs recorded by this process
+        self._run_pending = False  # finished, not written to disk yet
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Optional[Union[str, Path]]) -> 'Manifest':
+        """The manifest at `path`; None gives an empty one that save() keeps in memory"""
+        if path is None:
+            return cls()
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('items', {}), data.get('runs', []))
+
+    def begin_run(self, command: str, backend: str, selection: Optional[str] = None):
+        self.run = {
+            'command': command,
+            'backend': backend,
+            'selection': selection,
+            'started_at': utc_now(),
+            'finished_at': None,
+            'counts': {},
+            'timings': {},
+        }
+
+    def record(self, record: Dict):
+        """Result-stream consumer (see issue_sync.output.result_record)"""
+        with self._lock:
+            counts = self.run.setdefault('counts', {})
+            key = f"{record['type']}_{record['action']}"
+            counts[key] = counts.get(key, 0) + 1
+            plan_id = record.get('plan_id')
+            if not plan_id or record['action'] not in _RESOLVED or record.get('number') is None:
+                return
+            self._touched.add(plan_id)
+            entry = self.items.setdefault(plan_id, {})
+            entry.update({
+                'number': record['number'],
+                'title': record['title'],
+                'url': record.get('url') or entry.get('url'),
+                'node_id': record.get('node_id') or entry.get('node_id'),
+                'last_action': record['action'],
+                'latency_ms': record.get('latency_ms'),
+                'synced_at': self.run.get('started_at'),
+            })
+
+    __call__ = record
+
+    def finish_run(self, timings: Dict[str, float], keep: int = 20):
+        self.run['finished_at'] = utc_now()
+        self.run['timings'] = {name: round(seconds, 4) for name, seconds in timings.items()}
+        self.runs = (self.runs + [self.run])[-keep:]
+        self._run_pending = True
+
+    def number(self, plan_id: str) -> Optional[int]:
+        entry = self.items.get(plan_id)
+        return entry['number'] if entry else None
+
+    def to_dict(self) -> Dict:
+        return {'version': MANIFEST_VERSION, 'items': self.items, 'runs': self.runs}
+
+    def _merge(self, current: 'Manifest', keep: int):
+        """Apply this process's items and finished run on top of the manifest on disk"""
+        for plan_id in self._touched:
+            current.items[plan_id] = self.items[plan_id]
+        self.items = current.items
+        runs = current.runs
+        if self._run_pending:
+            runs = runs + [self.run]
+            self._run_pending = False
+        self.runs = runs[-keep:]
+
+    def save(self, path: Optional[Union[str, Path]], keep: int = 20):
+        """Merge into the file on disk and replace it; safe to call repeatedly"""
+        if path is None:
+            return
+        path = Path(path)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with _locked(path), self._lock:
+            self._merge(Manifest.load(path), keep)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
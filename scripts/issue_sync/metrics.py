@@ -0,0 +1,69 @@
+"""
+Per-run metrics shared by the transport layers and commands
+
+Layers record counters, gauges and phase timings into the process-wide RUN registry;
+commands print or persist `RUN.as_dict()` at the end of a run.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Union
+
+
+class RunMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.timings: Dict[str, float] = {}  # phase -> wall seconds
+
+    def incr(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+            peak = f"{name}_max"
+            if value > self.gauges.get(peak, float('-inf')):
+                self.gauges[peak] = value
+
+    def timing(self, name: str, seconds: float):
+        with self._lock:
+            self.timings[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """Attribute the wall time of the block to `name` (accumulates if repeated)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def as_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {'counters': dict(self.counters), 'gauges': dict(self.gauges),
+                    'timings': dict(self.timings)}
+
+    def save(self, path: Union[str, Path]):
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.timings.clear()
+
+
+RUN = RunMetrics()
@@ -0,0 +1,51 @@
+"""
+Plain records exchanged between the sync engine and its backends
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+
+@dataclass
+class Label:
+    name: str
+    color: str = ''
+    description: str = ''
+    node_id: str = ''
+
+
+@dataclass
+class Milestone:
+    number: int
+    title: str
+    description: str = ''
+    node_id: str = ''
+
+
+@dataclass
+class IssueRef:
+    number: int
+    title: str = ''
+    url: str = ''
+    node_id: str = ''
+
+
+@dataclass
+class IssueDraft:
+    """Everything needed to create one issue"""
+    title: str
+    body: str
+    labels: List[str] = field(default_factory=list)
+    milestone: Optional[str] = None  # milestone title, resolved by the backend
+
+
+@dataclass
+class IssueEdit:
+    """Changes to one existing issue; unset fields are left alone"""
+    number: int
+    node_id: str = ''
+    add_labels: List[str] = field(default_factory=list)
+    remove_labels: List[str] = field(default_factory=list)
+    milestone: Optional[str] = None     # milestone title
+    state: Optional[str] = None         # 'open' or 'closed'
+    state_reason: Optional[str] = None  # completed, not_planned (when closing)
@@ -0,0 +1,79 @@
+"""
+Machine-readable result stream (`--output ndjson`)
+
+One JSON object per line is written and flushed as soon as each operation
+finishes, so downstream tools (project-add, linking, reporting) can act on
+results while the run is still going. Human-readable output moves to stderr.
+"""
+
+import json
+import sys
+import threading
+from typing import Callable, Dict, Optional, TextIO
+
+# record "type" values
+LABEL = 'label'
+MILESTONE = 'milestone'
+
+
+def result_record(type_: str, action: str, title: str, plan_id: Optional[str] = None,
+                  number: Optional[int] = None, url: Optional[str] = None,
+                  node_id: Optional[str] = None, latency: Optional[float] = None,
+                  error: Optional[str] = None) -> Dict:
+    record = {
+        'type': type_,
+        'plan_id': plan_id,
+        'title': title,
+        'number': number,
+        'url': url or None,
+        'node_id': node_id or None,
+        'action': action,
+        'latency_ms': round(latency * 1000, 1) if latency is not None else None,
+    }
+    if error:
+        record['error'] = error
+    return record
+
+
+class NdjsonWriter:
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def emit(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    __call__ = emit
+
+
+def add_output_argument(parser):
+    parser.add_argument('--output', choices=['text', 'ndjson'], default='text',
+                        help="ndjson: one JSON record per operation on stdout, "
+                             "progress messages on stderr")
+
+
+def ndjson_writer(args) -> Optional[NdjsonWriter]:
+    """Set up the NDJSON stream if requested; human-readable output then goes to stderr"""
+    if getattr(args, 'output', 'text') != 'ndjson':
+        return None
+    from .console import redirect
+
+    redirect(sys.stderr)
+    return NdjsonWriter(sys.stdout)
+
+
+def tee(*callbacks: Optional[Callable[[Dict], None]]) -> Optional[Callable[[Dict], None]]:
+    """Fan one result stream out to several consumers (None entries are ignored)"""
+    active = [callback for callback in callbacks if callback is not None]
+    if not active:
+        return None
+    if len(active) == 1:
+        return active[0]
+
+    def emit(record: Dict):
+        for callback in active:
+            callback(record)
+    return emit
@@ -0,0 +1,27 @@
+"""
+Where issue_sync keeps its local state (snapshots, caches, manifests)
+"""
+
+import os
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def state_dir() -> Path:
+    """ISSUE_SYNC_HOME, or .issue_sync/ at the repository root"""
+    path = Path(os.environ.get('ISSUE_SYNC_HOME') or REPO_ROOT / '.issue_sync')
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def default_snapshot() -> Path:
+    return state_dir() / 'snapshot.db'
+
+
+def default_manifest() -> Path:
+    return state_dir() / 'manifest.json'
+
+
+def default_history() -> Path:
+    return state_dir() / 'history.db'
@@ -0,0 +1,280 @@
+"""
+Compact in-memory plan representation
+
+Plan items use __slots__ instead of per-item dicts, share interned strings
+for values that repeat across the plan (labels, milestones, priorities,
+sizes) and never store a rendered body: bodies are produced on demand by
+render_body() and dropped once sent.
+"""
+
+import hashlib
+import sys
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+_label_sets: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_str(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value is not None else None
+
+
+def intern_labels(labels: Sequence[str]) -> Tuple[str, ...]:
+    """Return a shared tuple for this label combination"""
+    key = tuple(sys.intern(label) for label in labels)
+    return _label_sets.setdefault(key, key)
+
+
+class PlanItem:
+    __slots__ = ('plan_id', 'title', 'labels', 'milestone', 'priority')
+
+    kind = 'item'
+
+    def __init__(self, plan_id: str, title: str, labels: Sequence[str],
+                 milestone: Optional[str], priority: Optional[str] = None):
+        self.plan_id = plan_id
+        self.title = title
+        self.labels = intern_labels(labels)
+        self.milestone = intern_str(milestone)
+        self.priority = intern_str(priority)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.plan_id}: {self.title}>"
+
+
+class EpicItem(PlanItem):
+    __slots__ = ('body_source',)
+
+    kind = 'epic'
+
+    def __init__(self, plan_id: str, title: str, labels: Sequence[str],
+                 milestone: Optional[str], body_source: Union[str, Callable[[], str]]):
+        priority = next((label[len('priority-'):].upper() for label in labels
+                         if label.startswith('priority-')), None)
+        super().__init__(plan_id, title, labels, milestone, priority)
+        self.body_source = body_source
+
+    @property
+    def number(self) -> int:
+        return int(self.plan_id[len('epic'):])
+
+    @property
+    def short_title(self) -> str:
+        """Return "Epic 4" for an "[Epic 4] ..." title"""
+        return self.title.split(']')[0].lstrip('[')
+
+    def render_body(self) -> str:
+        return self.body_source() if callable(self.body_source) else self.body_source
+
+
+class TaskItem(PlanItem):
+    __slots__ = (
+        'epic_id', 'index', 'size', 'background', 'acceptance_criteria', 'files',
+        'steps', 'time', 'code', 'testing', 'blocked_by', 'blocks', 'branch', 'commit',
+    )
+
+    kind = 'task'
+
+    def __init__(self, epic_id: str, index: int, title: str, labels: Sequence[str],
+                 milestone: Optional[str], priority: str, size: str, background: str,
+                 acceptance_criteria: str, files: str, steps: str, time: str, testing: str,
+                 branch: str, commit: str, code: Optional[str] = None,
+                 blocked_by: Optional[str] = None, blocks: Optional[str] = None):
+        super().__init__(f"{epic_id}.task{index}", title, labels, milestone, priority)
+        self.epic_id = sys.intern(epic_id)
+        self.index = index
+        self.size = sys.intern(size)
+        self.background = background
+        self.acceptance_criteria = acceptance_criteria
+        self.files = files
+        self.steps = steps
+        self.time = intern_str(time)
+        self.code = code
+        self.testing = testing
+        self.blocked_by = intern_str(blocked_by)
+        self.blocks = intern_str(blocks)
+        self.branch = branch
+        self.commit = commit
+
+    @classmethod
+    def from_dict(cls, epic_id: str, index: int, milestone: Optional[str], data: Dict) -> 'TaskItem':
+        """Build from the authoring dict format used in create_all_issues.py"""
+        return cls(
+            epic_id, index, data['title'], data['labels'], milestone,
+            priority=data['priority'],
+            size=data['size'],
+            background=data['background'],
+            acceptance_criteria=data['acceptance_criteria'],
+            files=data['files'],
+            steps=data['steps'],
+            time=data['time'],
+            testing=data['testing'],
+            branch=data['branch'],
+            commit=data['commit'],
+            code=data.get('code'),
+            blocked_by=data.get('blocked_by'),
+            blocks=data.get('blocks'),
+        )
+
+    def render_body(self, epic_num: Optional[int], epic_title: str) -> str:
+        return render_task_body(self, epic_num, epic_title)
+
+
+def render_task_body(task: TaskItem, epic_num: Optional[int], epic_title: str) -> str:
+    """Generate task issue body; the epic reads "(new epic)" until it has a number"""
+    epic_ref = f"#{epic_num}" if epic_num is not None else "(new epic)"
+    return f"""## Background
+
+{task.background}
+
+## Acceptance Criteria
+
+{task.acceptance_criteria}
+
+## Implementation Plan
+
+**Files to Modify:**
+{task.files}
+
+**Implementation Steps:**
+{task.steps}
+
+**Estimated Time:** {task.time}
+
+## Core Logic
+
+```typescript
+{task.code or '// Implementation details'}
+```
+
+## Testing Requirements
+
+{task.testing}
+
+## Dependencies
+
+- **Priority:** {task.priority}
+- **Size:** {task.size}
+- **Blocked by:** {task.blocked_by or 'None'}
+- **Blocks:** {task.blocks or 'None'}
+
+## Git Worktree
+
+```bash
+# Create worktree for this task
+git worktree add ../nav_blog-{task.branch} -b {task.branch}
+cd ../nav_blog-{task.branch}
+
+# After completion
+git add .
+git commit -m "{task.commit}"
+git push -u origin {task.branch}
+
+# Create PR
+gh pr create --title "{task.title}" --body "Closes {epic_ref}"
+```
+
+## Related
+
+- Epic: {epic_ref} {epic_title}
+"""
+
+
+def fingerprint(item: PlanItem, epic_title: str = '') -> str:
+    """Stable digest of everything about an item that ends up on GitHub"""
+    if isinstance(item, TaskItem):
+        body = item.render_body(0, epic_title)
+    else:
+        body = item.render_body()
+    digest = hashlib.sha1()
+    for part in (item.title, ','.join(item.labels), item.milestone or '', body):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class Plan:
+    """Epics and tasks selected for one run
+
+    An epic can be present only as the parent of selected tasks; those are
+    looked up or created so the tasks can reference them but are not
+    themselves "selected".
+    """
+
+    __slots__ = ('epics', 'tasks', 'selected_epics', '_epic_index', '_tasks_by_epic')
+
+    def __init__(self):
+        self.epics: List[EpicItem] = []
+        self.tasks: List[TaskItem] = []
+        self.selected_epics = set()
+        self._epic_index: Dict[str, EpicItem] = {}
+        self._tasks_by_epic: Dict[str, List[TaskItem]] = {}
+
+    def add_epic(self, epic: EpicItem, selected: bool = True):
+        self.epics.append(epic)
+        self._epic_index[epic.plan_id] = epic
+        if selected:
+            self.selected_epics.add(epic.plan_id)
+
+    def add_task(self, task: TaskItem):
+        self.tasks.append(task)
+        self._tasks_by_epic.setdefault(task.epic_id, []).append(task)
+
+    def epic(self, epic_id: str) -> EpicItem:
+        return self._epic_index[epic_id]
+
+    def tasks_of(self, epic_id: str) -> List[TaskItem]:
+        return self._tasks_by_epic.get(epic_id, [])
+
+    def selected_items(self) -> Iterator[PlanItem]:
+        """Selected epics followed by tasks, in plan order"""
+        for epic in self.epics:
+            if epic.plan_id in self.selected_epics:
+                yield epic
+        yield from self.tasks
+
+    def __len__(self):
+        return len(self.selected_epics) + len(self.tasks)
+
+    def __bool__(self):
+        return bool(self.epics)
+
+
+def synthetic_plan(task_count: int, tasks_per_epic: int = 10) -> Plan:
+    """Build a large plan with realistic shapes for memory and speed checks"""
+    milestones = ('Phase 1: Visual Style Refactoring',
+                  'Phase 2: Interaction Enhancement & Character System')
+    priorities = ('P0', 'P1', 'P2', 'P3')
+    sizes = ('size-small', 'size-medium', 'size-large')
+    criteria = '- [ ] 功能按预期工作\n- [ ] 移动端表现一致\n- [ ] 无性能回退'
+    steps = '1. 实现核心逻辑\n2. 补充样式\n3. 验证交互'
+    plan = Plan()
+    epic_count = (task_count + tasks_per_epic - 1) // tasks_per_epic
+    for e in range(1, epic_count + 1):
+        phase = 1 if e <= epic_count // 2 else 2
+        epic_id = f"epic{e}"
+        plan.add_epic(EpicItem(
+            epic_id, f"[Epic {e}] Synthetic epic {e}",
+            ['epic', f"phase-{phase}", 'ui', f"priority-p{e % 4}"],
+            milestones[phase - 1],
+            f"Synthetic epic {e}",
+        ))
+        for t in range(1, min(tasks_per_epic, task_count - (e - 1) * tasks_per_epic) + 1):
+            priority = priorities[(e + t) % 4]
+            size = sizes[t % 3]
+            plan.add_task(TaskItem(
+                epic_id, t, f"[Epic {e}-Task {t}] Synthetic task {e}.{t}",
+                ['feature', f"phase-{phase}", 'ui', f"priority-{priority.lower()}", size],
+                milestones[phase - 1],
+                priority=priority,
+                size=size,
+                background='合成任务，用于容量测试。',
+                acceptance_criteria=criteria,
+                files='- `src/components/Synthetic.tsx`',
+                steps=steps,
+                time=f"{t % 4 + 1} hours",
+                testing='- 运行单元测试',
+                branch=f"feat/epic{e}-task{t}-synthetic",
+                commit='feat: Synthetic task',
+                blocked_by=f"Task {t - 1}" if t > 1 else None,
+            ))
+    return plan
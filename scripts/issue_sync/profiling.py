@@ -0,0 +1,90 @@
+"""
+--profile support: cProfile + tracemalloc around a whole run
+
+Writes three files under .issue_sync/profile/:
+  <stamp>.prof         raw cProfile data (snakeviz, pstats)
+  <stamp>-cpu.txt      stats sorted by cumulative time, with the phase timers
+  <stamp>-alloc.txt    top allocation sites still alive at the end of the run
+
+cProfile only sees the thread that starts it; worker threads (bootstrap,
+apply, page fetches) show up as time spent waiting on their futures, while
+the per-phase wall-clock timers cover everything.
+"""
+
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from .metrics import RUN
+
+_IGNORED_FRAMES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+def format_phases(timings: Dict[str, float]) -> str:
+    total = timings.get('total') or sum(v for k, v in timings.items() if k != 'total') or 1.0
+    lines = ["phase            seconds   share"]
+    for name, seconds in timings.items():
+        lines.append(f"{name:<16}{seconds:>8.3f}{seconds / total:>8.1%}")
+    return '\n'.join(lines)
+
+
+@contextmanager
+def profiled(out_dir: Optional[Path] = None, top: int = 40, frames: int = 10) -> Iterator[Dict]:
+    """Profile the block; yields a dict that receives the written paths"""
+    if out_dir is None:
+        from .paths import state_dir
+        out_dir = state_dir() / 'profile'
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    paths = {
+        'prof': out_dir / f"{stamp}.prof",
+        'cpu': out_dir / f"{stamp}-cpu.txt",
+        'alloc': out_dir / f"{stamp}-alloc.txt",
+    }
+
+    tracemalloc.start(frames)
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield paths
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_FRAMES)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profiler.dump_stats(str(paths['prof']))
+        buffer = io.StringIO()
+        stats = pstats.Stats(profiler, stream=buffer)
+        stats.sort_stats('cumulative').print_stats(top)
+        with open(paths['cpu'], 'w', encoding='utf-8') as f:
+            f.write(f"wall time: {wall:.3f}s\n\n")
+            f.write(format_phases(RUN.timings) + "\n\n")
+            f.write(buffer.getvalue())
+
+        with open(paths['alloc'], 'w', encoding='utf-8') as f:
+            f.write(f"traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB\n\n")
+            for stat in snapshot.statistics('traceback')[:top]:
+                f.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+                for line in stat.traceback.format(limit=frames):
+                    f.write(f"{line}\n")
+                f.write("\n")
+
+
+def print_profile_summary(paths: Dict[str, Path]):
+    from .console import print_info
+
+    if RUN.timings:
+        print_info("Phase timers:\n" + format_phases(RUN.timings))
+    print_info(f"Profile written to {paths['cpu']}, {paths['alloc']} and {paths['prof']}")
@@ -0,0 +1,145 @@
+"""
+`pull`: bring manual edits on GitHub back into the local state store
+
+Only issues updated since the previous pull are listed (`since=` watermark,
+pages fetched concurrently in creation order, so an edit mid-pull cannot
+shift a page boundary and hide an older issue). Each returned issue is compared with its stored
+row; unchanged ones (same updated_at) are not rewritten. State, labels and
+task-list progress (`- [x]` items) are extracted with precompiled patterns,
+merged into the snapshot, and the differences are reported by plan ID.
+
+The watermark is the newest updated_at GitHub returned, not the local
+clock, so clock skew cannot skip edits.
+"""
+
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from .snapshot import ISSUE_LISTING, SnapshotStore, fetch_pages, issue_record
+
+WATERMARK = 'pull_since'
+
+_CHECKBOX = re.compile(r'^[ \t]*[-*+][ \t]+\[([ xX])\][ \t]*(.*?)[ \t]*$', re.M)
+
+
+def checkbox_progress(body: Optional[str]) -> Tuple[int, int]:
+    """(checked, total) task-list items in a Markdown body"""
+    marks = [mark for mark, _ in _CHECKBOX.findall(body or '')]
+    return sum(1 for mark in marks if mark != ' '), len(marks)
+
+
+def checked_items(body: Optional[str]) -> Set[str]:
+    return {' '.join(text.split()) for mark, text in _CHECKBOX.findall(body or '') if mark != ' '}
+
+
+def uncheck(body: str) -> str:
+    """The body with every task-list item unticked, for comparisons that ignore progress"""
+    return _CHECKBOX.sub(lambda m: m.group(0).replace(f"[{m.group(1)}]", '[ ]', 1), body)
+
+
+def carry_checks(body: str, previous: Optional[str]) -> str:
+    """Re-tick items of a re-rendered body that were ticked on GitHub"""
+    done = checked_items(previous)
+    if not done:
+        return body
+
+    def tick(match):
+        if match.group(1) == ' ' and ' '.join(match.group(2).split()) in done:
+            return match.group(0).replace('[ ]', '[x]', 1)
+        return match.group(0)
+    return _CHECKBOX.sub(tick, body)
+
+
+def issue_changes(old: Optional[Dict], new: Dict) -> List[str]:
+    """Human-readable differences between a stored issue row and a pulled one"""
+    if old is None:
+        return ['new']
+    changes = []
+    if old.get('state') != new['state']:
+        reason = f" ({new['state_reason']})" if new.get('state_reason') else ''
+        changes.append(f"{new['state']}{reason}")
+    added = [name for name in new['labels'] if name not in old.get('labels', [])]
+    removed = [name for name in old.get('labels', []) if name not in new['labels']]
+    if added or removed:
+        changes.append('labels ' + ' '.join([f"+{n}" for n in added] + [f"-{n}" for n in removed]))
+    if old.get('milestone') != new['milestone']:
+        changes.append(f"milestone {new['milestone'] or 'removed'}")
+    before, after = checkbox_progress(old.get('body')), checkbox_progress(new['body'])
+    if before != after:
+        changes.append(f"checklist {after[0]}/{after[1]}")
+    elif uncheck(old.get('body') or '') != uncheck(new['body']):
+        changes.append('body edited')
+    return changes
+
+
+def pull(transport, repo: str, store: SnapshotStore, since: Optional[str] = None,
+         workers: int = 8) -> Tuple[List[Tuple[Dict, List[str]]], int]:
+    """Merge issues updated since `since` into `store`
+
+    Returns ([(row, changes)] for issues that actually changed, issues listed).
+    """
+    stored = {row['number']: row for row in store.issues()}
+    query = dict(ISSUE_LISTING)
+    if since:
+        query['since'] = since
+    changed, listed, watermark = [], 0, since
+    for page in fetch_pages(transport, f"/repos/{repo}/issues?{urlencode(query)}", workers):
+        rows = []
+        for data in page:
+            if 'pull_request' in data:
+                continue
+            listed += 1
+            row = issue_record(data)
+            if row['updated_at'] and (watermark is None or row['updated_at'] > watermark):
+                watermark = row['updated_at']
+            old = stored.get(row['number'])
+            if old is not None and old.get('updated_at') == row['updated_at']:
+                continue  # `since` is inclusive: the previous pull's newest issue comes back
+            rows.append(row)
+            changed.append((row, issue_changes(old, row)))
+        if rows:
+            store.upsert_issues(rows)
+            store.upsert_progress([(row['number'],) + checkbox_progress(row['body']) for row in rows])
+    if watermark:
+        store.set_meta(WATERMARK, watermark)
+    return changed, listed
+
+
+def run_pull(args) -> int:
+    """`pull` command"""
+    from .analytics import Columns, refresh_facts, summary
+    from .backends import select_backend
+    from .console import print_error, print_info, print_success
+    from .manifest import Manifest
+    from .paths import default_manifest, default_snapshot
+
+    path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    if path.suffix == '.jsonl':
+        print_error("pull needs a SQLite snapshot")
+        return 1
+    backend = select_backend('rest')
+    plan_ids = {entry['number']: plan_id
+                for plan_id, entry in Manifest.load(default_manifest()).items.items()}
+    start = time.perf_counter()
+    with SnapshotStore(path) as store:
+        since = None if args.full else store.get_meta(WATERMARK) or store.get_meta('issues_since')
+        print_info(f"Pulling issues updated since {since or 'the beginning'}")
+        changed, listed = pull(backend.transport, backend.repo, store, since, args.workers)
+        refresh_facts(store)
+        totals = summary(Columns.load(store))
+
+    for row, changes in changed:
+        if not changes or (changes == ['new'] and not args.verbose):
+            continue
+        name = plan_ids.get(row['number'], '-')
+        print(f"  {name:<14}#{row['number']:<6}{'; '.join(changes)}")
+    new = sum(1 for _, changes in changed if changes == ['new'])
+    print_success(f"Pulled in {time.perf_counter() - start:.1f}s: {listed} issues listed, "
+                  f"{len(changed) - new} changed, {new} new, "
+                  f"{listed - len(changed)} unchanged and not rewritten")
+    print_info(f"Backlog: {totals['open']} of {totals['tasks']} tasks open, "
+               f"{totals['open_hours']:g}h remaining, {totals['closed_hours']:g}h done")
+    return 0
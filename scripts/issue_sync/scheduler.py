@@ -0,0 +1,283 @@
+"""
+Adaptive concurrency (AIMD) and hedged reads for API requests
+
+The limiter gates how many requests are in flight. While latency stays near
+its observed baseline and GitHub does not throttle, the limit grows by about
+one slot per round trip of the whole window (additive increase), counting only
+requests that found the window full: a caller that never uses the slots it has
+learns nothing about whether more would be safe. A 403/429 or a clear latency
+rise cuts it multiplicatively, at most once per cooldown period, so the limit
+settles just below the point where GitHub pushes back.
+
+`apply`, `bulk` and `cleanup` size their thread pools from a generous hard cap
+(`--max-workers`) and start the limit at `--workers`; the limit then moves
+anywhere between 1 and the cap. Issue creation through the job queue (sync)
+sends one request at a time, so the limiter only guards it, it does not
+widen it.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+from urllib.parse import urlsplit
+
+from .metrics import RUN
+from .transport import Response, TransportError
+
+
+def is_throttled(error: BaseException) -> bool:
+    """True for rate-limit / abuse-detection responses, also when wrapped in BackendError"""
+    while error is not None:
+        if isinstance(error, TransportError):
+            if error.status == 429:
+                return True
+            if error.status == 403 and (error.retry_after or 'rate limit' in error.message.lower()):
+                return True
+        error = error.__cause__
+    return False
+
+
+class AIMDLimiter:
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32,
+                 decrease: float = 0.5, latency_tolerance: float = 2.0, cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.throttled = 0
+        self._ewma: Dict[str, float] = {}
+        self._baseline: Dict[str, float] = {}
+        self._last_cut = 0.0
+        self._cond = threading.Condition()
+        RUN.gauge('concurrency_limit', self.current)
+
+    @property
+    def current(self) -> int:
+        return max(self.minimum, min(self.maximum, int(self.limit)))
+
+    def acquire(self) -> bool:
+        """Take a slot; True when it was the last free one (the window is in use)"""
+        with self._cond:
+            while self.in_flight >= self.current:
+                self._cond.wait()
+            self.in_flight += 1
+            return self.in_flight >= self.current
+
+    def release(self, latency: Optional[float] = None, throttled: bool = False, kind: str = '',
+                full: bool = True):
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                RUN.incr('throttled')
+                self._cut(self.decrease)
+            elif latency is not None:
+                self._observe(kind, latency, full)
+            RUN.gauge('concurrency_limit', self.current)
+            self._cond.notify_all()
+
+    def _cut(self, factor: float):
+        now = time.monotonic()
+        if now - self._last_cut < self.cooldown:
+            return
+        self._last_cut = now
+        self.limit = max(float(self.minimum), self.limit * factor)
+
+    def _observe(self, kind: str, latency: float, full: bool):
+        ewma = self._ewma.get(kind)
+        ewma = latency if ewma is None else 0.8 * ewma + 0.2 * latency
+        self._ewma[kind] = ewma
+        baseline = min(self._baseline.get(kind, ewma), ewma)
+        # let the baseline drift up slowly so one lucky fast response does not pin it
+        self._baseline[kind] = baseline * 1.001
+        if ewma > baseline * self.latency_tolerance:
+            self._cut(0.8)
+        elif full and self.limit < self.maximum:
+            self.limit = min(float(self.maximum), self.limit + 1.0 / max(1.0, self.limit))
+
+    @contextmanager
+    def slot(self, kind: str = ''):
+        full = self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.release(throttled=is_throttled(e), kind=kind)
+            raise
+        self.release(time.perf_counter() - start, kind=kind, full=full)
+
+
+# Per-thread handshake between HedgedTransport and the LimitedTransport below it:
+# `on_admit` is called once a limiter slot is held, `latency` is the time in the slot
+_wire = threading.local()
+
+
+def adapt_concurrency(transport, initial: int, maximum: int) -> int:
+    """Start the transport's limiter at `initial` with `maximum` as its hard cap
+
+    Returns the thread count to size a pool with: the cap when a limiter decides
+    how many of those threads may send at once, else the fixed `initial`.
+    """
+    limiter = getattr(transport, 'limiter', None)
+    if limiter is None:
+        return initial
+    limiter.maximum = max(1, maximum)
+    limiter.limit = float(max(limiter.minimum, min(initial, limiter.maximum)))
+    RUN.gauge('concurrency_limit', limiter.current)
+    return limiter.maximum
+
+
+class LimitedTransport:
+    """Runs every request through the limiter; throttled requests back off and retry"""
+
+    def __init__(self, inner, limiter: Optional[AIMDLimiter] = None, retry: int = 3):
+        self.inner = inner
+        self.limiter = limiter or AIMDLimiter()
+        self.retry = retry
+
+    def request(self, method: str, url: str, payload=None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        attempt = 0
+        while True:
+            try:
+                with self.limiter.slot(method):
+                    on_admit = getattr(_wire, 'on_admit', None)
+                    if on_admit is not None:
+                        on_admit()
+                    start = time.perf_counter()
+                    try:
+                        return self.inner.request(method, url, payload, headers)
+                    finally:
+                        _wire.latency = time.perf_counter() - start
+            except TransportError as e:
+                if not is_throttled(e) or attempt >= self.retry:
+                    raise
+                time.sleep(e.retry_after or 2.0 ** (attempt + 1))
+                attempt += 1
+                RUN.incr('retries')
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return self.request('GET', url, headers=headers)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+class HedgedTransport:
+    """Hedged GETs: if a read has not answered by the endpoint's observed p95, an identical
+    second request is sent and the first response wins
+
+    Extra load is capped at `budget` hedges per request sent (plus a small burst), so a slow
+    API cannot double the request volume. Writes are never hedged. The hedging sits above
+    the rate-limit budget and the concurrency limiter, so its clock starts only once the
+    primary holds a limiter slot and its samples are the time spent in the slot: waiting
+    locally for a slot or a budget share never looks like a slow server.
+    """
+
+    def __init__(self, inner, budget: float = 0.05, initial_delay: float = 5.0,
+                 min_samples: int = 20, window: int = 200, workers: int = 64):
+        self.inner = inner
+        self.budget = budget
+        self.initial_delay = initial_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.stats = {'hedged': 0, 'hedge_wins': 0}
+        self._requests = 0
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hedge')
+
+    @staticmethod
+    def _endpoint(url: str) -> str:
+        """/repos/o/r/issues/12?x=1 -> /repos/o/r/issues"""
+        segments = urlsplit(url).path.split('/')
+        return '/'.join(segments[:5])
+
+    def delay_for(self, endpoint: str) -> float:
+        with self._lock:
+            samples = sorted(self._latencies.get(endpoint, ()))
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def _timed(self, endpoint: str, url: str, headers,
+                admitted: Optional[threading.Event] = None) -> Response:
+        _wire.on_admit = admitted.set if admitted is not None else None
+        _wire.latency = None
+        start = time.perf_counter()
+        try:
+            response = self.inner.request('GET', url, None, headers)
+        finally:
+            _wire.on_admit = None
+            if admitted is not None:
+                admitted.set()  # answered or failed without reaching a limiter
+        latency = _wire.latency if _wire.latency is not None else time.perf_counter() - start
+        with self._lock:
+            samples = self._latencies.setdefault(endpoint, deque(maxlen=self.window))
+            samples.append(latency)
+        return response
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self.stats['hedged'] + 1 > self.budget * self._requests + 2:
+                return False
+            self.stats['hedged'] += 1
+        RUN.incr('hedged')
+        return True
+
+    def request(self, method: str, url: str, payload=None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        if method != 'GET':
+            return self.inner.request(method, url, payload, headers)
+        endpoint = self._endpoint(url)
+        with self._lock:
+            self._requests += 1
+        admitted = threading.Event()
+        primary = self._pool.submit(self._timed, endpoint, url, headers, admitted)
+        admitted.wait()  # queueing for the budget or a limiter slot is not server latency
+        try:
+            return primary.result(timeout=self.delay_for(endpoint))
+        except FutureTimeout:
+            pass
+        if not self._may_hedge():
+            return primary.result()
+
+        hedge = self._pool.submit(self._timed, endpoint, url, headers)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.stats['hedge_wins'] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return self.request('GET', url, headers=headers)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def hedge_budget() -> Optional[float]:
+    """ISSUE_SYNC_HEDGE=1 enables hedging with the default 5% budget; a fraction sets the budget"""
+    value = os.environ.get('ISSUE_SYNC_HEDGE', '')
+    if value in ('', '0'):
+        return None
+    try:
+        budget = float(value)
+    except ValueError:
+        return 0.05
+    return 0.05 if budget == 1 else budget
@@ -0,0 +1,89 @@
+"""
+Plan-item filters for targeted runs (--epic, --task, --labels, --phase)
+
+Plan IDs look like "epic4" for an epic and "epic4.task7" for its tasks.
+"""
+
+from typing import Iterable, Optional, Sequence, Set
+
+
+def epic_id_of(plan_id: str) -> str:
+    return plan_id.split('.', 1)[0]
+
+
+def normalize_phase(phase: str) -> str:
+    """Accept "2", "phase2" or "phase-2" and return the label form"""
+    phase = phase.strip().lower()
+    if phase.isdigit():
+        return f"phase-{phase}"
+    if phase.startswith('phase') and not phase.startswith('phase-'):
+        return f"phase-{phase[5:]}"
+    return phase
+
+
+class Selection:
+    """Which plan items a run should load, render and sync
+
+    Filters of different kinds are combined with AND; repeated values of one
+    kind (e.g. two --epic flags) are combined with OR. --labels requires every
+    listed label. An empty selection matches everything.
+    """
+
+    def __init__(self, epics: Iterable[int] = (), tasks: Iterable[str] = (),
+                 labels: Iterable[str] = (), phases: Iterable[str] = ()):
+        self.epics: Set[str] = {f"epic{int(n)}" for n in epics}
+        self.tasks: Set[str] = {t.strip().lower() for t in tasks}
+        self.labels: Set[str] = {label.strip() for label in labels if label.strip()}
+        self.phases: Set[str] = {normalize_phase(p) for p in phases}
+
+    @property
+    def everything(self) -> bool:
+        return not (self.epics or self.tasks or self.labels or self.phases)
+
+    def wants_epic(self, epic_id: str, epic_labels: Sequence[str]) -> bool:
+        """Could anything in this epic be selected? Used to skip loading it"""
+        if self.epics and epic_id not in self.epics:
+            return False
+        if self.tasks and epic_id not in {epic_id_of(t) for t in self.tasks}:
+            return False
+        if self.phases and not self.phases.intersection(epic_labels):
+            return False
+        return True
+
+    def matches(self, plan_id: str, labels: Sequence[str]) -> bool:
+        """Is this exact item selected?"""
+        if self.epics and epic_id_of(plan_id) not in self.epics:
+            return False
+        if self.tasks and plan_id not in self.tasks:
+            return False
+        if self.phases and not self.phases.intersection(labels):
+            return False
+        if self.labels and not self.labels.issubset(labels):
+            return False
+        return True
+
+    @classmethod
+    def from_args(cls, args) -> 'Selection':
+        labels = []
+        for value in getattr(args, 'labels', None) or []:
+            labels.extend(value.split(','))
+        return cls(
+            epics=getattr(args, 'epic', None) or [],
+            tasks=getattr(args, 'task', None) or [],
+            labels=labels,
+            phases=getattr(args, 'phase', None) or [],
+        )
+
+
+def add_selection_arguments(parser, help_suffix: Optional[str] = None):
+    """Register the shared filter flags on an argparse parser"""
+    group = parser.add_argument_group('selection', help_suffix)
+    group.add_argument('--epic', type=int, action='append', metavar='N',
+                       help="only epic N and its tasks (repeatable)")
+    group.add_argument('--task', action='append', metavar='ID',
+                       help="only this task, e.g. epic4.task7 (repeatable)")
+    group.add_argument('--labels', action='append', metavar='L1,L2',
+                       help="only items carrying all of these labels")
+    group.add_argument('--phase', action='append', metavar='PHASE',
+                       help="only items in this phase, e.g. phase-2 (repeatable)")
+    return group
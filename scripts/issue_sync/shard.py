@@ -0,0 +1,537 @@
+"""
+`shard`: split a sync across worker processes that coordinate through SQLite
+
+The selected plan is cut into shards: one for the epics, then chunks of
+each epic's tasks, which only become claimable once their epic has an
+issue number. Workers (processes started by `shard`, or `shard --join` on
+another machine sharing the state directory) claim shards from a lease
+table in .issue_sync/leases.db and renew the lease from a heartbeat thread.
+The heartbeat only renews while the worker keeps finishing items, so a
+shard whose worker crashed or got stuck on one item expires and is claimed
+again by the next free worker.
+
+Issues are never created twice:
+
+  * every item is journalled before its create request; an item already
+    recorded as done is not sent again;
+  * a worker only starts a create while its lease (checked by owner and
+    epoch in the same transaction) has at least a third of its time left,
+    so a worker that lost its shard stops instead of racing the new owner;
+  * a worker that reclaims a shard with an unfinished journal entry lists
+    the repository's issues again before deciding, so a create that landed
+    just before the crash is found by title.
+
+Results live in the lease database until the run finishes; the coordinator
+then merges them into the manifest, so workers never write it concurrently.
+"""
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS shards (
+    run TEXT NOT NULL REFERENCES runs(id),
+    shard INTEGER NOT NULL,
+    items TEXT NOT NULL,            -- JSON list of plan IDs
+    needs TEXT,                     -- plan ID that must have an issue number first
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    epoch INTEGER NOT NULL DEFAULT 0,
+    expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run, shard)
+);
+CREATE TABLE IF NOT EXISTS items (
+    run TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    state TEXT NOT NULL,            -- creating, done, skipped, failed
+    owner TEXT,
+    epoch INTEGER,
+    kind TEXT,
+    title TEXT,
+    action TEXT,
+    number INTEGER,
+    url TEXT,
+    node_id TEXT,
+    error TEXT,
+    PRIMARY KEY (run, plan_id)
+);
+"""
+
+# Exit code of a worker that ran to the end but failed some items; any other
+# non-zero code (1 for an uncaught exception, negative for a signal) is a crash
+ITEMS_FAILED = 3
+
+ITEM_FIELDS = ('plan_id', 'state', 'owner', 'kind', 'title', 'action', 'number', 'url',
+               'node_id', 'error')
+
+
+class LeaseLost(Exception):
+    """Raised when a worker no longer holds the shard it is working on"""
+
+
+@dataclass
+class Lease:
+    run: str
+    shard: int
+    items: List[str]
+    owner: str
+    epoch: int
+    reclaimed: bool = False  # a previous owner's lease expired
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class LeaseStore:
+    def __init__(self, path: Union[str, Path], ttl: float = 30.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None,
+                                  check_same_thread=False)
+        self._lock = threading.Lock()  # the heartbeat thread shares the connection
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.db
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def create_run(self, shards: Sequence[Tuple[List[str], Optional[str]]]) -> Tuple[str, bool]:
+        """Register the shards of a run; returns (run ID, resumed)
+
+        An unfinished run with the same shards is resumed instead, so
+        re-running after an interruption skips everything already done.
+        """
+        digest = hashlib.sha256(json.dumps(shards, sort_keys=True).encode()).hexdigest()
+        with self._transaction() as db:
+            row = db.execute("SELECT id FROM runs WHERE digest = ? AND finished_at IS NULL "
+                             "ORDER BY created_at DESC LIMIT 1", (digest,)).fetchone()
+            if row:
+                self._retry_failed(db, row[0])
+                return row[0], True
+            run = time.strftime('%Y%m%d-%H%M%S') + '-' + uuid.uuid4().hex[:6]
+            db.execute("INSERT INTO runs (id, digest, created_at) VALUES (?, ?, ?)",
+                       (run, digest, time.time()))
+            db.executemany("INSERT INTO shards (run, shard, items, needs) VALUES (?, ?, ?, ?)",
+                           [(run, i, json.dumps(items), needs)
+                            for i, (items, needs) in enumerate(shards)])
+        return run, False
+
+    @staticmethod
+    def _retry_failed(db: sqlite3.Connection, run: str):
+        """Make finished shards that contain failed items claimable again"""
+        failed = {row[0] for row in db.execute(
+            "SELECT plan_id FROM items WHERE run = ? AND state != 'done'", (run,))}
+        for shard, items in db.execute("SELECT shard, items FROM shards WHERE run = ? "
+                                       "AND state = 'done'", (run,)).fetchall():
+            if failed.intersection(json.loads(items)):
+                db.execute("UPDATE shards SET state = 'pending' WHERE run = ? AND shard = ?",
+                           (run, shard))
+
+    def latest_run(self) -> Optional[str]:
+        row = self.db.execute("SELECT id FROM runs WHERE finished_at IS NULL "
+                              "ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def finish_run(self, run: str):
+        with self._transaction() as db:
+            db.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), run))
+
+    def claim(self, run: str, owner: str) -> Optional[Lease]:
+        """Lease the first pending (or expired) shard whose dependency is met"""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT s.shard, s.items, s.state FROM shards s WHERE s.run = ? "
+                "AND (s.state = 'pending' OR (s.state = 'leased' AND s.expires < ?)) "
+                "AND (s.needs IS NULL OR EXISTS (SELECT 1 FROM items i WHERE i.run = s.run "
+                "AND i.plan_id = s.needs AND i.number IS NOT NULL)) "
+                "ORDER BY s.shard LIMIT 1", (run, now)).fetchone()
+            if row is None:
+                return None
+            shard, items, state = row
+            db.execute("UPDATE shards SET state = 'leased', owner = ?, epoch = epoch + 1, "
+                       "expires = ?, attempts = attempts + 1 WHERE run = ? AND shard = ?",
+                       (owner, now + self.ttl, run, shard))
+            epoch = db.execute("SELECT epoch FROM shards WHERE run = ? AND shard = ?",
+                               (run, shard)).fetchone()[0]
+        return Lease(run, shard, json.loads(items), owner, epoch, reclaimed=state == 'leased')
+
+    def _held(self, db: sqlite3.Connection, lease: Lease, margin: float = 0.0) -> bool:
+        row = db.execute("SELECT owner, epoch, expires, state FROM shards "
+                         "WHERE run = ? AND shard = ?", (lease.run, lease.shard)).fetchone()
+        return bool(row and row[0] == lease.owner and row[1] == lease.epoch
+                    and row[3] == 'leased' and row[2] - time.time() > margin)
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extend the lease; False when it was lost to another worker"""
+        with self._transaction() as db:
+            if not self._held(db, lease):
+                return False
+            db.execute("UPDATE shards SET expires = ? WHERE run = ? AND shard = ?",
+                       (time.time() + self.ttl, lease.run, lease.shard))
+        return True
+
+    def begin_item(self, lease: Lease, plan_id: str, kind: str, title: str) -> Optional[Dict]:
+        """Journal an item before its create request
+
+        Returns the item's earlier row (state done / failed / creating), or
+        None when it is new. Raises LeaseLost when the lease is gone or too
+        close to expiring to start a request.
+        """
+        with self._transaction() as db:
+            if not self._held(db, lease, margin=self.ttl / 3):
+                raise LeaseLost(f"shard {lease.shard}")
+            row = db.execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items "
+                             f"WHERE run = ? AND plan_id = ?", (lease.run, plan_id)).fetchone()
+            previous = dict(zip(ITEM_FIELDS, row)) if row else None
+            if previous is None or previous['state'] != 'done':
+                db.execute("INSERT OR REPLACE INTO items (run, plan_id, state, owner, epoch, kind, "
+                           "title) VALUES (?, ?, 'creating', ?, ?, ?, ?)",
+                           (lease.run, plan_id, lease.owner, lease.epoch, kind, title))
+        return previous
+
+    def finish_item(self, lease: Lease, plan_id: str, record: Dict):
+        """Store an item's result_record()"""
+        done = record['action'] in ('created', 'exists')
+        state = 'done' if done else 'skipped' if record['action'] == 'skipped' else 'failed'
+        with self._transaction() as db:
+            db.execute("UPDATE items SET state = ?, action = ?, number = ?, url = ?, node_id = ?, "
+                       "error = ? WHERE run = ? AND plan_id = ? AND owner = ? AND epoch = ?",
+                       (state, record['action'], record.get('number') if done else None,
+                        record.get('url') if done else None, record.get('node_id'),
+                        record.get('error'), lease.run, plan_id, lease.owner, lease.epoch))
+
+    def complete(self, lease: Lease) -> bool:
+        with self._transaction() as db:
+            if not self._held(db, lease):
+                return False
+            db.execute("UPDATE shards SET state = 'done', expires = NULL WHERE run = ? AND shard = ?",
+                       (lease.run, lease.shard))
+        return True
+
+    def number(self, run: str, plan_id: str) -> Optional[int]:
+        row = self.db.execute("SELECT number FROM items WHERE run = ? AND plan_id = ?",
+                              (run, plan_id)).fetchone()
+        return row[0] if row else None
+
+    def held_elsewhere(self, run: str, owners: Sequence[str] = ()) -> bool:
+        """Does a worker other than `owners` (owner ID prefixes) hold a live lease?"""
+        rows = self.db.execute("SELECT owner FROM shards WHERE run = ? AND state = 'leased' "
+                               "AND expires >= ?", (run, time.time())).fetchall()
+        return any(not owner.startswith(tuple(owners)) for (owner,) in rows)
+
+    def active(self, run: str) -> bool:
+        """Could more work still happen: a claimable shard or a live lease?"""
+        now = time.time()
+        row = self.db.execute(
+            "SELECT 1 FROM shards s WHERE s.run = ? AND ((s.state = 'leased' AND s.expires >= ?) "
+            "OR ((s.state = 'pending' OR s.state = 'leased') AND (s.needs IS NULL OR EXISTS "
+            "(SELECT 1 FROM items i WHERE i.run = s.run AND i.plan_id = s.needs "
+            "AND i.number IS NOT NULL)))) LIMIT 1", (run, now)).fetchone()
+        return row is not None
+
+    def status(self, run: str) -> Dict[str, int]:
+        """Shard counts by state; pending shards whose dependency failed count as blocked"""
+        counts: Dict[str, int] = {}
+        for state, blocked, n in self.db.execute(
+                "SELECT s.state, s.needs IS NOT NULL AND NOT EXISTS (SELECT 1 FROM items i "
+                "WHERE i.run = s.run AND i.plan_id = s.needs AND i.number IS NOT NULL), COUNT(*) "
+                "FROM shards s WHERE s.run = ? GROUP BY 1, 2", (run,)):
+            key = 'blocked' if blocked and state != 'done' else state
+            counts[key] = counts.get(key, 0) + n
+        return counts
+
+    def items(self, run: str) -> List[Dict]:
+        cursor = self.db.execute(f"SELECT {', '.join(ITEM_FIELDS)} FROM items WHERE run = ? "
+                                 f"ORDER BY plan_id", (run,))
+        return [dict(zip(ITEM_FIELDS, row)) for row in cursor]
+
+
+def make_shards(plan, shard_size: int) -> List[Tuple[List[str], Optional[str]]]:
+    """[(plan IDs, needed epic)]: all epics first, then chunks of each epic's tasks"""
+    shards: List[Tuple[List[str], Optional[str]]] = [([epic.plan_id for epic in plan.epics], None)]
+    for epic in plan.epics:
+        tasks = [task.plan_id for task in plan.tasks_of(epic.plan_id)]
+        for start in range(0, len(tasks), shard_size):
+            shards.append((tasks[start:start + shard_size], epic.plan_id))
+    return shards
+
+
+class _Heartbeat(threading.Thread):
+    """Renews a lease while the worker makes progress (at most `stall` seconds per item)"""
+
+    def __init__(self, store: LeaseStore, lease: Lease, stall: float):
+        super().__init__(daemon=True)
+        self.store = store
+        self.lease = lease
+        self.stall = stall
+        self.lost = False
+        self._progress = time.monotonic()
+        self._done = threading.Event()
+
+    def progress(self):
+        self._progress = time.monotonic()
+
+    def run(self):
+        while not self._done.wait(self.store.ttl / 3):
+            if time.monotonic() - self._progress > self.stall:
+                return  # stuck: let the lease expire so another worker takes the shard
+            if not self.store.heartbeat(self.lease):
+                self.lost = True
+                return
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class ShardWorker:
+    """Claims shards of one run until none are left and syncs their items"""
+
+    def __init__(self, store: LeaseStore, run: str, engine, source, owner: Optional[str] = None,
+                 poll: float = 1.0):
+        self.store = store
+        self.run = run
+        self.engine = engine
+        self.source = source  # module with load_plan()
+        self.owner = owner or worker_id()
+        self.poll = poll
+        self.counts: Dict[str, int] = {}
+        self.stall = store.ttl * 10  # one item may retry and back off for a while
+        self._record: Optional[Dict] = None
+        self._heartbeat: Optional[_Heartbeat] = None
+
+    def work(self) -> Dict[str, int]:
+        previous = self.engine.on_result
+        self.engine.on_result = self._capture
+        try:
+            while True:
+                lease = self.store.claim(self.run, self.owner)
+                if lease is None:
+                    if not self.store.active(self.run):
+                        break
+                    time.sleep(self.poll)  # shards are leased or waiting for their epic
+                    continue
+                self._shard(lease)
+        finally:
+            self.engine.on_result = previous
+        return self.counts
+
+    def _capture(self, record: Dict):
+        self._record = record
+
+    def _shard(self, lease: Lease):
+        from .console import print_error, print_info
+        from .selection import Selection
+
+        heartbeat = self._heartbeat = _Heartbeat(self.store, lease, self.stall)
+        heartbeat.start()
+        try:
+            if lease.reclaimed:
+                self.engine.forget_issues()
+            plan = self.source.load_plan(Selection(tasks=lease.items))
+            wanted = set(lease.items)
+            print_info(f"Shard {lease.shard}: {len(lease.items)} items"
+                       + (" (reclaimed)" if lease.reclaimed else ""))
+            for epic in plan.epics:
+                if epic.plan_id in wanted:
+                    self._item(lease, epic, 'Epic', epic.render_body)
+            for epic in plan.epics:
+                tasks = [task for task in plan.tasks_of(epic.plan_id) if task.plan_id in wanted]
+                if not tasks:
+                    continue
+                epic_num = self.store.number(self.run, epic.plan_id)
+                for task in tasks:
+                    self._item(lease, task, 'Task',
+                               lambda task=task: task.render_body(epic_num, epic.title))
+        except LeaseLost:
+            print_error(f"Lost the lease on shard {lease.shard}; another worker takes it over")
+            self.counts['lost'] = self.counts.get('lost', 0) + 1
+            return
+        finally:
+            heartbeat.stop()
+        if not heartbeat.lost and self.store.complete(lease):
+            self.counts['shards'] = self.counts.get('shards', 0) + 1
+
+    def _item(self, lease: Lease, item, kind: str, body):
+        previous = self.store.begin_item(lease, item.plan_id, kind.lower(), item.title)
+        if previous and previous['state'] == 'done':
+            return
+        if previous and previous['state'] == 'creating':
+            # the last owner may have created it after our issue list was fetched
+            self.engine.forget_issues()
+        self._record = None
+        self.engine.ensure_issue(item.title, body, list(item.labels), item.milestone,
+                                 kind=kind, plan_id=item.plan_id)
+        record = self._record or {'action': 'failed', 'error': 'no result'}
+        self.store.finish_item(lease, item.plan_id, record)
+        self.counts[record['action']] = self.counts.get(record['action'], 0) + 1
+        self._heartbeat.progress()
+
+
+def _worker_command(source, args, run: str) -> List[str]:
+    """Command line that starts one `shard --join` worker for this plan source"""
+    module = source.__name__
+    if module == '__main__':
+        module = Path(source.__file__).stem
+    command = [sys.executable, '-m', 'issue_sync', '--plan-module', module, 'shard',
+               '--join', run, '--lease', str(args.lease)]
+    if args.leases:
+        command += ['--leases', str(Path(args.leases).resolve())]
+    if args.backend:
+        command += ['--backend', args.backend]
+    if args.allow_duplicates:
+        command.append('--allow-duplicates')
+    return command
+
+
+def _worker_env(source, token: Optional[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    paths = [str(Path(__file__).resolve().parent.parent), str(Path(source.__file__).resolve().parent)]
+    env['PYTHONPATH'] = os.pathsep.join(paths + [p for p in [env.get('PYTHONPATH')] if p])
+    if token:
+        env['GH_TOKEN'] = token
+    return env
+
+
+def _start_engine(args):
+    from .backends import select_backend
+    from .bootstrap import bootstrap
+    from .engine import SyncEngine
+
+    engine = SyncEngine(select_backend(args.backend))
+    engine.allow_duplicates = args.allow_duplicates
+    engine.warm(bootstrap(engine.backend))
+    return engine
+
+
+def run_shard(args) -> int:
+    """`shard` command"""
+    from .backends import BACKENDS
+    from .console import print_error, print_header, print_info, print_success
+    from .manifest import Manifest
+    from .output import result_record
+    from .paths import default_manifest, state_dir
+    from .selection import Selection
+
+    backend = args.backend or os.environ.get('ISSUE_SYNC_BACKEND')
+    if backend in BACKENDS and not BACKENDS[backend].shared:
+        print_error(f"The {backend} backend cannot be sharded: every worker process "
+                    "would sync into its own private repository")
+        return 2
+
+    source = args.load_plan_source()
+    path = Path(args.leases) if args.leases else state_dir() / 'leases.db'
+    with LeaseStore(path, ttl=args.lease) as store:
+        if args.join is not None:
+            run = args.join or store.latest_run()
+            if not run:
+                print_error(f"No unfinished run in {path}")
+                return 1
+            worker = ShardWorker(store, run, _start_engine(args), source)
+            counts = worker.work()
+            print_info(f"Worker {worker.owner} finished: "
+                       + (', '.join(f"{n} {key}" for key, n in sorted(counts.items())) or "idle"))
+            return ITEMS_FAILED if counts.get('failed') else 0
+
+        plan = source.load_plan(Selection.from_args(args))
+        if not plan:
+            print_error("No plan items match the selection")
+            return 1
+        shards = make_shards(plan, args.shard_size)
+        run, resumed = store.create_run(shards)
+        print_header(f"Sharded sync {run}: {len(plan)} items in {len(shards)} shards, "
+                     f"{args.processes} workers" + (" (resumed)" if resumed else ""))
+
+        # labels and milestones once, before any worker needs them
+        engine = _start_engine(args)
+        engine.ensure_labels(label for label in source.LABELS
+                             if label[0] in {n for item in plan.epics + plan.tasks
+                                             for n in item.labels})
+        engine.ensure_milestones(m for m in source.MILESTONES
+                                 if m['title'] in {epic.milestone for epic in plan.epics})
+
+        tokens: List[Optional[str]] = [None]
+        if args.tokens_file:
+            tokens = [line.strip() for line in Path(args.tokens_file).read_text().splitlines()
+                      if line.strip()] or [None]
+        start = time.perf_counter()
+        workers = [subprocess.Popen(_worker_command(source, args, run),
+                                    env=_worker_env(source, tokens[i % len(tokens)]))
+                   for i in range(args.processes)]
+        # failed items are reported from the lease store below, not as crashes
+        crashed = [process for process in workers if process.wait() not in (0, ITEMS_FAILED)]
+        if crashed:
+            print_error(f"{len(crashed)} of {len(workers)} workers crashed "
+                        f"(exit codes {', '.join(str(p.returncode) for p in crashed)})")
+        # only workers joined from other machines can still finish shards
+        ours = [f"{socket.gethostname()}:{process.pid}:" for process in workers]
+        while store.held_elsewhere(run, ours):
+            time.sleep(1.0)
+
+        manifest_path = default_manifest()
+        manifest = Manifest.load(manifest_path)
+        manifest.begin_run('shard', engine.backend.name, run)
+        items = store.items(run)
+        for item in items:
+            manifest.record(result_record(item['kind'] or 'issue', item['action'] or item['state'],
+                                          item['title'], item['plan_id'], item['number'],
+                                          item['url'], item['node_id'], error=item['error']))
+        manifest.finish_run({'total': time.perf_counter() - start})
+        manifest.save(manifest_path)
+
+        status = store.status(run)
+        failed = [item for item in items if item['state'] != 'done']
+        unfinished = status.get('pending', 0) + status.get('leased', 0)
+        if not failed and not status.get('blocked') and not unfinished:
+            store.finish_run(run)
+    actions: Dict[str, int] = {}
+    for item in items:
+        action = item['action'] or item['state']
+        actions[action] = actions.get(action, 0) + 1
+    print_success(f"Sharded sync finished in {time.perf_counter() - start:.1f}s: "
+                  + ', '.join(f"{n} {action}" for action, n in sorted(actions.items())))
+    if failed or status.get('blocked') or unfinished:
+        print_error(f"{len(failed)} items not synced, {status.get('blocked', 0)} shards waiting "
+                    f"for an epic that has no issue, {unfinished} shards not finished; "
+                    f"run the same command again to retry them")
+        return 1
+    return 1 if crashed else 0
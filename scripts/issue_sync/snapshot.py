@@ -0,0 +1,544 @@
+"""
+Local snapshot of the repository's issues, labels, milestones and project items
+
+The first page of each listing is fetched alone to read the Link header's
+rel="last" page number; the remaining pages are then fetched concurrently
+and streamed into the store as they arrive. Issues are listed in creation
+order, which an edit during the run cannot reshuffle, so page boundaries
+stay put while pages are read out of order. Issues can be refreshed
+incrementally with `since` (the previous run's start time is kept as a
+watermark).
+
+Two on-disk formats are supported: SQLite (default, queryable, updated in
+place) and JSONL (append-only; the last record for a key wins).
+"""
+
+import json
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Union
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+from .metrics import RUN
+from .transport import HttpTransport, transport_stats
+
+ISSUE_FIELDS = (
+    'number', 'node_id', 'title', 'state', 'state_reason', 'body', 'labels', 'milestone',
+    'url', 'comments', 'created_at', 'updated_at', 'closed_at',
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    number INTEGER PRIMARY KEY,
+    node_id TEXT,
+    title TEXT NOT NULL,
+    state TEXT,
+    state_reason TEXT,
+    body TEXT,
+    labels TEXT,          -- JSON array of label names
+    milestone TEXT,       -- milestone title
+    url TEXT,
+    comments INTEGER,
+    created_at TEXT,
+    updated_at TEXT,
+    closed_at TEXT
+);
+CREATE INDEX IF NOT EXISTS issues_title ON issues(title);
+CREATE INDEX IF NOT EXISTS issues_updated ON issues(updated_at);
+CREATE TABLE IF NOT EXISTS labels (
+    name TEXT PRIMARY KEY,
+    color TEXT,
+    description TEXT,
+    node_id TEXT
+);
+CREATE TABLE IF NOT EXISTS milestones (
+    number INTEGER PRIMARY KEY,
+    title TEXT,
+    state TEXT,
+    description TEXT,
+    node_id TEXT,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS project_items (
+    id TEXT PRIMARY KEY,
+    project INTEGER,
+    issue_number INTEGER,
+    content_id TEXT
+);
+CREATE TABLE IF NOT EXISTS progress (
+    number INTEGER PRIMARY KEY,  -- task-list items in the issue body
+    checked INTEGER,
+    total INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# Creation order is stable under edits; `sort=updated` would move an issue edited
+# mid-listing to the end and shift an older one into a page already read
+ISSUE_LISTING = {'state': 'all', 'per_page': 100, 'sort': 'created', 'direction': 'asc'}
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def issue_record(data: Dict) -> Dict:
+    """Flatten a REST issue payload into a snapshot row"""
+    return {
+        'number': data['number'],
+        'node_id': data.get('node_id', ''),
+        'title': data['title'],
+        'state': data.get('state'),
+        'state_reason': data.get('state_reason'),
+        'body': data.get('body') or '',
+        'labels': [label['name'] if isinstance(label, dict) else label
+                   for label in data.get('labels', [])],
+        'milestone': (data.get('milestone') or {}).get('title'),
+        'url': data.get('html_url', ''),
+        'comments': data.get('comments', 0),
+        'created_at': data.get('created_at'),
+        'updated_at': data.get('updated_at'),
+        'closed_at': data.get('closed_at'),
+    }
+
+
+def label_record(data: Dict) -> Dict:
+    return {'name': data['name'], 'color': data.get('color', ''),
+            'description': data.get('description') or '', 'node_id': data.get('node_id', '')}
+
+
+def milestone_record(data: Dict) -> Dict:
+    return {'number': data['number'], 'title': data['title'], 'state': data.get('state'),
+            'description': data.get('description') or '', 'node_id': data.get('node_id', ''),
+            'updated_at': data.get('updated_at')}
+
+
+class SnapshotStore:
+    """SQLite-backed snapshot, also used as the local sync-state store"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upsert_issues(self, rows: List[Dict]):
+        self.db.executemany(
+            f"INSERT OR REPLACE INTO issues ({', '.join(ISSUE_FIELDS)}) "
+            f"VALUES ({', '.join('?' for _ in ISSUE_FIELDS)})",
+            [tuple(json.dumps(row[f], ensure_ascii=False) if f == 'labels' else row.get(f)
+                   for f in ISSUE_FIELDS) for row in rows]
+        )
+        self.db.commit()
+
+    def replace_labels(self, rows: List[Dict]):
+        self.db.execute("DELETE FROM labels")
+        self.db.executemany(
+            "INSERT INTO labels (name, color, description, node_id) VALUES (?, ?, ?, ?)",
+            [(r['name'], r['color'], r['description'], r['node_id']) for r in rows]
+        )
+        self.db.commit()
+
+    def replace_milestones(self, rows: List[Dict]):
+        self.db.execute("DELETE FROM milestones")
+        self.db.executemany(
+            "INSERT INTO milestones (number, title, state, description, node_id, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(r['number'], r['title'], r['state'], r['description'], r['node_id'], r['updated_at'])
+             for r in rows]
+        )
+        self.db.commit()
+
+    def replace_project_items(self, project: int, rows: List[Dict]):
+        self.db.execute("DELETE FROM project_items WHERE project = ?", (project,))
+        self.db.executemany(
+            "INSERT OR REPLACE INTO project_items (id, project, issue_number, content_id) "
+            "VALUES (?, ?, ?, ?)",
+            [(r['id'], project, r.get('issue_number'), r.get('content_id')) for r in rows]
+        )
+        self.db.commit()
+
+    def issue(self, number: int) -> Optional[Dict]:
+        values = self.db.execute(f"SELECT {', '.join(ISSUE_FIELDS)} FROM issues WHERE number = ?",
+                                 (number,)).fetchone()
+        if values is None:
+            return None
+        row = dict(zip(ISSUE_FIELDS, values))
+        row['labels'] = json.loads(row['labels'] or '[]')
+        return row
+
+    def delete_issue(self, number: int):
+        self.db.execute("DELETE FROM issues WHERE number = ?", (number,))
+        self.db.execute("DELETE FROM progress WHERE number = ?", (number,))
+        self.db.commit()
+
+    def upsert_label(self, row: Dict, old_name: Optional[str] = None):
+        """Insert or update one label; `old_name` renames it on every stored issue too"""
+        if old_name and old_name != row['name']:
+            self.delete_label(old_name)
+            renamed = []
+            for issue in self.issues():
+                if old_name in issue['labels']:
+                    issue['labels'] = [row['name'] if n == old_name else n for n in issue['labels']]
+                    renamed.append(issue)
+            if renamed:
+                self.upsert_issues(renamed)
+        self.db.execute(
+            "INSERT OR REPLACE INTO labels (name, color, description, node_id) VALUES (?, ?, ?, ?)",
+            (row['name'], row['color'], row['description'], row['node_id']))
+        self.db.commit()
+
+    def delete_label(self, name: str):
+        self.db.execute("DELETE FROM labels WHERE name = ?", (name,))
+        self.db.commit()
+
+    def upsert_milestone(self, row: Dict):
+        self.db.execute(
+            "INSERT OR REPLACE INTO milestones (number, title, state, description, node_id, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (row['number'], row['title'], row['state'], row['description'], row['node_id'],
+             row['updated_at']))
+        self.db.commit()
+
+    def delete_milestone(self, number: int):
+        self.db.execute("DELETE FROM milestones WHERE number = ?", (number,))
+        self.db.commit()
+
+    def upsert_project_item(self, row: Dict):
+        self.db.execute(
+            "INSERT OR REPLACE INTO project_items (id, project, issue_number, content_id) "
+            "VALUES (?, ?, ?, ?)",
+            (row['id'], row.get('project'), row.get('issue_number'), row.get('content_id')))
+        self.db.commit()
+
+    def delete_project_item(self, item_id: str):
+        self.db.execute("DELETE FROM project_items WHERE id = ?", (item_id,))
+        self.db.commit()
+
+    def upsert_progress(self, rows: List[tuple]):
+        """(number, checked, total) rows"""
+        self.db.executemany("INSERT OR REPLACE INTO progress (number, checked, total) VALUES (?, ?, ?)",
+                            rows)
+        self.db.commit()
+
+    def progress(self) -> Dict[int, tuple]:
+        return {number: (checked, total) for number, checked, total in
+                self.db.execute("SELECT number, checked, total FROM progress")}
+
+    def issues(self) -> List[Dict]:
+        cursor = self.db.execute(f"SELECT {', '.join(ISSUE_FIELDS)} FROM issues ORDER BY number")
+        rows = []
+        for values in cursor:
+            row = dict(zip(ISSUE_FIELDS, values))
+            row['labels'] = json.loads(row['labels'] or '[]')
+            rows.append(row)
+        return rows
+
+    def labels(self) -> List[Dict]:
+        cursor = self.db.execute("SELECT name, color, description, node_id FROM labels")
+        return [dict(zip(('name', 'color', 'description', 'node_id'), r)) for r in cursor]
+
+    def milestones(self) -> List[Dict]:
+        cursor = self.db.execute(
+            "SELECT number, title, state, description, node_id, updated_at FROM milestones")
+        return [dict(zip(('number', 'title', 'state', 'description', 'node_id', 'updated_at'), r))
+                for r in cursor]
+
+    def project_items(self) -> List[Dict]:
+        cursor = self.db.execute("SELECT id, project, issue_number, content_id FROM project_items")
+        return [dict(zip(('id', 'project', 'issue_number', 'content_id'), r)) for r in cursor]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        self.db.commit()
+
+
+class JsonlSnapshotWriter:
+    """Append-only JSONL sink with the same write interface as SnapshotStore"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self, kind: str, rows: List[Dict], **extra):
+        for row in rows:
+            record = dict(row, type=kind, **extra)
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def upsert_issues(self, rows: List[Dict]):
+        self._write('issue', rows)
+
+    def replace_labels(self, rows: List[Dict]):
+        self._write('label', rows)
+
+    def replace_milestones(self, rows: List[Dict]):
+        self._write('milestone', rows)
+
+    def replace_project_items(self, project: int, rows: List[Dict]):
+        self._write('project_item', rows, project=project)
+
+    def set_meta(self, key: str, value: str):
+        self._write('meta', [{'key': key, 'value': value}])
+
+    def get_meta(self, key: str) -> Optional[str]:
+        value = None
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record.get('type') == 'meta' and record.get('key') == key:
+                        value = record['value']
+        return value
+
+
+class Snapshot:
+    """In-memory view of a snapshot file, keyed for fast lookups"""
+
+    def __init__(self, issues: List[Dict], labels: List[Dict], milestones: List[Dict],
+                 project_items: List[Dict], meta: Optional[Dict[str, str]] = None):
+        self.issues: Dict[int, Dict] = {issue['number']: issue for issue in issues}
+        self.labels: Dict[str, Dict] = {label['name']: label for label in labels}
+        self.milestones: Dict[str, Dict] = {m['title']: m for m in milestones}
+        self.project_items = project_items
+        self.meta = meta or {}
+        self._by_title: Optional[Dict[str, List[Dict]]] = None
+        self._duplicates = None
+
+    def by_title(self) -> Dict[str, List[Dict]]:
+        """Stripped title -> issues with that title, oldest first"""
+        if self._by_title is None:
+            self._by_title = {}
+            for number in sorted(self.issues):
+                issue = self.issues[number]
+                self._by_title.setdefault(issue['title'].strip(), []).append(issue)
+        return self._by_title
+
+    def duplicates(self):
+        """Near-duplicate index over every issue, built on first use"""
+        if self._duplicates is None:
+            from .dedupe import DuplicateIndex
+            self._duplicates = DuplicateIndex.build(self.issues[n] for n in sorted(self.issues))
+        return self._duplicates
+
+    def find(self, title: str) -> Optional[Dict]:
+        """Issue with this title, or with the same title after normalization"""
+        matches = self.by_title().get(title.strip())
+        if matches:
+            return matches[0]
+        number = self.duplicates().exact(title)
+        return self.issues[number] if number is not None else None
+
+
+def load_snapshot(path: Union[str, Path]) -> Snapshot:
+    """Read a SQLite or JSONL snapshot into memory"""
+    path = Path(path)
+    if path.suffix == '.jsonl':
+        issues, labels, milestones, items, meta = {}, {}, {}, {}, {}
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                kind = record.pop('type', None)
+                if kind == 'issue':
+                    issues[record['number']] = record
+                elif kind == 'label':
+                    labels[record['name']] = record
+                elif kind == 'milestone':
+                    milestones[record['number']] = record
+                elif kind == 'project_item':
+                    items[record['id']] = record
+                elif kind == 'meta':
+                    meta[record['key']] = record['value']
+        return Snapshot(list(issues.values()), list(labels.values()),
+                        list(milestones.values()), list(items.values()), meta)
+
+    with SnapshotStore(path) as store:
+        meta = dict(store.db.execute("SELECT key, value FROM meta"))
+        return Snapshot(store.issues(), store.labels(), store.milestones(),
+                        store.project_items(), meta)
+
+
+def _with_page(url: str, page: int) -> str:
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    query['page'] = [str(page)]
+    return urlunsplit(parts._replace(query=urlencode(query, doseq=True)))
+
+
+def last_page(headers: Dict[str, str]) -> int:
+    """Page count from the Link header's rel="last" entry (1 when absent)"""
+    match = re.search(r'<([^>]+)>;\s*rel="last"', headers.get('link', ''))
+    if not match:
+        return 1
+    pages = parse_qs(urlsplit(match.group(1)).query).get('page')
+    return int(pages[0]) if pages else 1
+
+
+def fetch_pages(transport: HttpTransport, path: str, workers: int = 8) -> Iterator[List[Dict]]:
+    """Yield every page of a REST listing, pages 2..N fetched concurrently
+
+    Items that appear during the listing can push the tail past page N, so a
+    full last page is followed by further pages, read one at a time.
+    """
+    first = transport.get(path)
+    yield first.json() or []
+    pages = last_page(first.headers)
+    if pages <= 1:
+        return
+    per_page = int(parse_qs(urlsplit(path).query).get('per_page', ['30'])[0])
+    tail: List[Dict] = []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, pages - 1))) as pool:
+        futures = {pool.submit(transport.get, _with_page(path, page)): page
+                   for page in range(2, pages + 1)}
+        for future in as_completed(futures):
+            items = future.result().json() or []
+            if futures[future] == pages:
+                tail = items
+            yield items
+    while len(tail) >= per_page:
+        pages += 1
+        tail = transport.get(_with_page(path, pages)).json() or []
+        if tail:
+            yield tail
+
+
+PROJECT_ITEMS_QUERY = """
+query($owner: String!, $number: Int!, $cursor: String) {
+  repositoryOwner(login: $owner) {
+    ... on ProjectV2Owner {
+      projectV2(number: $number) {
+        items(first: 100, after: $cursor) {
+          nodes { id content { ... on Issue { id number } } }
+          pageInfo { hasNextPage endCursor }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def fetch_project_items(transport: HttpTransport, owner: str, project: int) -> List[Dict]:
+    """Project items are cursor-paginated, so these pages are read in sequence"""
+    items, cursor = [], None
+    while True:
+        data = transport.request('POST', '/graphql', {
+            'query': PROJECT_ITEMS_QUERY,
+            'variables': {'owner': owner, 'number': project, 'cursor': cursor},
+        }).json()
+        owner_data = (data.get('data') or {}).get('repositoryOwner') or {}
+        connection = (owner_data.get('projectV2') or {}).get('items')
+        if not connection:
+            break
+        for node in connection['nodes']:
+            content = node.get('content') or {}
+            items.append({'id': node['id'], 'issue_number': content.get('number'),
+                          'content_id': content.get('id')})
+        if not connection['pageInfo']['hasNextPage']:
+            break
+        cursor = connection['pageInfo']['endCursor']
+    return items
+
+
+def take_snapshot(transport: HttpTransport, repo: str, sink, since: Optional[str] = None,
+                  project: Optional[int] = None, workers: int = 8) -> Dict[str, int]:
+    """Stream the repository state into `sink`; returns per-kind counts"""
+    started = utc_now()
+    counts = {'issues': 0, 'labels': 0, 'milestones': 0, 'project_items': 0}
+
+    with RUN.phase('labels'):
+        labels = [label_record(d) for page in
+                  fetch_pages(transport, f"/repos/{repo}/labels?per_page=100", workers) for d in page]
+        sink.replace_labels(labels)
+        counts['labels'] = len(labels)
+
+    with RUN.phase('milestones'):
+        milestones = [milestone_record(d) for page in
+                      fetch_pages(transport, f"/repos/{repo}/milestones?state=all&per_page=100", workers)
+                      for d in page]
+        sink.replace_milestones(milestones)
+        counts['milestones'] = len(milestones)
+
+    query = dict(ISSUE_LISTING)
+    if since:
+        query['since'] = since
+    with RUN.phase('issues'):
+        for page in fetch_pages(transport, f"/repos/{repo}/issues?{urlencode(query)}", workers):
+            rows = [issue_record(d) for d in page if 'pull_request' not in d]
+            sink.upsert_issues(rows)
+            counts['issues'] += len(rows)
+
+    if project is not None:
+        with RUN.phase('project_items'):
+            items = fetch_project_items(transport, repo.split('/')[0], project)
+            sink.replace_project_items(project, items)
+            counts['project_items'] = len(items)
+
+    sink.set_meta('issues_since', started)
+    sink.set_meta('snapshot_at', started)
+    return counts
+
+
+def open_sink(path: Union[str, Path]):
+    path = Path(path)
+    return JsonlSnapshotWriter(path) if path.suffix == '.jsonl' else SnapshotStore(path)
+
+
+def run_snapshot(args) -> int:
+    """`snapshot` command"""
+    from .backends import select_backend
+    from .console import print_info, print_success
+    from .paths import default_snapshot
+
+    backend = select_backend('rest')
+    path = Path(args.out) if args.out else default_snapshot()
+    start = time.perf_counter()
+    with open_sink(path) as sink:
+        since = args.since
+        if since == 'last':
+            since = sink.get_meta('issues_since')
+            print_info(f"Incremental refresh since {since or 'the beginning'}")
+        counts = take_snapshot(backend.transport, backend.repo, sink, since=since,
+                               project=args.project, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print_success(
+        f"Snapshot {path}: {counts['issues']} issues, {counts['labels']} labels, "
+        f"{counts['milestones']} milestones, {counts['project_items']} project items "
+        f"in {elapsed:.1f}s"
+    )
+    stats = transport_stats(backend.transport)
+    if 'fresh' in stats:
+        print_info(f"HTTP cache: {stats['fresh']} fresh, {stats['revalidated']} revalidated (304), "
+                   f"{stats['miss']} fetched, {stats.get('coalesced', 0)} coalesced")
+    return 0
@@ -0,0 +1,294 @@
+"""
+HTTP transport for the REST and GraphQL backends
+
+Keeps one persistent HTTPS connection per thread so repeated API calls do not
+pay a TCP/TLS handshake (or a `gh` process spawn) each time.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from functools import lru_cache
+from http.client import HTTPException, HTTPSConnection
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from .metrics import RUN
+
+API_HOST = 'api.github.com'
+USER_AGENT = 'nav_blog-issue-sync'
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+
+class TransportError(Exception):
+    """Raised when a request fails permanently"""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after  # seconds, from the Retry-After header
+        self.headers = headers or {}    # lower-cased response headers, if there was a response
+
+
+class Response:
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers  # lower-cased header names
+        self.body = body
+
+    def json(self):
+        if not self.body:
+            return None
+        return json.loads(self.body)
+
+
+@lru_cache(maxsize=None)
+def resolve_token() -> Optional[str]:
+    """Find an API token from the environment or the gh CLI login"""
+    for var in ('GH_TOKEN', 'GITHUB_TOKEN'):
+        token = os.environ.get(var)
+        if token:
+            return token
+    if shutil.which('gh'):
+        try:
+            result = subprocess.run(
+                ['gh', 'auth', 'token'],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=10
+            )
+            return result.stdout.strip() or None
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            return None
+    return None
+
+
+@lru_cache(maxsize=None)
+def resolve_repo() -> Optional[str]:
+    """Return "owner/name" from GITHUB_REPOSITORY or the origin remote"""
+    repo = os.environ.get('GITHUB_REPOSITORY')
+    if repo:
+        return repo
+    try:
+        result = subprocess.run(
+            ['git', 'remote', 'get-url', 'origin'],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=10
+        )
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r'github\.com[:/]([^/]+/[^/]+?)(?:\.git)?$', result.stdout.strip())
+    return match.group(1) if match else None
+
+
+def is_idempotent(method: str, path: str, payload=None) -> bool:
+    """Can this request be sent twice without doing its work twice?
+
+    GraphQL queries are; mutations and other POST/PATCH requests (creates) are not.
+    """
+    if method in IDEMPOTENT_METHODS:
+        return True
+    if path.startswith('/graphql') and isinstance(payload, dict):
+        return not payload.get('query', '').lstrip().startswith('mutation')
+    return False
+
+
+class HttpTransport:
+    """Minimal keep-alive HTTPS client for api.github.com"""
+
+    def __init__(self, token: str, host: str = API_HOST, timeout: float = 30, retry: int = 3):
+        self.token = token
+        self.host = host
+        self.timeout = timeout
+        self.retry = retry
+        self._local = threading.local()
+
+    def _connection(self) -> HTTPSConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = HTTPSConnection(self.host, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def sends(self) -> int:
+        """Requests this thread has put on the wire (including resends)"""
+        return getattr(self._local, 'sends', 0)
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def request(self, method: str, url: str, payload=None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        """Send a request; `url` may be absolute or a path such as /repos/o/r/labels
+
+        Failures before the request went out are retried. Timeouts, dropped
+        connections and 5xx after it went out are only retried for idempotent
+        requests: a create may have landed, and the caller has to look first.
+        """
+        parts = urlsplit(url)
+        path = parts.path + (f"?{parts.query}" if parts.query else '')
+        retry_sent = is_idempotent(method, parts.path, payload)
+        send_headers = {
+            'Authorization': f"Bearer {self.token}",
+            'Accept': 'application/vnd.github+json',
+            'User-Agent': USER_AGENT,
+            'X-GitHub-Api-Version': '2022-11-28',
+        }
+        if headers:
+            send_headers.update(headers)
+        body = None
+        if payload is not None:
+            body = json.dumps(payload).encode('utf-8')
+            send_headers['Content-Type'] = 'application/json'
+
+        last_error = None
+        for attempt in range(self.retry):
+            if attempt:
+                RUN.incr('retries')
+            RUN.incr('requests')
+            sent = False
+            try:
+                conn = self._connection()
+                conn.request(method, path, body=body, headers=send_headers)
+                sent = True
+                self._local.sends = self.sends() + 1
+                raw = conn.getresponse()
+                data = raw.read()
+                response = Response(
+                    raw.status,
+                    {k.lower(): v for k, v in raw.getheaders()},
+                    data
+                )
+            except (HTTPException, OSError) as e:
+                self._reset()
+                last_error = TransportError(0, str(e))
+                if sent and not retry_sent:
+                    raise last_error
+                if attempt < self.retry - 1:
+                    time.sleep(2)
+                continue
+
+            if response.status >= 500 and retry_sent and attempt < self.retry - 1:
+                last_error = TransportError(response.status, data.decode('utf-8', 'replace'))
+                time.sleep(2)
+                continue
+            if response.status >= 400:
+                retry_after = response.headers.get('retry-after')
+                raise TransportError(response.status, data.decode('utf-8', 'replace'),
+                                     float(retry_after) if retry_after and retry_after.isdigit() else None,
+                                     response.headers)
+            return response
+
+        raise last_error or TransportError(0, f"{method} {url} failed")
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return self.request('GET', url, headers=headers)
+
+
+class _Flight:
+    __slots__ = ('done', 'response', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Optional[Response] = None
+        self.error: Optional[BaseException] = None
+
+
+class CoalescingTransport:
+    """Single-flight wrapper: concurrent identical GETs share one request and its result"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.stats = {'coalesced': 0}
+        self._inflight: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, payload=None,
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        if method != 'GET':
+            return self.inner.request(method, url, payload, headers)
+        parts = urlsplit(url)
+        key = (parts.path, parts.query, tuple(sorted((headers or {}).items())))
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.stats['coalesced'] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.response
+
+        try:
+            flight.response = self.inner.request(method, url, payload, headers)
+            return flight.response
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> Response:
+        return self.request('GET', url, headers=headers)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def transport_stats(transport) -> Dict[str, int]:
+    """Merge the counters of every wrapper layer around a transport"""
+    stats: Dict[str, int] = {}
+    while transport is not None:
+        stats.update(getattr(transport, 'stats', None) or {})
+        transport = transport.__dict__.get('inner')
+    return stats
+
+
+def build_transport(token: str):
+    """HttpTransport behind the adaptive concurrency limiter, the shared rate-limit budget
+    (unless ISSUE_SYNC_NO_BUDGET is set), optional read hedging (ISSUE_SYNC_HEDGE), the
+    on-disk response cache (unless ISSUE_SYNC_NO_CACHE is set) and request coalescing"""
+    from .budget import BudgetTransport, shared_budget
+    from .cache import CachingTransport, DiskCache, cache_enabled, configured_ttls
+    from .paths import state_dir
+    from .scheduler import HedgedTransport, LimitedTransport, hedge_budget
+
+    shared = shared_budget(token)
+    # with the budget, throttled requests are retried by BudgetTransport, outside the limiter
+    transport = LimitedTransport(HttpTransport(token), retry=0 if shared is not None else 3)
+    if shared is not None:
+        transport = BudgetTransport(transport, shared)
+    budget = hedge_budget()
+    if budget:
+        transport = HedgedTransport(transport, budget)
+    if cache_enabled():
+        transport = CachingTransport(transport, DiskCache(state_dir() / 'http_cache.db'),
+                                     configured_ttls())
+    return CoalescingTransport(transport)
+
+
+def next_link(headers: Dict[str, str]) -> Optional[str]:
+    """Extract the rel="next" URL from a Link header"""
+    link = headers.get('link', '')
+    for part in link.split(','):
+        match = re.search(r'<([^>]+)>;\s*rel="next"', part)
+        if match:
+            return match.group(1)
+    return None
@@ -0,0 +1,106 @@
+"""
+Pre-flight plan validation
+
+Everything GitHub would reject (or silently mangle) is checked locally
+before the first request: unknown labels and milestones, bodies over the
+65,536 character limit, and duplicate titles or branch names. Checks that
+depend only on shared values (interned label tuples, milestones) run once
+per distinct value, so a 10k-item plan validates in milliseconds.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from .plan import Plan, PlanItem, TaskItem
+
+MAX_BODY = 65536
+# Widest issue number a task body may reference; keeps the size check conservative
+_EPIC_NUMBER_PLACEHOLDER = 9999999
+
+
+class Problem:
+    __slots__ = ('plan_id', 'check', 'message')
+
+    def __init__(self, plan_id: str, check: str, message: str):
+        self.plan_id = plan_id
+        self.check = check
+        self.message = message
+
+    def __str__(self):
+        return f"{self.plan_id}: {self.message}"
+
+
+def validate_plan(plan: Plan, label_names: Iterable[str], milestone_titles: Iterable[str],
+                  max_body: int = MAX_BODY) -> List[Problem]:
+    """Return every problem found in the plan; an empty list means it is safe to sync"""
+    known_labels = set(label_names)
+    known_milestones = set(milestone_titles)
+    problems: List[Problem] = []
+    unknown_by_labels: Dict[tuple, List[str]] = {}
+    titles: Dict[str, str] = {}
+    branches: Dict[str, str] = {}
+
+    items: List[PlanItem] = list(plan.epics)
+    items.extend(plan.tasks)
+    for item in items:
+        unknown = unknown_by_labels.get(item.labels)
+        if unknown is None:
+            unknown = unknown_by_labels[item.labels] = [
+                name for name in item.labels if name not in known_labels]
+        if unknown:
+            problems.append(Problem(item.plan_id, 'label',
+                                    f"unknown label(s) {', '.join(unknown)}"))
+        if item.milestone and item.milestone not in known_milestones:
+            problems.append(Problem(item.plan_id, 'milestone',
+                                    f"unknown milestone {item.milestone!r}"))
+
+        title = item.title.strip()
+        first = titles.setdefault(title, item.plan_id)
+        if first != item.plan_id:
+            problems.append(Problem(item.plan_id, 'title', f"duplicate title (also {first})"))
+
+        if isinstance(item, TaskItem):
+            body = item.render_body(_EPIC_NUMBER_PLACEHOLDER, plan.epic(item.epic_id).title)
+            first = branches.setdefault(item.branch, item.plan_id)
+            if first != item.plan_id:
+                problems.append(Problem(item.plan_id, 'branch',
+                                        f"duplicate branch {item.branch!r} (also {first})"))
+        else:
+            body = item.render_body()
+        if len(body) > max_body:
+            problems.append(Problem(item.plan_id, 'body',
+                                    f"body is {len(body)} characters (limit {max_body})"))
+    return problems
+
+
+def validate_source(plan: Plan, source) -> List[Problem]:
+    """Validate against the labels and milestones a plan module declares"""
+    return validate_plan(plan, [label[0] for label in source.LABELS],
+                         [m['title'] for m in source.MILESTONES])
+
+
+def print_problems(problems: List[Problem], limit: Optional[int] = 50):
+    from .console import print_error
+
+    for problem in problems[:limit]:
+        print_error(str(problem))
+    if limit is not None and len(problems) > limit:
+        print_error(f"... and {len(problems) - limit} more")
+
+
+def run_validate(args) -> int:
+    """`validate` command"""
+    import time
+
+    from .console import print_success
+    from .selection import Selection
+
+    source = args.load_plan_source()
+    plan = source.load_plan(Selection.from_args(args))
+    start = time.perf_counter()
+    problems = validate_source(plan, source)
+    elapsed = (time.perf_counter() - start) * 1000
+    if problems:
+        print_problems(problems, None if args.verbose else 50)
+        return 1
+    print_success(f"{len(plan)} plan items valid ({elapsed:.0f} ms)")
+    return 0
@@ -0,0 +1,389 @@
+"""
+`watch`: re-sync only what changed while the plan or the PRD is being edited
+
+The plan module and the PRD are watched with inotify (through ctypes, Linux
+only) or, where that is unavailable, by polling their mtime and size. Events
+are debounced so a burst of saves becomes one batch. Each batch:
+
+  * plan module: reloaded, and every item's fingerprint compared with the
+    previous one; only new or changed items are diffed against the local
+    snapshot and applied, and the snapshot is updated afterwards.
+  * PRD: split into heading sections, and only sections whose text changed
+    are re-parsed. "Story N" maps to epicN and "Phase N" to the epics
+    labelled phase-N. Epic bodies are written in the plan module, so a
+    changed story is checked for user-story and acceptance-criteria lines
+    the epic body no longer carries, and those are reported.
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import importlib
+import os
+import re
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from .plan import Plan, fingerprint
+
+DEFAULT_PRD = Path('docs') / 'ui-ux-upgrade-cyberpunk-prd.md'
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+_HEADING = re.compile(r'^(#{2,3})\s+(.+?)\s*$', re.M)
+_STORY = re.compile(r'^Story\s*(\d+)', re.I)
+_PHASE = re.compile(r'^Phase\s*(\d+)', re.I)
+_STORY_LINE = re.compile(r'^\*\*(?:作为|我想要|以便)\*\*.*$', re.M)
+_CRITERION = re.compile(r'^- \[[ xX]\]\s*(.+?)\s*$', re.M)
+
+
+class PollingWatcher:
+    """Portable fallback: compares (mtime, size) of each file every `interval` seconds"""
+
+    name = 'polling'
+
+    def __init__(self, paths: Iterable[Path], interval: float = 0.5):
+        self.paths = [Path(p).resolve() for p in paths]
+        self.interval = interval
+        self._state = {path: self._stat(path) for path in self.paths}
+
+    @staticmethod
+    def _stat(path: Path):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Block until a watched file changes (or the timeout passes); returns the changed paths"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in self.paths:
+                state = self._stat(path)
+                if state != self._state[path]:
+                    self._state[path] = state
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Watches the files' directories, so editors that save by rename are seen too"""
+
+    name = 'inotify'
+
+    def __init__(self, paths: Iterable[Path]):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify is not available")
+        self.paths = {Path(p).resolve() for p in paths}
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, Path] = {}
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        for directory in {path.parent for path in self.paths}:
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), mask)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(errno, f"inotify_add_watch failed for {directory}")
+            self._dirs[wd] = directory
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        changed: Set[Path] = set()
+        while not changed:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return changed
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            offset = 0
+            while offset < len(data):
+                wd, _, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                if path in self.paths:
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(paths: Iterable[Path], poll: bool = False, interval: float = 0.5):
+    paths = list(paths)
+    if not poll:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(paths, interval)
+
+
+def debounced(watcher, quiet: float = 0.5, max_wait: float = 5.0) -> Set[Path]:
+    """Wait for a change, then keep collecting until `quiet` seconds pass without one"""
+    changed = watcher.wait()
+    deadline = time.monotonic() + max_wait
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return changed
+        more = watcher.wait(min(quiet, remaining))
+        if not more:
+            return changed
+        changed |= more
+
+
+def plan_fingerprints(plan: Plan) -> Dict[str, str]:
+    digests = {epic.plan_id: fingerprint(epic) for epic in plan.epics}
+    for task in plan.tasks:
+        digests[task.plan_id] = fingerprint(task, plan.epic(task.epic_id).title)
+    return digests
+
+
+def changed_ids(old: Dict[str, str], new: Dict[str, str]) -> Set[str]:
+    """New or modified plan IDs (items removed from the plan are left alone on GitHub)"""
+    return {plan_id for plan_id, digest in new.items() if old.get(plan_id) != digest}
+
+
+def prd_sections(text: str) -> Dict[str, str]:
+    """Heading -> digest of its text, for every ## and ### section"""
+    sections = {}
+    matches = list(_HEADING.finditer(text))
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(text)
+        heading = match.group(2)
+        sections[heading] = hashlib.sha1(text[match.end():end].encode('utf-8')).hexdigest()
+    return sections
+
+
+def section_text(text: str, heading: str) -> str:
+    matches = list(_HEADING.finditer(text))
+    for match, following in zip(matches, matches[1:] + [None]):
+        if match.group(2) == heading:
+            return text[match.end():following.start() if following else len(text)]
+    return ''
+
+
+def section_epics(heading: str, plan: Plan) -> List[str]:
+    """Epics a PRD section describes"""
+    story = _STORY.match(heading)
+    if story:
+        epic_id = f"epic{story.group(1)}"
+        return [epic_id] if any(epic.plan_id == epic_id for epic in plan.epics) else []
+    phase = _PHASE.match(heading)
+    if phase:
+        label = f"phase-{phase.group(1)}"
+        return [epic.plan_id for epic in plan.epics if label in epic.labels]
+    return []
+
+
+def story_drift(section: str, epic_body: str) -> List[str]:
+    """User-story and acceptance-criteria lines of a PRD story missing from the epic body"""
+    body = ' '.join(epic_body.split())
+    expected = [' '.join(line.split()) for line in _STORY_LINE.findall(section)]
+    expected += [' '.join(item.split()) for item in _CRITERION.findall(section)]
+    return [line for line in expected if line not in body]
+
+
+class WatchSession:
+    """State carried between batches: plan fingerprints and PRD section digests"""
+
+    def __init__(self, args, source, prd: Path):
+        self.args = args
+        self.source = source
+        self.prd = prd
+        self.plan = self._load()
+        self.digests = plan_fingerprints(self.plan)
+        self.prd_text = self._read_prd()
+        self.sections = prd_sections(self.prd_text)
+
+    def _load(self, selection=None) -> Plan:
+        from .selection import Selection
+
+        return self.source.load_plan(selection or Selection())
+
+    def _read_prd(self) -> str:
+        try:
+            return self.prd.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            return ''
+
+    def reload_plan(self) -> Optional[Set[str]]:
+        """Re-import the plan module; returns the IDs whose content changed, None if it failed
+
+        Changes are measured against the last synced fingerprints, so items a
+        failed batch did not sync come back with the next save.
+        """
+        from .console import print_error
+
+        try:
+            self.source = importlib.reload(self.source)
+            plan = self._load()
+        except Exception as e:  # a half-written file must not end the session
+            print_error(f"Plan module failed to load, waiting for the next save: {e}")
+            return None
+        self.plan = plan
+        return changed_ids(self.digests, plan_fingerprints(plan))
+
+    def mark_synced(self, plan_ids: Set[str]):
+        """Remember the current fingerprints of these items as synced"""
+        digests = plan_fingerprints(self.plan)
+        self.digests.update({plan_id: digests[plan_id] for plan_id in plan_ids
+                             if plan_id in digests})
+
+    def reload_prd(self) -> Dict[str, List[str]]:
+        """Re-parse changed PRD sections; returns heading -> epics it maps to"""
+        text = self._read_prd()
+        sections = prd_sections(text)
+        changed = [heading for heading, digest in sections.items()
+                   if self.sections.get(heading) != digest]
+        self.prd_text, self.sections = text, sections
+        return {heading: section_epics(heading, self.plan) for heading in changed}
+
+    def check_stories(self, changed: Dict[str, List[str]]):
+        from .console import print_info, print_warning
+
+        for heading, epics in changed.items():
+            if not epics:
+                print_info(f"PRD section changed: {heading} (not mapped to an epic)")
+                continue
+            print_info(f"PRD section changed: {heading} -> {', '.join(epics)}")
+            if not _STORY.match(heading):
+                continue
+            epic = self.plan.epic(epics[0])
+            missing = story_drift(section_text(self.prd_text, heading), epic.render_body())
+            for line in missing:
+                print_warning(f"{epic.plan_id} body does not reflect PRD: {line}")
+
+    def sync(self, plan_ids: Set[str]) -> Set[str]:
+        """Diff only `plan_ids` against the snapshot and apply the result
+
+        Returns the IDs that are now in sync (all of them on a dry run).
+        """
+        from .apply import Applier, record_applied
+        from .backends import select_backend
+        from .console import print_error, print_info
+        from .diff import compute_changes, print_changes
+        from .manifest import Manifest
+        from .paths import default_manifest
+        from .selection import Selection
+        from .snapshot import SnapshotStore, load_snapshot
+        from .validate import print_problems, validate_source
+
+        plan = self._load(Selection(tasks=plan_ids))
+        problems = validate_source(plan, self.source)
+        if problems:
+            print_problems(problems)
+            return set()
+        snapshot = load_snapshot(self.args.snapshot_path)
+        change_set = compute_changes(plan, snapshot,
+                                     [label[0] for label in self.source.LABELS],
+                                     [m['title'] for m in self.source.MILESTONES])
+        print_changes(change_set)
+        if change_set.empty or self.args.dry_run:
+            return set(plan_ids)
+
+        backend = select_backend(self.args.backend)
+        manifest_path = default_manifest() if backend.shared else None
+        manifest = Manifest.load(manifest_path)
+        manifest.begin_run('watch', backend.name, ' '.join(sorted(plan_ids)))
+        applier = Applier(
+            backend, plan,
+            {name: (color, description) for name, color, description in self.source.LABELS},
+            {m['title']: m.get('description', '') for m in self.source.MILESTONES},
+            workers=self.args.workers,
+            on_result=manifest.record,
+            existing=snapshot.issues,
+        )
+        start = time.perf_counter()
+        result = applier.apply(change_set)
+        manifest.finish_run({'total': time.perf_counter() - start})
+        manifest.save(manifest_path)
+        if backend.shared and self.args.snapshot_path.suffix != '.jsonl':
+            with SnapshotStore(self.args.snapshot_path) as store:
+                record_applied(store, snapshot.issues, result)
+        for change, reason in result.skipped:
+            print_error(f"Skipped {change.plan_id}: {reason}")
+        print_info(f"Batch synced in {time.perf_counter() - start:.1f}s: "
+                   f"{len(result.created)} created, {len(result.updated)} updated, "
+                   f"{len(result.failed)} failed")
+        # a likely duplicate is a decision; anything else left undone is retried
+        unsynced = {change.plan_id for change, _ in result.failed}
+        unsynced |= {change.plan_id for change, _ in result.skipped if not change.duplicate}
+        if unsynced:
+            print_info(f"{len(unsynced)} items are retried with the next save")
+        return set(plan_ids) - unsynced
+
+
+def run_watch(args) -> int:
+    """`watch` command"""
+    from .backends import BackendError
+    from .console import print_error, print_info
+    from .paths import REPO_ROOT, default_snapshot
+    from .transport import TransportError
+
+    args.snapshot_path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    if not args.snapshot_path.exists():
+        print_error(f"No snapshot at {args.snapshot_path}; run the snapshot command first")
+        return 1
+    source = args.load_plan_source()
+    if source.__name__ == '__main__':
+        # Run as a script: import it under its own name so it can be reloaded
+        source = importlib.import_module(Path(source.__file__).stem)
+    plan_file = Path(source.__file__).resolve()
+    prd = Path(args.prd) if args.prd else REPO_ROOT / DEFAULT_PRD
+    session = WatchSession(args, source, prd.resolve())
+
+    watcher = make_watcher([plan_file, session.prd], poll=args.poll, interval=args.interval)
+    print_info(f"Watching {plan_file.name} and {session.prd.name} ({watcher.name}); "
+               f"{len(session.digests)} plan items fingerprinted. Ctrl-C to stop.")
+    try:
+        while True:
+            changed = debounced(watcher, args.debounce)
+            affected: Optional[Set[str]] = set()
+            if plan_file in changed:
+                affected = session.reload_plan()
+            if session.prd in changed:
+                session.check_stories(session.reload_prd())
+            if affected:
+                print_info(f"{len(affected)} plan items changed: "
+                           f"{', '.join(sorted(affected)[:10])}{' ...' if len(affected) > 10 else ''}")
+                try:
+                    session.mark_synced(session.sync(affected))
+                except (BackendError, TransportError) as e:  # keep watching; retried next save
+                    print_error(f"Batch failed, retried with the next save: {e}")
+            elif affected is not None and plan_file in changed:
+                print_info("Plan saved; no item content changed")
+    except KeyboardInterrupt:
+        print_info("Stopped watching")
+    finally:
+        watcher.close()
+    return 0
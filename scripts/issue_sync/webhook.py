@@ -0,0 +1,278 @@
+"""
+`webhook`: keep the local snapshot current from GitHub webhook deliveries
+
+A small single-threaded HTTP listener accepts `issues`, `label`,
+`milestone` and `projects_v2_item` events, checks X-Hub-Signature-256
+(HMAC-SHA256 of the raw body with the shared secret) and applies each event
+to the SQLite snapshot in arrival order. Redelivered and out-of-date issue
+events are ignored. A delivery counts as seen only once it has been applied;
+one that fails gets a 500, so GitHub's redelivery can apply it later.
+
+While it runs, the receiver keeps a heartbeat in the snapshot's meta table.
+If it was already listening when the snapshot was taken, no change can have
+been missed, so `snapshot_is_current()` lets a forward sync bootstrap from
+the snapshot instead of listing everything through the API. A failed event
+moves the live-since mark to the time of the failure, so the snapshot is
+not trusted again until it is refreshed.
+
+Deliveries can be replayed from JSON fixtures ({"event": ..., "payload": ...})
+with `webhook --replay FILE...`; they go through the same signature check.
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .snapshot import SnapshotStore, issue_record, label_record, milestone_record, utc_now
+
+EVENTS = ('issues', 'label', 'milestone', 'projects_v2_item')
+LIVE_SINCE = 'webhook_live_since'
+HEARTBEAT = 'webhook_heartbeat'
+HEARTBEAT_INTERVAL = 30.0
+MAX_BODY = 25 * 1024 * 1024  # GitHub caps payloads at 25 MB
+
+
+def sign(secret: bytes, body: bytes) -> str:
+    return 'sha256=' + hmac.new(secret, body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(secret: bytes, body: bytes, header: Optional[str]) -> bool:
+    return bool(header) and hmac.compare_digest(sign(secret, body), header)
+
+
+def _age(timestamp: Optional[str]) -> float:
+    if not timestamp:
+        return float('inf')
+    then = datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+    return (datetime.now(timezone.utc) - then).total_seconds()
+
+
+def snapshot_is_current(store: SnapshotStore, max_age: float = 3 * HEARTBEAT_INTERVAL) -> bool:
+    """True when a live receiver has been applying events since before the snapshot was taken"""
+    live_since = store.get_meta(LIVE_SINCE)
+    snapshot_at = store.get_meta('snapshot_at')
+    return bool(live_since and snapshot_at and live_since <= snapshot_at
+                and _age(store.get_meta(HEARTBEAT)) <= max_age)
+
+
+class WebhookReceiver:
+    """Verifies deliveries and applies them to a SnapshotStore"""
+
+    def __init__(self, store: SnapshotStore, secret: bytes, project: Optional[int] = None,
+                 remember: int = 1000):
+        self.store = store
+        self.secret = secret
+        self.project = project  # board number recorded for projects_v2_item events
+        self._seen: 'OrderedDict[str, None]' = OrderedDict()
+        self._remember = remember
+        self.counts: Dict[str, int] = {}
+        self.lost_at: Optional[str] = None  # a failed event not yet recorded in the meta table
+
+    def handle(self, event: Optional[str], delivery: Optional[str], body: bytes,
+               signature: Optional[str]) -> Tuple[int, str]:
+        """Process one delivery; returns (HTTP status, message)"""
+        if not verify_signature(self.secret, body, signature):
+            return 401, "bad signature"
+        if event == 'ping':
+            return 200, "pong"
+        if event not in EVENTS:
+            return 202, f"ignored {event} event"
+        if delivery and delivery in self._seen:
+            return 200, "duplicate delivery"
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400, "invalid JSON"
+        try:
+            message = getattr(self, f"_on_{event}")(payload.get('action'), payload)
+        except (KeyError, TypeError, AttributeError, sqlite3.Error) as e:
+            self.store.db.rollback()
+            self.lost_at = utc_now()
+            self.mark_lost()
+            return 500, f"{event} event not applied: {e!r}"
+        if delivery:
+            self._seen[delivery] = None
+            if len(self._seen) > self._remember:
+                self._seen.popitem(last=False)
+        self.counts[event] = self.counts.get(event, 0) + 1
+        return 200, message
+
+    def mark_lost(self) -> bool:
+        """Move the live-since mark past a failed event; False while the snapshot is locked"""
+        if self.lost_at is None:
+            return True
+        try:
+            self.store.set_meta(LIVE_SINCE, self.lost_at)
+        except sqlite3.Error:
+            return False
+        self.lost_at = None
+        return True
+
+    def _on_issues(self, action: str, payload: Dict) -> str:
+        issue = payload['issue']
+        if 'pull_request' in issue:
+            return "pull request ignored"
+        if action in ('deleted', 'transferred'):
+            self.store.delete_issue(issue['number'])
+            return f"#{issue['number']} {action}"
+        from .pull import checkbox_progress
+
+        row = issue_record(issue)
+        stored = self.store.issue(row['number'])
+        if stored and stored.get('updated_at') and row['updated_at'] \
+                and stored['updated_at'] > row['updated_at']:
+            return f"#{row['number']} {action} (older than stored, ignored)"
+        self.store.upsert_issues([row])
+        self.store.upsert_progress([(row['number'],) + checkbox_progress(row['body'])])
+        return f"#{row['number']} {action}"
+
+    def _on_label(self, action: str, payload: Dict) -> str:
+        label = label_record(payload['label'])
+        if action == 'deleted':
+            self.store.delete_label(label['name'])
+        else:
+            old_name = ((payload.get('changes') or {}).get('name') or {}).get('from')
+            self.store.upsert_label(label, old_name)
+        return f"label {label['name']} {action}"
+
+    def _on_milestone(self, action: str, payload: Dict) -> str:
+        milestone = milestone_record(payload['milestone'])
+        if action == 'deleted':
+            self.store.delete_milestone(milestone['number'])
+        else:
+            self.store.upsert_milestone(milestone)
+        return f"milestone {milestone['title']} {action}"
+
+    def _on_projects_v2_item(self, action: str, payload: Dict) -> str:
+        item = payload['projects_v2_item']
+        if action == 'deleted':
+            self.store.delete_project_item(item['node_id'])
+            return f"project item {item['node_id']} deleted"
+        if item.get('content_type') != 'Issue':
+            return f"project item {item['node_id']} ({item.get('content_type')}) ignored"
+        number = None
+        row = self.store.db.execute("SELECT number FROM issues WHERE node_id = ?",
+                                    (item.get('content_node_id'),)).fetchone()
+        if row:
+            number = row[0]
+        self.store.upsert_project_item({'id': item['node_id'], 'project': self.project,
+                                        'issue_number': number,
+                                        'content_id': item.get('content_node_id')})
+        return f"project item {item['node_id']} {action}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: '_Server'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self._reply(413, "payload too large")
+            return
+        body = self.rfile.read(length)
+        status, message = self.server.receiver.handle(
+            self.headers.get('X-GitHub-Event'), self.headers.get('X-GitHub-Delivery'),
+            body, self.headers.get('X-Hub-Signature-256'))
+        self._reply(status, message)
+        if status >= 500:
+            from .console import print_error
+            print_error(message)
+        elif status == 200 and self.server.verbose:
+            from .console import print_info
+            print_info(message)
+
+    def _reply(self, status: int, message: str):
+        data = (message + '\n').encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(HTTPServer):
+    """Single-threaded on purpose: events are applied in order on one SQLite connection"""
+
+    def __init__(self, address, receiver: WebhookReceiver, verbose: bool = False):
+        super().__init__(address, _Handler)
+        self.receiver = receiver
+        self.verbose = verbose
+        self._beat = 0.0
+
+    def service_actions(self):
+        now = datetime.now(timezone.utc).timestamp()
+        if now - self._beat >= HEARTBEAT_INTERVAL:
+            # no heartbeat until a lost event is on record, so the snapshot goes stale instead
+            if not self.receiver.mark_lost():
+                return
+            self._beat = now
+            try:
+                self.receiver.store.set_meta(HEARTBEAT, utc_now())
+            except sqlite3.Error:
+                pass  # the next interval tries again
+
+
+def replay(receiver: WebhookReceiver, paths) -> int:
+    """Apply recorded deliveries in order; returns how many failed"""
+    from .console import print_error, print_info
+
+    failed = 0
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            fixture = json.load(f)
+        body = json.dumps(fixture['payload']).encode('utf-8')
+        status, message = receiver.handle(fixture['event'], fixture.get('delivery'), body,
+                                          sign(receiver.secret, body))
+        if status >= 400:
+            failed += 1
+            print_error(f"{Path(path).name}: {status} {message}")
+        else:
+            print_info(f"{Path(path).name}: {message}")
+    return failed
+
+
+def run_webhook(args) -> int:
+    """`webhook` command"""
+    from .console import print_error, print_info
+    from .paths import default_snapshot
+
+    secret = os.environ.get('ISSUE_SYNC_WEBHOOK_SECRET', '')
+    if args.secret_file:
+        secret = Path(args.secret_file).read_text(encoding='utf-8').strip()
+    if not secret:
+        print_error("Set ISSUE_SYNC_WEBHOOK_SECRET or --secret-file to the webhook's secret")
+        return 1
+    path = Path(args.snapshot) if args.snapshot else default_snapshot()
+    with SnapshotStore(path) as store:
+        receiver = WebhookReceiver(store, secret.encode('utf-8'), args.project)
+        if args.replay:
+            return 1 if replay(receiver, args.replay) else 0
+
+        server = _Server((args.host, args.port), receiver, args.verbose)
+        store.set_meta(LIVE_SINCE, utc_now())
+        store.set_meta(HEARTBEAT, utc_now())
+        print_info(f"Listening on http://{args.host}:{server.server_address[1]}/ for "
+                   f"{', '.join(EVENTS)} events; updating {path}")
+        if (store.get_meta('snapshot_at') or '') < store.get_meta(LIVE_SINCE):
+            print_info("Run `snapshot --since last` once now; forward syncs use the snapshot "
+                       "only when it was taken while this receiver was listening")
+        try:
+            server.serve_forever(poll_interval=1.0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            store.set_meta(LIVE_SINCE, '')
+        print_info("Stopped: " + (', '.join(f"{n} {event}" for event, n in receiver.counts.items())
+                                  or "no events"))
+    return 0